@@ -0,0 +1,46 @@
+"""initial ledger schema
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_balances',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('balance', sa.Numeric(precision=18, scale=8), server_default=sa.text('0.0'), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table(
+        'rewarded_uploads',
+        sa.Column('cid', sa.String(), nullable=False),
+        sa.Column('rewarded_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.PrimaryKeyConstraint('cid')
+    )
+    op.create_table(
+        'ledger_journal_checkpoints',
+        sa.Column('journal_id', sa.String(), nullable=False),
+        sa.Column('last_seq', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('journal_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ledger_journal_checkpoints')
+    op.drop_table('rewarded_uploads')
+    op.drop_table('user_balances')
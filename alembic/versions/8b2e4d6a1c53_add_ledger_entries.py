@@ -0,0 +1,51 @@
+"""add append-only ledger_entries and balance snapshots
+
+Existing user_balances rows become snapshots as of entry 0, so current
+balances carry over unchanged.
+
+Revision ID: 8b2e4d6a1c53
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-17 09:31:05.604771
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d6a1c53'
+down_revision: Union[str, None] = '3f1c2a9d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ledger_entries',
+        sa.Column('entry_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=18, scale=8), nullable=False),
+        sa.Column('reason', sa.String(), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=True),
+        sa.Column('cid', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.PrimaryKeyConstraint('entry_id')
+    )
+    op.create_index('ix_ledger_entries_user_id_entry_id', 'ledger_entries', ['user_id', 'entry_id'], unique=False)
+    op.create_index('ix_ledger_entries_created_at', 'ledger_entries', ['created_at'], unique=False)
+    op.add_column('user_balances', sa.Column('snapshot_entry_id', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    # Fold the entries back into the balances before dropping them
+    op.execute(
+        "UPDATE user_balances SET balance = balance + COALESCE((SELECT SUM(e.amount) FROM ledger_entries e "
+        "WHERE e.user_id = user_balances.user_id AND e.entry_id > user_balances.snapshot_entry_id), 0)"
+    )
+    with op.batch_alter_table('user_balances') as batch_op: # SQLite cannot drop columns in place
+        batch_op.drop_column('snapshot_entry_id')
+    op.drop_index('ix_ledger_entries_created_at', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_user_id_entry_id', table_name='ledger_entries')
+    op.drop_table('ledger_entries')
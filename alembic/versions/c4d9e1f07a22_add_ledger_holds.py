@@ -0,0 +1,38 @@
+"""add ledger_holds for pre-authorized query charges
+
+Revision ID: c4d9e1f07a22
+Revises: 8b2e4d6a1c53
+Create Date: 2026-10-17 14:12:47.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9e1f07a22'
+down_revision: Union[str, None] = '8b2e4d6a1c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ledger_holds',
+        sa.Column('hold_id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=18, scale=8), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('hold_id')
+    )
+    op.create_index('ix_ledger_holds_user_id_expires_at', 'ledger_holds', ['user_id', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    # Outstanding holds are dropped: their funds simply become available again
+    op.drop_index('ix_ledger_holds_user_id_expires_at', table_name='ledger_holds')
+    op.drop_table('ledger_holds')
@@ -1,8 +1,16 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager # Import for lifespan manager (alternative)
-from ..tokenomics.ledger import connect_db, disconnect_db # Import ledger functions
+from ..tokenomics.ledger import connect_db, disconnect_db, start_ledger_compaction, stop_ledger_compaction # Import ledger functions
+from ..sub_ai.client import startup_http_clients, shutdown_http_clients, SUB_AI_ENDPOINTS # Pooled Sub-AI HTTP clients
+from ..core_ai.routing import start_specialist_index_sync, stop_specialist_index_sync
+from ..utils.llm_gateway import llm_gateway
+from ..utils.telemetry import metrics_registry
+from ..utils.log import configure_logging, shutdown_logging, get_logger
 from .routers import core_ai # Import the core_ai router module
 
+logger = get_logger(__name__)
+
 # --- App Initialization ---
 # Using lifespan context manager is the recommended way in newer FastAPI versions
 # but on_event decorators are also common and clear. We'll use on_event here.
@@ -16,6 +24,10 @@ from .routers import core_ai # Import the core_ai router module
 #     await disconnect_db()
 # app = FastAPI(lifespan=lifespan, ...) # Pass lifespan to FastAPI constructor
 
+# Fixed specialists whose routing vectors are mirrored into the in-memory index: only ids
+# with an endpoint can be invoked, so the routing index must not hold any others
+FIXED_SPECIALIST_IDS = sorted(set(SUB_AI_ENDPOINTS) - {"DynamicBaseModel"})
+
 app = FastAPI(
     title="Co-Lab API",
     description="API for interacting with the Co-Lab decentralized AI system.",
@@ -25,15 +37,26 @@ app = FastAPI(
 # --- Event Handlers ---
 @app.on_event("startup")
 async def startup_event():
-    """Connects to the database on application startup."""
-    print("Application startup: Connecting to database...")
+    """Starts the log writer, connects to the database, starts ledger compaction, opens pooled Sub-AI HTTP clients and syncs the specialist index on application startup."""
+    configure_logging()
+    logger.info("Application startup: connecting to database")
     await connect_db()
+    await start_ledger_compaction()
+    await startup_http_clients()
+    await start_specialist_index_sync(FIXED_SPECIALIST_IDS)
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Disconnects from the database on application shutdown."""
-    print("Application shutdown: Disconnecting from database...")
+    """Closes pooled Sub-AI HTTP and LLM clients, disconnects from the database and flushes logs on application shutdown."""
+    logger.info("Application shutdown: closing Sub-AI HTTP and LLM clients and disconnecting from database")
+    await stop_specialist_index_sync()
+    await stop_ledger_compaction()
+    await shutdown_http_clients()
+    if llm_gateway is not None:
+        logger.info("LLM usage this session", usage=llm_gateway.usage())
+        await llm_gateway.close()
     await disconnect_db()
+    shutdown_logging()
 
 
 # --- API Endpoints ---
@@ -44,6 +67,13 @@ async def read_root():
     """
     return {"status": "ok", "message": "Welcome to Co-Lab API!"}
 
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+async def read_metrics():
+    """
+    Pipeline stage latency histograms in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # --- Include API Routers ---
 app.include_router(core_ai.router, prefix="/core", tags=["Core AI"])
 
@@ -1,8 +1,12 @@
+import json
 from fastapi import APIRouter, HTTPException, status
-from ...core_ai.orchestrator import process_user_prompt
+from fastapi.responses import StreamingResponse
+from ...core_ai.orchestrator import process_user_prompt, process_user_prompt_stream
 from ...core_ai.models import UserInput, FinalResponse
+from ...utils.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 @router.post(
     "/prompt",
@@ -29,8 +33,32 @@ async def handle_prompt(user_input: UserInput) -> FinalResponse:
         raise http_exc
     except Exception as e:
         # Catch any other unexpected errors during orchestration
-        print(f"Unexpected API error for session {user_input.session_id}: {e}")
+        logger.error("Unexpected API error", session_id=user_input.session_id, error=str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred: {e}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/prompt/stream",
+    summary="Process a user prompt with streamed progress",
+    description="Same pipeline as /prompt, but streams newline-delimited JSON events (decomposed, routed, charged, "
+                "sub_task_done, synthesis_token, settled) as they happen, ending with a 'final' event carrying the FinalResponse.",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def handle_prompt_stream(user_input: UserInput) -> StreamingResponse:
+    """
+    Endpoint to handle incoming user prompts with a chunked NDJSON response.
+    Errors are reported in the 'final' event since the status code is sent before processing starts.
+    """
+    async def event_lines():
+        try:
+            async for event in process_user_prompt_stream(user_input):
+                yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            logger.error("Unexpected streaming API error", session_id=user_input.session_id, error=str(e))
+            yield json.dumps({"event": "error", "error_message": f"An unexpected error occurred: {e}"}) + "\n"
+
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
@@ -0,0 +1,191 @@
+"""
+Local stand-ins for the pipeline's external dependencies, used by the offline benchmark.
+
+Everything here is served in-process through httpx.ASGITransport, so no sockets are opened.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import FastAPI, Request
+
+# Instruction templates for fake decompositions, and the specialist each should route to
+# (None = no fixed specialist, i.e. a dynamic instance). The leading keyword decides routing.
+SUB_TASK_TEMPLATES: List[Tuple[Optional[str], str]] = [
+    ("SummarizationAI", "Summarize the background of: {prompt}"),
+    ("CodeGeneration", "Write code that implements: {prompt}"),
+    ("QuestionAnsweringAI", "Answer the question: {prompt}"),
+    ("DataAnalysisAI", "Analyze the data related to: {prompt}"),
+    (None, "Compose a short creative take on: {prompt}"),
+]
+ROUTING_KEYWORDS: Dict[str, str] = {
+    "Summarize": "SummarizationAI",
+    "Write code": "CodeGeneration",
+    "Answer the question": "QuestionAnsweringAI",
+    "Analyze the data": "DataAnalysisAI",
+}
+
+_FILLER_WORDS = ("the", "result", "combines", "several", "findings", "into", "a", "coherent", "answer", "with", "supporting", "detail")
+
+
+class LatencyModel:
+    """
+    Log-normal latency distribution given by its median and a shape `sigma`
+    (0 = constant latency). Heavier tails come from larger sigma; roughly,
+    p95 = median * exp(1.645 * sigma).
+    """
+
+    def __init__(self, median_ms: float, sigma: float = 0.0, rng: Optional[random.Random] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self._rng = rng or random.Random()
+
+    def sample(self) -> float:
+        """Returns one latency in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median_ms / 1000.0
+        return self._rng.lognormvariate(np.log(self.median_ms / 1000.0), self.sigma)
+
+
+def _unit_vector(seed_text: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(seed_text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return vector / np.linalg.norm(vector)
+
+def specialist_vector(specialist_id: str, dimensions: int) -> List[float]:
+    """The routing vector registered for a stub specialist."""
+    return _unit_vector(f"specialist:{specialist_id}", dimensions).tolist()
+
+def fake_embedding(text: str, dimensions: int) -> np.ndarray:
+    """
+    Deterministic embedding for `text`. Texts starting with a routing keyword land
+    close to that specialist's vector (cosine ~0.99), everything else is random.
+    """
+    noise = _unit_vector(f"text:{text}", dimensions)
+    for keyword, specialist_id in ROUTING_KEYWORDS.items():
+        if text.startswith(keyword):
+            vector = _unit_vector(f"specialist:{specialist_id}", dimensions) + 0.1 * noise
+            return vector / np.linalg.norm(vector)
+    return noise
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def _fake_category(instruction: str) -> str:
+    if "code" in instruction.lower():
+        return "code"
+    return "reasoning" if instruction.startswith("Analyze") else "other"
+
+def _filler_text(tokens: int) -> str:
+    return " ".join(_FILLER_WORDS[i % len(_FILLER_WORDS)] for i in range(tokens))
+
+
+def create_fake_openai_app(
+    chat_latency: LatencyModel,
+    embedding_latency: LatencyModel,
+    tokens_per_second: float = 80.0,
+    sub_tasks_per_prompt: int = 3,
+    synthesis_tokens: int = 300,
+    dimensions: int = 1536
+) -> FastAPI:
+    """
+    Builds an ASGI app implementing the subset of the OpenAI API the pipeline uses:
+    `/v1/chat/completions` (decomposition, classification and synthesis prompts are
+    recognized from their system messages) and `/v1/embeddings` (float or base64).
+
+    A chat request takes one `chat_latency` sample (time to first token) plus
+    completion_tokens / tokens_per_second.
+    """
+    app = FastAPI()
+    app.state.requests = {"decomposition": 0, "classification": 0, "synthesis": 0, "chat_other": 0, "embeddings": 0}
+
+    def _generate(messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+        system = str(messages[0].get("content", "")) if messages else ""
+        user = str(messages[-1].get("content", "")) if messages else ""
+        if "task decomposition agent" in system:
+            templates = [SUB_TASK_TEMPLATES[i % len(SUB_TASK_TEMPLATES)] for i in range(sub_tasks_per_prompt)]
+            sub_tasks = [
+                {"id": f"t{i + 1}", "instruction": template.format(prompt=user), "depends_on": []}
+                for i, (_, template) in enumerate(templates)
+            ]
+            return "decomposition", json.dumps({"sub_tasks": sub_tasks})
+        if "task classifier" in system:
+            if "JSON list" in user:
+                tasks = json.loads(user.split("):\n", 1)[1].split("\n\nGuidelines", 1)[0])
+                return "classification", json.dumps({"classifications": [
+                    {"id": task["id"], "category": _fake_category(task["instruction"])} for task in tasks
+                ]})
+            match = re.search(r'Task Instruction:\n"(.*)"', user, re.DOTALL)
+            return "classification", f"Classification: \\boxed{{{_fake_category(match.group(1) if match else '')}}}"
+        if "synthesis AI" in system:
+            return "synthesis", _filler_text(synthesis_tokens)
+        return "chat_other", "OK"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        kind, content = _generate(body.get("messages") or [])
+        app.state.requests[kind] += 1
+        prompt_tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in body.get("messages") or [])
+        completion_tokens = _estimate_tokens(content)
+        delay = chat_latency.sample()
+        if tokens_per_second > 0:
+            delay += completion_tokens / tokens_per_second
+        await asyncio.sleep(delay)
+        return {
+            "id": f"chatcmpl-{hashlib.sha1(content.encode()).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input") or []
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        app.state.requests["embeddings"] += 1
+        await asyncio.sleep(embedding_latency.sample())
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_embedding(str(text), dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        prompt_tokens = sum(_estimate_tokens(str(text)) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    return app
+
+
+def create_stub_specialist_app(specialist_id: str, latency: LatencyModel) -> FastAPI:
+    """Builds an ASGI app with the `/invoke` endpoint of a Sub-AI service, answering after a `latency` sample."""
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/invoke")
+    async def invoke(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        await asyncio.sleep(latency.sample())
+        task = body.get("instruction") or body.get("prompt") or ""
+        return {"content": f"[{specialist_id}] Result for: {task[:200]}"}
+
+    return app
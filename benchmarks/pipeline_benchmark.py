@@ -0,0 +1,358 @@
+"""
+Offline end-to-end benchmark of process_user_prompt.
+
+Runs the full pipeline (decomposition, routing, charging, Sub-AI invocation, synthesis)
+against local stand-ins: a fake OpenAI server with configurable latency distributions
+and token rate, the in-memory specialist vector index, stub specialist FastAPI apps and
+a throwaway SQLite ledger. No network access is needed. Reports throughput plus
+p50/p95/p99 latency end to end and per pipeline stage (from the telemetry spans), and
+can fail on p95 regressions against a saved baseline report.
+
+Usage (from the project root, with the same absolute imports as the tests):
+    python -m benchmarks.pipeline_benchmark --requests 200 --concurrency 16 --output report.json
+    python -m benchmarks.pipeline_benchmark --baseline report.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import databases
+import httpx
+import sqlalchemy
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+
+from core_ai import decomposition, orchestrator, routing, synthesis
+from core_ai.models import UserInput
+from core_ai.vector_index import InMemoryVectorIndex
+from sub_ai import client as sub_ai_client
+from tokenomics import ledger
+from tokenomics.write_behind import LedgerJournal, WriteBehindLedger
+from utils import llm_gateway as llm_gateway_module
+from utils import telemetry
+from utils.llm_gateway import LLMGateway
+from benchmarks.fakes import LatencyModel, create_fake_openai_app, create_stub_specialist_app, specialist_vector
+
+PERCENTILES = (50, 95, 99)
+
+
+class BenchmarkConfig(BaseModel):
+    """Workload and simulated-latency settings for one benchmark run."""
+    requests: int = 100
+    concurrency: int = 8
+    warmup: int = 5 # Requests run (and discarded) before measuring
+    users: int = 10
+    sub_tasks: int = 3 # Sub-tasks per decomposed prompt
+    llm_latency_ms: float = 80.0 # Median time to first token of chat completions
+    llm_latency_sigma: float = 0.3 # Log-normal shape; 0 = constant
+    tokens_per_second: float = 1000.0 # Completion token rate after the first token (0 = instant)
+    synthesis_tokens: int = 200
+    embedding_latency_ms: float = 20.0
+    embedding_latency_sigma: float = 0.2
+    specialist_latency_ms: float = 50.0
+    specialist_latency_sigma: float = 0.5
+    dynamic_latency_ms: float = 150.0
+    dynamic_latency_sigma: float = 0.5
+    write_behind_ledger: bool = False # Charge through the write-behind ledger engine instead of per-charge transactions
+    optimistic_charge: bool = False # Invoke Sub-AIs while the hold is placed (ORCHESTRATION_OPTIMISTIC_CHARGE)
+    use_caches: bool = False # Keep the response/decomposition/result/embedding caches on (prompts are unique either way)
+    seed: int = 1234
+    verbose: bool = False # Keep the pipeline's own stdout output
+
+
+class _SpanCollector(logging.Handler):
+    """Collects span durations (seconds) from the telemetry span log records."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+
+    def emit(self, record: logging.LogRecord):
+        fields = getattr(record, "fields", None)
+        if fields and "duration_ms" in fields:
+            self.durations[fields["span"]].append(fields["duration_ms"] / 1000.0)
+
+    def clear(self):
+        self.durations.clear()
+
+
+@contextlib.contextmanager
+def _patched(patches: Sequence[Tuple[Any, str, Any]]) -> Iterator[None]:
+    """Temporarily replaces module attributes, restoring them on exit."""
+    originals = [(target, name, getattr(target, name)) for target, name, _ in patches]
+    try:
+        for target, name, value in patches:
+            setattr(target, name, value)
+        yield
+    finally:
+        for target, name, value in reversed(originals):
+            setattr(target, name, value)
+
+@contextlib.contextmanager
+def _collecting_spans(collector: _SpanCollector) -> Iterator[None]:
+    span_logger = telemetry.span_logger
+    previous_level, previous_propagate = span_logger.level, span_logger.propagate
+    span_logger.addHandler(collector)
+    span_logger.setLevel(logging.INFO)
+    span_logger.propagate = False # Keep span records out of the application's log output
+    try:
+        yield
+    finally:
+        span_logger.removeHandler(collector)
+        span_logger.setLevel(previous_level)
+        span_logger.propagate = previous_propagate
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize_latencies(values: List[float]) -> Dict[str, float]:
+    """count, mean, p50/p95/p99 and max (milliseconds) of latencies given in seconds."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    summary: Dict[str, float] = {"count": len(ordered), "mean_ms": 1000.0 * sum(ordered) / len(ordered)}
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = 1000.0 * _percentile(ordered, pct)
+    summary["max_ms"] = 1000.0 * ordered[-1]
+    return summary
+
+
+async def _create_ledger(path: str) -> databases.Database:
+    """Creates and connects a SQLite database at `path` with the ledger schema."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    ledger.metadata.create_all(engine)
+    engine.dispose()
+    database = databases.Database(f"sqlite:///{path}")
+    await database.connect()
+    return database
+
+async def _drive(config: BenchmarkConfig, count: int, label: str, latencies: List[float], statuses: Counter):
+    semaphore = asyncio.Semaphore(config.concurrency)
+
+    async def _one(i: int):
+        async with semaphore:
+            user_input = UserInput(
+                user_id=f"bench-user-{i % config.users}",
+                prompt=f"Explain benchmark topic {label}-{i} and its practical implications."
+            )
+            start = time.perf_counter()
+            response = await orchestrator.process_user_prompt(user_input)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status] += 1
+
+    await asyncio.gather(*(_one(i) for i in range(count)))
+
+async def run_benchmark(config: BenchmarkConfig) -> Dict[str, Any]:
+    """
+    Runs the benchmark described by `config` and returns its report: throughput,
+    response statuses, end-to-end and per-stage latency summaries, and the number
+    of requests each stand-in served.
+    """
+    rng = random.Random(config.seed)
+    dimensions = routing.EMBEDDING_DIMENSIONS
+    openai_app = create_fake_openai_app(
+        chat_latency=LatencyModel(config.llm_latency_ms, config.llm_latency_sigma, rng),
+        embedding_latency=LatencyModel(config.embedding_latency_ms, config.embedding_latency_sigma, rng),
+        tokens_per_second=config.tokens_per_second,
+        sub_tasks_per_prompt=config.sub_tasks,
+        synthesis_tokens=config.synthesis_tokens,
+        dimensions=dimensions,
+    )
+    gateway = LLMGateway(
+        AsyncOpenAI(
+            api_key="benchmark",
+            base_url="http://fake-openai/v1",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=openai_app)),
+        ),
+        max_concurrency=llm_gateway_module.LLM_GATEWAY_MAX_CONCURRENCY,
+        default_rpm=llm_gateway_module.LLM_GATEWAY_DEFAULT_RPM,
+        default_tpm=llm_gateway_module.LLM_GATEWAY_DEFAULT_TPM,
+        model_limits=llm_gateway_module.LLM_GATEWAY_MODEL_LIMITS,
+    )
+
+    specialist_apps = {}
+    for target_id in sub_ai_client.SUB_AI_ENDPOINTS:
+        if target_id == "DynamicBaseModel":
+            latency = LatencyModel(config.dynamic_latency_ms, config.dynamic_latency_sigma, rng)
+        else:
+            latency = LatencyModel(config.specialist_latency_ms, config.specialist_latency_sigma, rng)
+        specialist_apps[target_id] = create_stub_specialist_app(target_id, latency)
+    http_clients = {
+        target_id: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), timeout=sub_ai_client.DYNAMIC_TIMEOUT)
+        for target_id, app in specialist_apps.items()
+    }
+
+    specialist_index = InMemoryVectorIndex(dimensions)
+    specialist_index.replace_all([
+        (target_id, specialist_vector(target_id, dimensions), {"status": "active"})
+        for target_id in sub_ai_client.SUB_AI_ENDPOINTS if target_id != "DynamicBaseModel"
+    ])
+
+    patches: List[Tuple[Any, str, Any]] = [
+        (decomposition, "client", gateway),
+        (synthesis, "client", gateway),
+        (routing, "embedding_client", gateway),
+        (routing, "specialist_index", specialist_index),
+        (routing, "task_classifier", None), # Classify through the fake LLM regardless of a local model file
+        (sub_ai_client, "_http_clients", http_clients),
+        (orchestrator, "ORCHESTRATION_OPTIMISTIC_CHARGE", config.optimistic_charge),
+    ]
+    if not config.use_caches:
+        patches += [
+            (orchestrator, "response_cache", None),
+            (decomposition, "decomposition_cache", None),
+            (sub_ai_client, "_result_cache", None),
+            (routing, "embedding_cache", None),
+        ]
+
+    users = [f"bench-user-{i}" for i in range(config.users)]
+    collector = _SpanCollector()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = await _create_ledger(os.path.join(tmp_dir, "ledger.db"))
+        write_behind = None
+        if config.write_behind_ledger:
+            write_behind = WriteBehindLedger(
+                database,
+                LedgerJournal(os.path.join(tmp_dir, "ledger.journal"), fsync=ledger.LEDGER_JOURNAL_FSYNC),
+                flush_max_entries=ledger.LEDGER_FLUSH_MAX_ENTRIES,
+                flush_interval=ledger.LEDGER_FLUSH_INTERVAL,
+            )
+            await write_behind.start()
+        try:
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(_patched(patches + [(ledger, "database", database), (ledger, "write_behind_ledger", write_behind)]))
+                stack.enter_context(_collecting_spans(collector))
+                if not config.verbose:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+                for user_id in users:
+                    await ledger.update_user_balance(user_id, 1e9)
+                if config.warmup:
+                    await _drive(config, config.warmup, "warmup", [], Counter())
+                collector.clear()
+                start = time.perf_counter()
+                await _drive(config, config.requests, "run", latencies, statuses)
+                elapsed = time.perf_counter() - start
+        finally:
+            if write_behind is not None:
+                await write_behind.stop()
+            await database.disconnect()
+            await gateway.close()
+            for client in http_clients.values():
+                await client.aclose()
+
+    return {
+        "config": config.model_dump(),
+        "requests": config.requests,
+        "concurrency": config.concurrency,
+        "duration_seconds": elapsed,
+        "throughput_rps": config.requests / elapsed if elapsed > 0 else 0.0,
+        "statuses": dict(statuses),
+        "end_to_end": summarize_latencies(latencies),
+        "stages": {name: summarize_latencies(values) for name, values in sorted(collector.durations.items())},
+        "stand_in_requests": {
+            "openai": dict(openai_app.state.requests),
+            "specialists": {target_id: app.state.requests for target_id, app in specialist_apps.items()},
+        },
+    }
+
+
+def _error_rate(report: Dict[str, Any]) -> float:
+    statuses = report.get("statuses", {})
+    total = sum(statuses.values())
+    return sum(count for status, count in statuses.items() if status.startswith("error")) / total if total else 0.0
+
+def compare_to_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_regression: float,
+    min_delta_ms: float = 5.0,
+    max_error_rate_increase: float = 0.01
+) -> List[str]:
+    """
+    Lists the p95 latencies (end to end and per stage) and the throughput that regressed
+    by more than `max_regression` (a fraction) against `baseline`, and an error rate more
+    than `max_error_rate_increase` above the baseline's. Latency changes below
+    `min_delta_ms` are ignored so sub-millisecond stages do not flap.
+    """
+    regressions: List[str] = []
+    if _error_rate(report) > _error_rate(baseline) + max_error_rate_increase:
+        regressions.append(f"error rate: {_error_rate(report):.1%} vs baseline {_error_rate(baseline):.1%}")
+    candidates = [("end_to_end", report["end_to_end"], baseline.get("end_to_end"))]
+    candidates += [(name, summary, baseline.get("stages", {}).get(name)) for name, summary in report["stages"].items()]
+    for name, current, previous in candidates:
+        if not previous or "p95_ms" not in previous or "p95_ms" not in current:
+            continue
+        limit = max(previous["p95_ms"] * (1 + max_regression), previous["p95_ms"] + min_delta_ms)
+        if current["p95_ms"] > limit:
+            regressions.append(f"{name}: p95 {current['p95_ms']:.1f} ms vs baseline {previous['p95_ms']:.1f} ms")
+    previous_throughput = baseline.get("throughput_rps")
+    if previous_throughput and report["throughput_rps"] < previous_throughput * (1 - max_regression):
+        regressions.append(f"throughput: {report['throughput_rps']:.2f} req/s vs baseline {previous_throughput:.2f} req/s")
+    return regressions
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"Requests: {report['requests']} at concurrency {report['concurrency']} in {report['duration_seconds']:.2f}s "
+        f"({report['throughput_rps']:.2f} req/s)",
+        "Statuses: " + ", ".join(f"{status}={count}" for status, count in sorted(report["statuses"].items())),
+        "",
+        f"{'stage':<22}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)",
+    ]
+    rows = [("end_to_end", report["end_to_end"])] + list(report["stages"].items())
+    for name, summary in rows:
+        if not summary.get("count"):
+            continue
+        lines.append(
+            f"{name:<22}{summary['count']:>7}{summary['mean_ms']:>10.1f}{summary['p50_ms']:>10.1f}"
+            f"{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}{summary['max_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the Co-Lab pipeline.")
+    for name, field in BenchmarkConfig.model_fields.items():
+        flag = "--" + name.replace("_", "-")
+        if field.annotation is bool:
+            parser.add_argument(flag, action="store_true", default=field.default)
+        else:
+            parser.add_argument(flag, type=field.annotation, default=field.default)
+    parser.add_argument("--output", help="Write the JSON report to this path.")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95/throughput regression as a fraction (default 0.2).")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _parse_args(argv)
+    config = BenchmarkConfig(**{name: getattr(args, name) for name in BenchmarkConfig.model_fields})
+    report = asyncio.run(run_benchmark(config))
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.max_regression)
+        if regressions:
+            print("\nPerformance regressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo performance regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 # Load .env file variables if it exists
 # Useful for local development
@@ -33,6 +33,13 @@ class Settings(BaseSettings):
     INDEXER_API_URL: str = "http://localhost:8010" # Example, adjust port as needed
     # Tokenomics Ledger Database URL
     LEDGER_DATABASE_URL: str = "sqlite+aiosqlite:///./colab_ledger.db" # Use aiosqlite driver for async with databases lib
+    LEDGER_WRITE_BEHIND_ENABLED: bool = False # Cache balances in memory, journal changes and flush them in batches (single ledger writer only)
+    LEDGER_JOURNAL_PATH: str = "./colab_ledger.journal" # Write-ahead journal segments are <path>.<seq>
+    LEDGER_JOURNAL_FSYNC: bool = True # fsync each journal group commit (False survives process but not OS crashes)
+    LEDGER_FLUSH_MAX_ENTRIES: int = 500 # Flush when this many journal entries are pending...
+    LEDGER_FLUSH_INTERVAL: float = 1.0 # ...or after this many seconds
+    LEDGER_COMPACTION_INTERVAL: float = 300.0 # Seconds between rolling ledger entries into balance snapshots (0 disables)
+    LEDGER_COMPACTION_MIN_AGE: float = 60.0 # Only entries older than this (seconds) are rolled into snapshots
     # Elasticsearch Connection
     ELASTICSEARCH_HOSTS: Optional[str] = "http://localhost:9200" # Comma-separated if multiple nodes
     ELASTICSEARCH_CLOUD_ID: Optional[str] = None # For Elastic Cloud connection
@@ -48,8 +55,59 @@ class Settings(BaseSettings):
     DECOMPOSITION_MODEL: str = "gpt-3.5-turbo" # Or specific OpenAI model / Claude model
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     EMBEDDING_DIMENSIONS: int = 1536 # Adjust if using lower dimensions with text-embedding-3
+    EMBEDDING_MAX_BATCH_SIZE: int = 256 # Max texts per embeddings request (API limit is 2048)
+    EMBEDDING_MAX_BATCH_TOKENS: int = 250000 # Approx. token budget per embeddings request (API limit is 300k)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000 # In-memory LRU tier
+    EMBEDDING_CACHE_DB_PATH: str = "" # SQLite tier, disabled unless a path is set
+    EMBEDDING_CACHE_MAX_DISK_ENTRIES: int = 500000
     SYNTHESIS_MODEL: str = "gpt-4o" # Or specific OpenAI model / Claude model
+    SYNTHESIS_CONTEXT_TOKEN_BUDGET: int = 6000 # Max tokens of sub-task responses packed into the synthesis prompt
+    SYNTHESIS_MIN_RESPONSE_TOKENS: int = 64 # Floor per successful response when condensing to the budget
     ROUTING_CONFIDENCE_THRESHOLD: float = 0.75
+    ROUTING_MAX_CONCURRENCY: int = 8 # Max concurrent vector queries / classification calls per prompt
+    ROUTING_VECTOR_BACKEND: str = "memory" # 'memory' (in-process mirror of specialist vectors) or 'pinecone'
+    SPECIALIST_INDEX_SYNC_INTERVAL: float = 300.0 # Seconds between Pinecone -> memory specialist syncs (0 disables)
+    TASK_CLASSIFIER_PATH: str = "./task_classifier.npz" # Local embedding classifier (see core_ai/task_classifier.py)
+    TASK_CLASSIFIER_CONFIDENCE_THRESHOLD: float = 0.6 # Below this, classification falls back to the LLM
+    ORCHESTRATION_DEADLINE_SECONDS: float = 60.0 # Budget from prompt receipt until synthesis starts regardless of stragglers
+    ORCHESTRATION_QUORUM: float = 0.75 # Fraction of sub-tasks that must succeed before stragglers may be dropped
+    ORCHESTRATION_WAIT_FOR_FIXED: bool = True # Always wait (until the deadline) for fixed specialists
+    ORCHESTRATION_OPTIMISTIC_CHARGE: bool = False # Invoke Sub-AIs while the hold is placed, cancelling them if it is refused
+    DECOMPOSITION_CACHE_ENABLED: bool = True # Memoize decompositions per (model, normalized prompt)
+    DECOMPOSITION_CACHE_MAX_ENTRIES: int = 5000
+    DECOMPOSITION_CACHE_TTL_SECONDS: float = 86400.0
+    RESPONSE_CACHE_ENABLED: bool = True # Prompt-level cache of final answers
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600.0
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.0 # Cosine threshold for near-identical prompts, 0 = exact match only
+
+    # --- LLM Gateway (shared by core_ai and the specialist services) ---
+    LLM_GATEWAY_MAX_CONCURRENCY: int = 16 # Concurrent requests per model
+    LLM_GATEWAY_DEFAULT_RPM: float = 0 # Requests per minute per model, 0 = unlimited
+    LLM_GATEWAY_DEFAULT_TPM: float = 0 # Tokens per minute per model, 0 = unlimited
+    LLM_GATEWAY_MODEL_LIMITS: Dict[str, Dict[str, float]] = {} # e.g. {"gpt-4o": {"max_concurrency": 8, "rpm": 500, "tpm": 30000}}
+    LLM_GATEWAY_MAX_RETRIES: int = 4 # Retries on 429/5xx/connection errors
+    LLM_GATEWAY_BACKOFF_BASE: float = 0.5 # Seconds; full-jitter exponential backoff
+    LLM_GATEWAY_BACKOFF_MAX: float = 20.0
+    LLM_GATEWAY_MAX_CONNECTIONS: int = 100
+    # Hedged requests for decomposition / synthesis (duplicate call after the p95 latency)
+    HEDGING_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0 # Latency percentile of recent calls after which a hedge fires
+    HEDGE_MIN_DELAY: float = 0.05 # Seconds, lower bound on the hedge delay
+    HEDGE_MIN_SAMPLES: int = 20 # Latencies observed before hedging starts
+    HEDGE_MAX_RATE: float = 0.1 # Max fraction of recent calls that may be hedged
+    DECOMPOSITION_FALLBACK_MODEL: str = "gpt-4o-mini" # Hedge target for decomposition (not hedged if it equals DECOMPOSITION_MODEL)
+    SYNTHESIS_FALLBACK_MODEL: str = "gpt-4o-mini" # Hedge target for synthesis
+
+    # --- Telemetry ---
+    TRACING_ENABLED: bool = True # Pipeline stage spans -> /metrics histograms and structured span logs
+    TRACING_LOGGER_NAME: str = "colab.trace" # Logger receiving one structured record per finished span (INFO)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json" # 'json' (one object per line) or 'text'
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1 # Fraction of requests whose DEBUG lines are kept
+    LOG_QUEUE_SIZE: int = 10000 # Records buffered for the writer thread; overflow is dropped, never blocks
+    LOG_MAX_FIELD_CHARS: int = 2000 # Longer field values (e.g. raw LLM responses) are truncated
 
     # --- Sub-AI Endpoints (Example - Consider a better discovery mechanism later) ---
     SUB_AI_CODE_GENERATION_URL: str = "http://localhost:8001/invoke"
@@ -58,6 +116,17 @@ class Settings(BaseSettings):
     SUB_AI_QA_URL: str = "http://localhost:8005/invoke"
     SUB_AI_DATA_ANALYSIS_URL: str = "http://localhost:8006/invoke"
     SUB_AI_DYNAMIC_BASE_URL: str = "http://localhost:8003/invoke"
+    # Connection pooling for Sub-AI HTTP calls (one pooled client per specialist)
+    SUB_AI_HTTP_MAX_CONNECTIONS: int = 20
+    SUB_AI_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    SUB_AI_HTTP_KEEPALIVE_EXPIRY: float = 30.0 # Seconds an idle connection is kept open
+    SUB_AI_HTTP2_ENABLED: bool = True # Only takes effect if the 'h2' package is installed
+    # Result cache for Sub-AI invocations, keyed by (target, normalized payload)
+    SUB_AI_RESULT_CACHE_ENABLED: bool = True
+    SUB_AI_RESULT_CACHE_MAX_ENTRIES: int = 10000
+    SUB_AI_RESULT_CACHE_DEFAULT_TTL: float = 600.0 # Seconds, for targets without an override
+    SUB_AI_RESULT_CACHE_TTLS: Dict[str, float] = {} # Per-target overrides, e.g. {"DynamicBaseModel": 0} (0 disables)
+    SUB_AI_RESULT_CACHE_ERROR_TTL: float = 5.0 # Seconds HTTP/network errors are remembered (0 disables)
 
     # --- Tokenomics V1 Config ---
     TOKEN_BASE_FEE: float = 1.0
@@ -67,6 +136,9 @@ class Settings(BaseSettings):
     TOKEN_INVOCATION_SIMPLE_FIXED: float = 2.0
     TOKEN_INVOCATION_COMPLEX_FIXED: float = 5.0
     TOKEN_INVOCATION_DYNAMIC: float = 10.0
+    TOKEN_CACHE_HIT_CHARGE_POLICY: str = "base_fee" # 'free', 'base_fee' or 'full' for cached answers
+    TOKEN_CACHED_INVOCATION_RATE: float = 0.0 # Fraction of the invocation cost charged for sub-tasks served from the Sub-AI result cache
+    TOKEN_HOLD_TTL_SECONDS: float = 300.0 # A query's hold on the user's balance lapses after this long if never captured or released
     TOKEN_REWARD_PER_MB: float = 0.01
     TOKEN_METADATA_BONUS: float = 0.5
     REWARD_REQUIRED_METADATA_FIELDS: List[str] = ["filename", "description", "tags"]
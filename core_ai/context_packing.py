@@ -0,0 +1,220 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from .models import SubTask, SubAIResponse
+from ..config.settings import settings
+from ..utils.log import get_logger
+
+try:
+    import tiktoken
+except ImportError: # Optional: without it token counts are estimated from length
+    tiktoken = None
+
+logger = get_logger(__name__)
+
+# --- Packing Config (Load from Settings) ---
+# Token budget for all sub-task blocks in the synthesis prompt (instructions, statuses and responses)
+SYNTHESIS_CONTEXT_TOKEN_BUDGET = int(getattr(settings, "SYNTHESIS_CONTEXT_TOKEN_BUDGET", 6000))
+# Floor on each successful response's share, so low-relevance responses are condensed rather than dropped
+SYNTHESIS_MIN_RESPONSE_TOKENS = int(getattr(settings, "SYNTHESIS_MIN_RESPONSE_TOKENS", 64))
+
+TRUNCATION_MARKER = " ...[truncated]"
+CONDENSED_MARKER = " ...[condensed]"
+_CONTENT_FRAME = "Response Content:\n```\n{body}\n```"
+# Relevance weight of a response sharing no terms with the prompt; full overlap weighs RELEVANCE_FLOOR + 1
+RELEVANCE_FLOOR = 0.5
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]{3,}")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has his how its may new now see two who "
+    "did get let put say she too use what when where which with this that from have they will your into than "
+    "then them these those there their been were also about would could should".split()
+)
+
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tiktoken encoding when tiktoken is installed and
+    the encoding can be loaded, otherwise estimates them from length (~4 characters
+    per token, as in routing).
+    """
+
+    def __init__(self, model: str):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(model)
+                except KeyError: # Model unknown to this tiktoken version
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e: # e.g. the BPE file cannot be downloaded when offline
+                logger.warning("Could not load tiktoken encoding, estimating token counts from length", model=model, error=str(e))
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Returns the longest prefix of `text` of at most `max_tokens` tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+        return text[:max(0, (max_tokens - 1) * 4)]
+
+
+_counters: Dict[str, TokenCounter] = {}
+
+def get_token_counter(model: str) -> TokenCounter:
+    """Returns the shared TokenCounter for `model` (a length-estimating one if its encoding failed to load)."""
+    counter = _counters.get(model)
+    if counter is None:
+        counter = TokenCounter(model)
+        _counters[model] = counter
+    return counter
+
+
+def _terms(text: str) -> Set[str]:
+    return {term for term in _TERM_PATTERN.findall(text.lower()) if term not in _STOPWORDS}
+
+
+def _drop_nulls(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _drop_nulls(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(item) for item in value if item is not None]
+    return value
+
+
+def compact_content(content: Any) -> str:
+    """Renders response content for the prompt: dicts/lists as compact JSON without nulls, the rest as text."""
+    if isinstance(content, (dict, list)):
+        return json.dumps(_drop_nulls(content), separators=(",", ":"), ensure_ascii=False, default=str)
+    return str(content).strip()
+
+
+def relevance_weight(text: str, query_terms: Set[str]) -> float:
+    """RELEVANCE_FLOOR plus the fraction of the query's terms that appear in `text`."""
+    if not query_terms:
+        return RELEVANCE_FLOOR + 1.0
+    return RELEVANCE_FLOOR + len(query_terms & _terms(text)) / len(query_terms)
+
+
+def allocate_budget(sizes: List[int], weights: List[float], budget: int) -> List[int]:
+    """
+    Splits `budget` in proportion to `weights`, capping each share at its size:
+    whatever a small item does not need is redistributed among the larger ones
+    (water-filling), so the budget is only cut where it has to be.
+    """
+    allocations = [0] * len(sizes)
+    remaining = {i for i, size in enumerate(sizes) if size > 0}
+    left = max(0, budget)
+    while remaining:
+        total_weight = sum(weights[i] for i in remaining)
+        fitting = [i for i in remaining if sizes[i] <= left * weights[i] / total_weight]
+        if not fitting:
+            for i in remaining:
+                allocations[i] = int(left * weights[i] / total_weight)
+            break
+        for i in fitting:
+            allocations[i] = sizes[i]
+            left -= sizes[i]
+            remaining.discard(i)
+    return allocations
+
+
+def condense(text: str, max_tokens: int, query_terms: Set[str], counter: TokenCounter) -> str:
+    """
+    Shrinks `text` to about `max_tokens` tokens. Prose is condensed extractively,
+    keeping the sentences that share the most terms with the query (in their
+    original order); JSON and single-sentence text are truncated.
+    """
+    if counter.count(text) <= max_tokens:
+        return text
+    sentences = [s for s in _SENTENCE_SPLIT.split(text) if s.strip()]
+    if text[:1] in "{[" or len(sentences) < 2:
+        room = max_tokens - counter.count(TRUNCATION_MARKER)
+        return counter.truncate(text, room) + TRUNCATION_MARKER
+
+    room = max_tokens - counter.count(CONDENSED_MARKER)
+    # Earlier sentences win ties (and get a small bonus): they tend to carry the answer
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (len(query_terms & _terms(sentences[i])) + (0.5 if i == 0 else 0.0), -i),
+        reverse=True,
+    )
+    kept: List[int] = []
+    used = 0
+    for i in ranked:
+        cost = counter.count(sentences[i]) + 1 # Joining space
+        if used + cost <= room:
+            kept.append(i)
+            used += cost
+    if not kept: # Even the best sentence is too long
+        return counter.truncate(sentences[ranked[0]], room) + CONDENSED_MARKER
+    return " ".join(sentences[i] for i in sorted(kept)) + CONDENSED_MARKER
+
+
+def pack_synthesis_context(
+    original_prompt: str,
+    sub_tasks: List[SubTask],
+    sub_ai_responses: List[SubAIResponse],
+    model: str,
+    budget: Optional[int] = None,
+) -> str:
+    """
+    Formats the sub-tasks and their responses for the synthesis prompt within a
+    token budget (SYNTHESIS_CONTEXT_TOKEN_BUDGET by default).
+
+    Instructions, sources and error statuses are always included. What remains of
+    the budget is split among the successful responses in proportion to their
+    relevance to the original prompt and sub-task instruction; responses larger
+    than their share are condensed (see condense()). Each response keeps at least
+    SYNTHESIS_MIN_RESPONSE_TOKENS, so the budget can be exceeded by that much per
+    response when there are very many.
+    """
+    budget = SYNTHESIS_CONTEXT_TOKEN_BUDGET if budget is None else budget
+    counter = get_token_counter(model)
+    response_map: Dict[str, SubAIResponse] = {res.sub_task_id: res for res in sub_ai_responses}
+    prompt_terms = _terms(original_prompt)
+
+    headers: List[str] = []
+    bodies: List[Optional[str]] = [] # Successful response content, compacted
+    task_terms: List[Set[str]] = []
+    for task in sub_tasks:
+        response = response_map.get(task.sub_task_id)
+        lines = [f"\nSub-Task Instruction: {task.instruction}"]
+        body = None
+        if response is None:
+            lines.append("Response: [No response received for this sub-task]")
+        else:
+            lines.append(f"Source AI: {response.source_sub_ai_id}")
+            if response.status == "success":
+                body = compact_content(response.content)
+            else:
+                lines.append(f"Response Status: {response.status}")
+                if response.error_message:
+                    lines.append(f"Error: {response.error_message}")
+        headers.append("\n".join(lines))
+        bodies.append(body)
+        task_terms.append(prompt_terms | _terms(task.instruction))
+
+    fixed_tokens = sum(counter.count(header) for header in headers)
+    fixed_tokens += counter.count(_CONTENT_FRAME) * sum(body is not None for body in bodies)
+    sizes = [counter.count(body) if body is not None else 0 for body in bodies]
+    weights = [relevance_weight(body, terms) if body is not None else 0.0 for body, terms in zip(bodies, task_terms)]
+    allocations = allocate_budget(sizes, weights, budget - fixed_tokens)
+
+    parts = ["--- Relevant Information from Sub-Tasks ---"]
+    for header, body, size, allocation, terms in zip(headers, bodies, sizes, allocations, task_terms):
+        parts.append(header)
+        if body is not None:
+            if size > allocation:
+                body = condense(body, max(allocation, SYNTHESIS_MIN_RESPONSE_TOKENS), terms, counter)
+            parts.append(_CONTENT_FRAME.format(body=body))
+    parts.append("\n--- End Relevant Information ---\n")
+    return "\n".join(parts)
@@ -1,26 +1,100 @@
 import json
-from typing import List
-from openai import AsyncOpenAI # Use AsyncOpenAI for non-blocking calls
+from typing import Dict, List, Optional
 import pydantic
+from pydantic import BaseModel, Field
 
 from .models import SubTask
-from ..config import settings # To get API keys, etc.
-
-# Initialize the Async OpenAI client
-# Ensure OPENAI_API_KEY is set in your environment or .env file
-# loaded by settings.py
-try:
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    # Note: For Anthropic, you'd use:
-    # from anthropic import AsyncAnthropic
-    # client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY) # Assuming key is in settings
-except Exception as e:
-    print(f"Error initializing LLM client: {e}. Make sure API key is set.")
-    client = None
-
-# Define a Pydantic model for the expected JSON structure from the LLM
+from .embedding_cache import normalize_text
+from ..config.settings import settings # To get API keys, etc.
+from ..utils.ttl_cache import TTLCache, MISSING
+from ..utils.single_flight import SingleFlight
+from ..utils.llm_gateway import llm_gateway
+from ..utils.hedging import hedge_policy_from_settings
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# LLM calls go through the shared gateway (AsyncOpenAI-compatible, with concurrency/rate
+# limits, retries and usage metrics). Ensure OPENAI_API_KEY is set in your environment or
+# .env file loaded by settings.py; the gateway is None if its client could not be created.
+client = llm_gateway
+
+DECOMPOSITION_MODEL = getattr(settings, "DECOMPOSITION_MODEL", "gpt-3.5-turbo") # Or another suitable model like gpt-4o-mini, claude-3-haiku-20240307
+# Model for hedged requests when the primary is slow (see utils/hedging.py; off unless HEDGING_ENABLED)
+DECOMPOSITION_FALLBACK_MODEL = getattr(settings, "DECOMPOSITION_FALLBACK_MODEL", "gpt-4o-mini")
+decomposition_hedge = hedge_policy_from_settings("decomposition")
+if DECOMPOSITION_FALLBACK_MODEL == DECOMPOSITION_MODEL:
+    decomposition_hedge.enabled = False # A hedge to the same model only duplicates the call
+
+# --- Decomposition Memoization (Load from Settings) ---
+DECOMPOSITION_CACHE_ENABLED = bool(getattr(settings, "DECOMPOSITION_CACHE_ENABLED", True))
+DECOMPOSITION_CACHE_MAX_ENTRIES = int(getattr(settings, "DECOMPOSITION_CACHE_MAX_ENTRIES", 5000))
+DECOMPOSITION_CACHE_TTL_SECONDS = float(getattr(settings, "DECOMPOSITION_CACHE_TTL_SECONDS", 86400.0))
+
+# Define Pydantic models for the expected JSON structure from the LLM
+class DecomposedTask(BaseModel):
+    id: Optional[str] = None # Short label chosen by the LLM (e.g. "t1"), only used to express dependencies
+    instruction: str
+    depends_on: List[str] = Field(default_factory=list)
+
 class DecomposedTasksResponse(BaseModel):
-    sub_tasks: List[SubTask]
+    sub_tasks: List[DecomposedTask]
+
+# Validated decompositions keyed on (model, normalized prompt). Only the primary model's
+# answers are stored, so a hedged fallback never stands in for it on later hits. The LLM's
+# labels are cached rather than SubTasks, so every hit gets freshly generated sub_task_ids.
+decomposition_cache: Optional[TTLCache[DecomposedTasksResponse]] = (
+    TTLCache(max_entries=DECOMPOSITION_CACHE_MAX_ENTRIES, ttl_seconds=DECOMPOSITION_CACHE_TTL_SECONDS)
+    if DECOMPOSITION_CACHE_ENABLED else None
+)
+
+# Concurrent decompositions of the same prompt share one LLM call
+_decomposition_flight = SingleFlight("decomposition")
+
+def _decomposition_cache_key(prompt_text: str) -> tuple:
+    return (DECOMPOSITION_MODEL, normalize_text(prompt_text))
+
+def _to_sub_tasks(decomposed: List[DecomposedTask]) -> List[SubTask]:
+    """
+    Converts the LLM's tasks into SubTasks, translating its labels in `depends_on`
+    into the generated sub_task_ids. Unknown labels and self-references are dropped.
+    """
+    sub_tasks = [SubTask(instruction=task.instruction) for task in decomposed]
+    id_map: Dict[str, str] = {
+        task.id: sub_task.sub_task_id for task, sub_task in zip(decomposed, sub_tasks) if task.id
+    }
+    for task, sub_task in zip(decomposed, sub_tasks):
+        sub_task.depends_on = [
+            id_map[label] for label in dict.fromkeys(task.depends_on)
+            if label in id_map and id_map[label] != sub_task.sub_task_id
+        ]
+    _break_dependency_cycles(sub_tasks)
+    return sub_tasks
+
+def _break_dependency_cycles(sub_tasks: List[SubTask]):
+    """
+    Ensures the dependencies form a DAG by dropping every edge that closes a cycle
+    (a back edge in a depth-first traversal). Other dependencies are kept.
+    """
+    by_id: Dict[str, SubTask] = {task.sub_task_id: task for task in sub_tasks}
+    state: Dict[str, str] = {} # 'visiting' or 'done'
+
+    def visit(task: SubTask):
+        state[task.sub_task_id] = "visiting"
+        kept: List[str] = []
+        for dep in task.depends_on:
+            if state.get(dep) == "visiting":
+                logger.warning("Dropping cyclic dependency", sub_task_id=task.sub_task_id, depends_on=dep)
+                continue
+            if dep not in state:
+                visit(by_id[dep])
+            kept.append(dep)
+        task.depends_on = kept
+        state[task.sub_task_id] = "done"
+
+    for task in sub_tasks:
+        if task.sub_task_id not in state:
+            visit(task)
 
 async def decompose_prompt(prompt_text: str) -> List[SubTask]:
     """
@@ -35,6 +109,27 @@ async def decompose_prompt(prompt_text: str) -> List[SubTask]:
     Raises:
         Exception: If the API call fails or the response is invalid.
     """
+    cache_key = _decomposition_cache_key(prompt_text)
+    if decomposition_cache is not None:
+        cached = decomposition_cache.get(cache_key)
+        if cached is not MISSING:
+            sub_tasks = _to_sub_tasks(cached.sub_tasks)
+            logger.debug("Decomposition cache hit", sub_task_count=len(sub_tasks), cache_stats=decomposition_cache.stats)
+            return sub_tasks
+
+    validated_response = await _decomposition_flight.do(cache_key, lambda: decomposition_hedge.run(
+        lambda: _decompose_with_llm(prompt_text, cache_key, DECOMPOSITION_MODEL),
+        lambda: _decompose_with_llm(prompt_text, cache_key, DECOMPOSITION_FALLBACK_MODEL)
+    ))
+    sub_tasks = _to_sub_tasks(validated_response.sub_tasks)
+    logger.info(
+        "Decomposed prompt into %d sub-tasks", len(sub_tasks),
+        sub_task_count=len(sub_tasks), with_dependencies=sum(1 for task in sub_tasks if task.depends_on)
+    )
+    return sub_tasks
+
+async def _decompose_with_llm(prompt_text: str, cache_key: tuple, model: str) -> DecomposedTasksResponse:
+    """Calls the Decomposer LLM and returns its validated response (stored in the cache if `model` is the primary)."""
     if not client:
         raise Exception("LLM Client not initialized. Check API key configuration.")
 
@@ -42,8 +137,10 @@ async def decompose_prompt(prompt_text: str) -> List[SubTask]:
 You are a task decomposition agent. Analyze the following user request and break it down into distinct,
 self-contained sub-tasks that require specialized knowledge or actions. For each sub-task, formulate a clear instruction.
 Output the results ONLY as a valid JSON object containing a single key "sub_tasks", which is a list of objects,
-where each object has an "instruction" key with the sub-task description. Example:
-{"sub_tasks": [{"instruction": "Sub-task 1 description"}, {"instruction": "Sub-task 2 description"}]}
+where each object has an "id" key with a short label (e.g. "t1"), an "instruction" key with the sub-task description
+and a "depends_on" key listing the ids of sub-tasks whose results it needs as input. Leave "depends_on" empty
+unless the sub-task genuinely cannot be done without another sub-task's output, so independent sub-tasks can run in parallel. Example:
+{"sub_tasks": [{"id": "t1", "instruction": "Sub-task 1 description", "depends_on": []}, {"id": "t2", "instruction": "Sub-task 2 description using the result of sub-task 1", "depends_on": ["t1"]}]}
 """
 
     messages = [
@@ -52,35 +149,34 @@ where each object has an "instruction" key with the sub-task description. Exampl
     ]
 
     try:
-        print(f"Sending prompt to Decomposer LLM: '{prompt_text[:100]}...'")
+        logger.debug("Sending prompt to Decomposer LLM", model=model, prompt=prompt_text)
         # Using OpenAI's chat completions endpoint with JSON mode
         response = await client.chat.completions.create(
-            model="gpt-3.5-turbo", # Or another suitable model like gpt-4o-mini, claude-3-haiku-20240307
+            model=model,
             messages=messages,
             response_format={"type": "json_object"}, # Enforce JSON output
             temperature=0.2, # Lower temperature for more deterministic decomposition
         )
 
         response_content = response.choices[0].message.content
-        print(f"Received raw response from Decomposer LLM: {response_content}")
+        logger.debug("Received raw response from Decomposer LLM", model=model, raw_response=response_content)
 
         # Parse and validate the JSON response using Pydantic
         try:
             # The response content should be a JSON string
             parsed_json = json.loads(response_content)
             validated_response = DecomposedTasksResponse.model_validate(parsed_json)
-            print(f"Successfully decomposed into {len(validated_response.sub_tasks)} sub-tasks.")
-            return validated_response.sub_tasks
+            if decomposition_cache is not None and validated_response.sub_tasks and model == DECOMPOSITION_MODEL:
+                decomposition_cache.put(cache_key, validated_response)
+            return validated_response
         except json.JSONDecodeError as json_err:
-            print(f"Error decoding LLM JSON response: {json_err}")
-            print(f"Raw response was: {response_content}")
+            logger.error("Error decoding LLM JSON response", error=str(json_err), raw_response=response_content)
             raise Exception(f"Failed to decode JSON from LLM: {json_err}")
         except pydantic.ValidationError as val_err:
-            print(f"Error validating LLM response structure: {val_err}")
-            print(f"Raw response was: {response_content}")
+            logger.error("Error validating LLM response structure", error=str(val_err), raw_response=response_content)
             raise Exception(f"Invalid response structure from LLM: {val_err}")
 
     except Exception as e:
-        print(f"Error calling Decomposer LLM API: {e}")
+        logger.error("Error calling Decomposer LLM API", model=model, error=str(e))
         # Re-raise the exception to be handled by the orchestrator
         raise Exception(f"Decomposer LLM API call failed: {e}")
\ No newline at end of file
@@ -0,0 +1,184 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..config.settings import settings
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# --- Cache Config (Load from Settings) ---
+EMBEDDING_CACHE_ENABLED = bool(getattr(settings, "EMBEDDING_CACHE_ENABLED", True))
+EMBEDDING_CACHE_MAX_ENTRIES = int(getattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 10000))
+# The on-disk tier is only enabled when EMBEDDING_CACHE_DB_PATH is set
+EMBEDDING_CACHE_DB_PATH = getattr(settings, "EMBEDDING_CACHE_DB_PATH", "")
+EMBEDDING_CACHE_MAX_DISK_ENTRIES = int(getattr(settings, "EMBEDDING_CACHE_MAX_DISK_ENTRIES", 500000))
+
+
+def normalize_text(text: str) -> str:
+    """Collapses runs of whitespace so trivially different texts share a cache entry."""
+    return " ".join(text.split())
+
+def make_cache_key(text: str, model: str, dimensions: Optional[int]) -> str:
+    """Builds the content-addressed key for a (model, dimensions, text) triple."""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions or 0}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for embedding vectors.
+
+    The front tier is an in-memory LRU bounded by `max_entries`. The optional
+    persistent tier is a SQLite table holding float32 vectors, bounded by
+    `max_disk_entries` (oldest rows are evicted first).
+    Disk hits are promoted into the memory tier.
+    """
+
+    def __init__(self, max_entries: int = 10000, db_path: Optional[str] = None, max_disk_entries: int = 500000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " key TEXT PRIMARY KEY,"
+                    " vector BLOB NOT NULL,"
+                    " created_at REAL NOT NULL DEFAULT (julianday('now')))"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_created_at ON embeddings (created_at)")
+                self._db.commit()
+                (self._disk_count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            except Exception as e:
+                logger.error("Error opening embedding cache database, using memory tier only", db_path=db_path, error=str(e))
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @property
+    def persistent(self) -> bool:
+        """Whether the on-disk tier is open (lookups and stores then do blocking SQLite I/O)."""
+        return self._db is not None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Looks up several keys at once.
+
+        Returns:
+            A dict of the keys that were found (memory or disk) to their vectors.
+        """
+        found: Dict[str, List[float]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.append(key)
+
+            if missing and self._db is not None:
+                for key, vector in self._read_disk(missing).items():
+                    found[key] = vector
+                    self._store_memory(key, vector)
+                    self.stats["disk_hits"] += 1
+
+            self.stats["misses"] += sum(1 for key in missing if key not in found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Stores vectors in both tiers."""
+        if not items:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._store_memory(key, vector)
+            if self._db is not None:
+                self._write_disk(items)
+
+    def clear(self):
+        """Drops all entries from both tiers (stats are kept)."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._disk_count = 0
+
+    def close(self):
+        """Closes the on-disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- Internal helpers (caller holds the lock) ---
+
+    def _store_memory(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        results: Dict[str, List[float]] = {}
+        try:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk)
+                for key, blob in rows:
+                    results[key] = array("f", blob).tolist()
+        except Exception as e:
+            logger.error("Error reading embedding cache database", error=str(e))
+        return results
+
+    def _write_disk(self, items: Dict[str, List[float]]):
+        try:
+            rows: List[Tuple[str, bytes]] = [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+            # Keys are content-addressed, so an existing row already holds the same vector
+            cursor = self._db.executemany("INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._disk_count += max(cursor.rowcount, 0)
+            overflow = self._disk_count - self.max_disk_entries
+            if overflow > 0:
+                cursor = self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY created_at LIMIT ?)",
+                    (overflow,)
+                )
+                self._disk_count -= cursor.rowcount
+                self.stats["disk_evictions"] += cursor.rowcount
+            self._db.commit()
+        except Exception as e:
+            logger.error("Error writing embedding cache database", error=str(e))
+
+
+# Process-wide cache instance used by core_ai.routing
+embedding_cache: Optional[EmbeddingCache] = None
+if EMBEDDING_CACHE_ENABLED:
+    embedding_cache = EmbeddingCache(
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        db_path=EMBEDDING_CACHE_DB_PATH or None,
+        max_disk_entries=EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+    )
@@ -9,6 +9,7 @@ class UserInput(BaseModel):
     session_id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()))
     prompt: str = Field(..., description="The user's natural language prompt.")
     user_id: Optional[str] = None # Optional user identifier for context/personalization/billing
+    use_response_cache: bool = True # Set False to opt out of reading or populating the shared response cache
     # Add other potential fields like preferred_response_format, context_window_size etc.
 
 class SubTask(BaseModel):
@@ -18,7 +19,8 @@ class SubTask(BaseModel):
     sub_task_id: str = Field(default_factory=lambda: f"subtask_{uuid.uuid4()}")
     instruction: str = Field(..., description="The specific instruction for the Sub-AI.")
     original_prompt_ref: Optional[str] = None # Reference to the original UserInput prompt ID if needed
-    # Potential future fields: required_domain, priority, dependencies
+    depends_on: List[str] = Field(default_factory=list, description="sub_task_ids whose responses this sub-task needs as input.")
+    # Potential future fields: required_domain, priority
 
 class SubAIResponse(BaseModel):
     """
@@ -38,6 +40,8 @@ class FinalResponse(BaseModel):
     session_id: str
     original_prompt: str
     synthesized_answer: str = Field(..., description="The final, coherent answer generated by the Synthesizer LLM.")
-    status: str = Field(default="success", description="Overall status ('success', 'partial_success', 'error').")
+    status: str = Field(default="success", description="Overall status ('success', 'partial_success', 'success_cached', 'error').")
     error_message: Optional[str] = None
+    cache_similarity: Optional[float] = Field(default=None, description="For 'success_cached' responses: 1.0 for an exact prompt match, else the cosine similarity of the matched prompt.")
+    missing_sub_task_ids: Optional[List[str]] = Field(default=None, description="Sub-tasks that failed or did not finish before synthesis (set when status is 'partial_success').")
     # Potential future fields: attribution_details, cost_in_tokens
\ No newline at end of file
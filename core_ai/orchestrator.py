@@ -1,30 +1,274 @@
-from typing import List, Any
+from typing import List, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
 from .models import UserInput, SubTask, SubAIResponse, FinalResponse
 from .decomposition import decompose_prompt
-from .routing import route_sub_tasks, RoutingDecision
+from .routing import route_sub_tasks, generate_embedding, RoutingDecision
+from .response_cache import response_cache, CachedResponse
 from ..sub_ai.client import invoke_sub_ai
-from .synthesis import synthesize_responses
+from .synthesis import synthesize_responses, synthesize_responses_stream
 # Import tokenomics service functions
-from ..tokenomics.service import calculate_query_cost, charge_user_for_query
-# from ..config import settings # Example for accessing settings
+from ..tokenomics.service import (
+    calculate_query_cost, calculate_actual_query_cost, calculate_cache_hit_cost, charge_user_for_query,
+    place_query_hold, capture_query_hold, release_query_hold,
+)
+from ..config.settings import settings
+from ..utils.telemetry import span
+from ..utils.log import get_logger
 
 import asyncio
 
+logger = get_logger(__name__)
+
+# --- Progressive Orchestration Policy (Load from Settings) ---
+# Time budget (seconds from receiving the prompt) after which synthesis starts with whatever has arrived
+ORCHESTRATION_DEADLINE_SECONDS = float(getattr(settings, "ORCHESTRATION_DEADLINE_SECONDS", 60.0))
+# Fraction of sub-tasks that must have succeeded before synthesis may start without waiting for stragglers
+ORCHESTRATION_QUORUM = float(getattr(settings, "ORCHESTRATION_QUORUM", 0.75))
+# If True, synthesis never starts early while a fixed specialist is still running
+ORCHESTRATION_WAIT_FOR_FIXED = bool(getattr(settings, "ORCHESTRATION_WAIT_FOR_FIXED", True))
+# If True, Sub-AI invocations start while the hold is being placed instead of after it
+# (and are cancelled if it is refused), taking the ledger off the critical path
+ORCHESTRATION_OPTIMISTIC_CHARGE = bool(getattr(settings, "ORCHESTRATION_OPTIMISTIC_CHARGE", False))
+
+# Callback used to report pipeline progress events (see process_user_prompt_stream)
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+async def _noop_event(event: Dict[str, Any]) -> None:
+    return None
+
 async def process_user_prompt(user_input: UserInput) -> FinalResponse:
     """
     Main orchestration function for processing a user prompt through the Co-Lab pipeline.
-    Includes cost calculation and charging the user.
+    Includes cost calculation and charging the user: a hold for the estimated cost is
+    placed before any Sub-AI is invoked (or, with ORCHESTRATION_OPTIMISTIC_CHARGE, while
+    they are invoked, cancelling them if it is refused), and the actual cost is captured
+    after synthesis (or the hold released if the query fails).
+
+    Args:
+        user_input: The UserInput object containing the prompt and session info.
+
+    Returns:
+        A FinalResponse object containing the synthesized answer or an error.
+    """
+    return await _run_pipeline(user_input)
+
+async def process_user_prompt_stream(user_input: UserInput) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of process_user_prompt.
+
+    Yields JSON-serializable event dicts as the pipeline progresses:
+    'decomposed', 'routed', 'charged' (the estimated cost is held), one 'sub_task_done'
+    per Sub-AI invocation, 'synthesis_token' for each chunk of the synthesized answer,
+    'settled' with the actual cost captured, and finally 'final' carrying the complete
+    FinalResponse. A response cache hit emits 'cache_hit' and
+    'charged', then the whole cached answer as one 'synthesis_token'.
+
+    Args:
+        user_input: The UserInput object containing the prompt and session info.
+    """
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    async def _run():
+        try:
+            final_response = await _run_pipeline(user_input, on_event=queue.put, stream_synthesis=True)
+            await queue.put({"event": "final", "response": final_response.model_dump()})
+        finally:
+            await queue.put(None) # Sentinel: no more events
+
+    pipeline_task = asyncio.create_task(_run())
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+    finally:
+        # If the consumer goes away (e.g. client disconnect), stop the pipeline
+        if not pipeline_task.done():
+            pipeline_task.cancel()
+
+def _quorum_reached(pending: List[RoutingDecision], successful_count: int, total: int) -> bool:
+    """Decides whether synthesis can start before every invocation has finished."""
+    if not pending:
+        return True
+    if ORCHESTRATION_WAIT_FOR_FIXED and any(d.route_type == 'fixed_specialist' for d in pending):
+        return False
+    return successful_count > 0 and successful_count / total >= ORCHESTRATION_QUORUM
+
+async def _execute_sub_task_graph(
+    routing_decisions: List[RoutingDecision],
+    deadline: float,
+    on_event: EventCallback
+) -> Tuple[List[SubAIResponse], List[str]]:
+    """
+    Executes the sub-task dependency graph with maximal parallelism: every sub-task is
+    invoked as soon as all of its `depends_on` sub-tasks have finished, receiving their
+    responses as context. Sub-tasks whose dependencies did not succeed are skipped.
+
+    Responses are collected as they complete, stopping as soon as the quorum policy is
+    satisfied or the deadline (event loop time) passes. Invocations still running at
+    that point are cancelled.
+
+    Returns:
+        (responses received, sub_task_ids that were still outstanding)
+    """
+    loop = asyncio.get_running_loop()
+    known_ids = {decision.sub_task.sub_task_id for decision in routing_decisions}
+    waiting: Dict[str, RoutingDecision] = {decision.sub_task.sub_task_id: decision for decision in routing_decisions}
+    running: Dict[asyncio.Task, RoutingDecision] = {}
+    results: Dict[str, SubAIResponse] = {}
+    responses: List[SubAIResponse] = []
+    successful_count = 0
+
+    async def _record(response: SubAIResponse):
+        nonlocal successful_count
+        results[response.sub_task_id] = response
+        responses.append(response)
+        if response.status == "success":
+            successful_count += 1
+        await on_event({
+            "event": "sub_task_done",
+            "sub_task_id": response.sub_task_id,
+            "source_sub_ai_id": response.source_sub_ai_id,
+            "status": response.status,
+        })
+
+    async def _launch_ready():
+        # Skipping a sub-task can unblock its own dependants, so repeat until nothing changes
+        launched = True
+        while launched:
+            launched = False
+            for sub_task_id, decision in list(waiting.items()):
+                dependencies = [dep for dep in decision.sub_task.depends_on if dep in known_ids]
+                if any(dep not in results for dep in dependencies):
+                    continue
+                del waiting[sub_task_id]
+                launched = True
+                failed = [dep for dep in dependencies if results[dep].status != "success"]
+                if failed:
+                    await _record(SubAIResponse(
+                        sub_task_id=sub_task_id,
+                        source_sub_ai_id="orchestrator",
+                        content=None,
+                        status="error",
+                        error_message=f"Skipped: upstream sub-task(s) {', '.join(failed)} did not succeed."
+                    ))
+                    continue
+                upstream = [results[dep] for dep in dependencies]
+                # Tasks copy the current context, so each invocation's span is a child of 'sub_ai_execution'
+                running[asyncio.ensure_future(invoke_sub_ai(decision, upstream_responses=upstream))] = decision
+
+    try:
+        await _launch_ready()
+        while running:
+            pending = list(waiting.values()) + list(running.values())
+            if _quorum_reached(pending, successful_count, len(routing_decisions)):
+                logger.info("Quorum reached, not waiting for stragglers", successful=successful_count, total=len(routing_decisions), stragglers=len(pending))
+                break
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.warning("Orchestration deadline reached", outstanding=len(pending))
+                break
+            done, _ = await asyncio.wait(running.keys(), timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.pop(task)
+                await _record(task.result())
+            await _launch_ready()
+        if waiting and not running:
+            # Only reachable if dependencies could never be satisfied (decompose_prompt breaks cycles)
+            logger.warning("Sub-tasks have unsatisfiable dependencies", count=len(waiting))
+    finally:
+        # Dropped stragglers are cancelled down to their HTTP requests and awaited, so none keeps running
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    missing_ids = [decision.sub_task.sub_task_id for decision in list(running.values()) + list(waiting.values())]
+    return responses, missing_ids
+
+async def _execute_in_span(
+    routing_decisions: List[RoutingDecision],
+    deadline: float,
+    on_event: EventCallback
+) -> Tuple[List[SubAIResponse], List[str]]:
+    """_execute_sub_task_graph as the 'sub_ai_execution' stage."""
+    with span("sub_ai_execution", sub_task_count=len(routing_decisions)) as execution_span:
+        sub_ai_responses, missing_sub_task_ids = await _execute_sub_task_graph(routing_decisions, deadline, on_event)
+        execution_span.set_attribute("missing_count", len(missing_sub_task_ids))
+    return sub_ai_responses, missing_sub_task_ids
+
+async def _cancel(task: asyncio.Future):
+    """Cancels the task and waits until it has finished cleaning up."""
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+def _charge_failed_response(user_input: UserInput) -> FinalResponse:
+    return FinalResponse(
+        session_id=user_input.session_id,
+        original_prompt=user_input.prompt,
+        synthesized_answer="",
+        status="error_charge_failed",
+        error_message="Failed to charge for query (e.g., insufficient funds)."
+    )
+
+async def _answer_from_cache(
+    user_input: UserInput,
+    entry: CachedResponse,
+    similarity: float,
+    on_event: EventCallback
+) -> FinalResponse:
+    """Charges for and returns a cached answer, skipping the pipeline."""
+    logger.info("Response cache hit", session_id=user_input.session_id, similarity=similarity)
+    await on_event({"event": "cache_hit", "similarity": similarity})
+    with span("cost_calculation", cached=True):
+        query_cost = calculate_cache_hit_cost(entry.query_cost)
+    if not await charge_user_for_query(user_input.user_id, query_cost, session_id=user_input.session_id, reason="cache_hit"):
+        logger.warning("Charging failed, aborting", user_id=user_input.user_id, cost=query_cost)
+        return _charge_failed_response(user_input)
+    await on_event({"event": "charged", "cost": query_cost})
+    await on_event({"event": "synthesis_token", "text": entry.synthesized_answer})
+    return FinalResponse(
+        session_id=user_input.session_id,
+        original_prompt=user_input.prompt,
+        synthesized_answer=entry.synthesized_answer,
+        status="success_cached",
+        cache_similarity=similarity
+    )
+
+async def _run_pipeline(
+    user_input: UserInput,
+    on_event: EventCallback = _noop_event,
+    stream_synthesis: bool = False
+) -> FinalResponse:
+    """
+    Runs decomposition, routing, the hold on the estimated cost, Sub-AI invocation,
+    synthesis and settlement, reporting progress through `on_event`.
+
+    The run is traced as a 'pipeline' span with one child span per stage
+    (see utils/telemetry.py); stage durations are exported on /metrics.
 
     Args:
         user_input: The UserInput object containing the prompt and session info.
+        on_event: Awaited with an event dict after each pipeline stage.
+        stream_synthesis: If True, synthesis tokens are emitted as 'synthesis_token' events.
 
     Returns:
         A FinalResponse object containing the synthesized answer or an error.
     """
-    print(f"Received prompt for session {user_input.session_id}: {user_input.prompt}")
+    with span("pipeline", session_id=user_input.session_id, user_id=user_input.user_id) as pipeline_span:
+        final_response = await _run_stages(user_input, on_event, stream_synthesis)
+        pipeline_span.set_attribute("response_status", final_response.status)
+        if final_response.status.startswith("error"):
+            pipeline_span.set_status("error")
+        return final_response
+
+async def _run_stages(user_input: UserInput, on_event: EventCallback, stream_synthesis: bool) -> FinalResponse:
+    logger.info("Received prompt", session_id=user_input.session_id, prompt=user_input.prompt)
     # Check for user_id early if charging is mandatory
     if not user_input.user_id:
-        print(f"Error: user_id is required for charging. Session: {user_input.session_id}")
+        logger.error("user_id is required for charging", session_id=user_input.session_id)
         return FinalResponse(
             session_id=user_input.session_id,
             original_prompt=user_input.prompt,
@@ -35,13 +279,31 @@ async def process_user_prompt(user_input: UserInput) -> FinalResponse:
 
     sub_tasks: List[SubTask] = []
     sub_ai_responses: List[SubAIResponse] = []
+    hold_id: Optional[str] = None
+    settled = False
+    deadline = asyncio.get_running_loop().time() + ORCHESTRATION_DEADLINE_SECONDS
+    use_cache = response_cache is not None and user_input.use_response_cache
+    prompt_embedding: Optional[List[float]] = None
 
     try:
+        # 0. Response Cache (exact prompt match, or near-identical prompt if semantic matching is on)
+        if use_cache:
+            with span("response_cache") as cache_span:
+                if response_cache.semantic_enabled:
+                    with span("embedding", purpose="response_cache"):
+                        prompt_embedding = await generate_embedding(user_input.prompt)
+                cached = response_cache.get(user_input.prompt, prompt_embedding)
+                cache_span.set_attribute("hit", bool(cached))
+            if cached:
+                return await _answer_from_cache(user_input, cached[0], cached[1], on_event)
+
         # 1. Decomposition
-        sub_tasks = await decompose_prompt(user_input.prompt)
-        print(f"Decomposed into {len(sub_tasks)} sub-tasks.")
+        with span("decomposition") as decomposition_span:
+            sub_tasks = await decompose_prompt(user_input.prompt)
+            decomposition_span.set_attribute("sub_task_count", len(sub_tasks))
+        await on_event({"event": "decomposed", "sub_tasks": [task.model_dump() for task in sub_tasks]})
         if not sub_tasks:
-             print(f"Warning: Decomposition returned no sub-tasks for prompt: {user_input.prompt}")
+             logger.warning("Decomposition returned no sub-tasks", prompt=user_input.prompt)
              return FinalResponse(
                  session_id=user_input.session_id,
                  original_prompt=user_input.prompt,
@@ -50,57 +312,103 @@ async def process_user_prompt(user_input: UserInput) -> FinalResponse:
              )
 
         # 2. Routing
-        routing_decisions: List[RoutingDecision] = await route_sub_tasks(sub_tasks)
-        print(f"Generated {len(routing_decisions)} routing decisions.")
+        with span("routing", sub_task_count=len(sub_tasks)):
+            routing_decisions: List[RoutingDecision] = await route_sub_tasks(sub_tasks)
+        await on_event({"event": "routed", "routes": [
+            {"sub_task_id": d.sub_task.sub_task_id, "route_type": d.route_type, "target_id": d.target_id, "task_category": d.task_category}
+            for d in routing_decisions
+        ]})
 
         # 3. Cost Calculation & Charging
-        query_cost = calculate_query_cost(routing_decisions)
-        print(f"Calculated query cost: {query_cost} COLAB for user {user_input.user_id}")
+        with span("cost_calculation"):
+            query_cost = calculate_query_cost(routing_decisions)
+
+        # 4. Sub-AI Invocation, once the estimated cost is held (the actual cost is captured after synthesis)
+        # Sub-tasks run as soon as their dependencies are met; stragglers past the quorum/deadline are dropped
+        execution: Optional[asyncio.Future] = None
+        authorized_event = asyncio.Event()
+        if ORCHESTRATION_OPTIMISTIC_CHARGE:
+            # Start invoking while the hold is placed; their events wait for it, so 'charged' still comes first
+            async def _after_authorization(event: Dict[str, Any]):
+                await authorized_event.wait()
+                await on_event(event)
+            execution = asyncio.ensure_future(_execute_in_span(routing_decisions, deadline, _after_authorization))
 
-        charge_successful = await charge_user_for_query(user_input.user_id, query_cost)
-        if not charge_successful:
+        try:
+            authorized, hold_id = await place_query_hold(user_input.user_id, query_cost, session_id=user_input.session_id)
+        except BaseException:
+            if execution is not None:
+                await _cancel(execution)
+            raise
+        if not authorized:
             # Handle insufficient funds or other charging errors
-            print(f"Charging failed for user {user_input.user_id}. Aborting.")
-            return FinalResponse(
-                session_id=user_input.session_id,
-                original_prompt=user_input.prompt,
-                synthesized_answer="",
-                status="error_charge_failed",
-                error_message="Failed to charge for query (e.g., insufficient funds)."
-                # Optionally include cost: "metadata": {"cost": query_cost}
-            )
-        print(f"Successfully charged user {user_input.user_id} {query_cost} COLAB.")
-
-        # 4. Sub-AI Invocation (Only proceed if charge was successful)
-        invocation_tasks = [invoke_sub_ai(decision) for decision in routing_decisions]
-        sub_ai_responses = await asyncio.gather(*invocation_tasks)
-        print(f"Received {len(sub_ai_responses)} responses from Sub-AIs (via client).")
+            logger.warning("Charging failed, aborting", user_id=user_input.user_id, cost=query_cost)
+            if execution is not None:
+                await _cancel(execution) # Cancels the invocations in flight
+            return _charge_failed_response(user_input)
+        await on_event({"event": "charged", "cost": query_cost})
+        authorized_event.set()
+
+        if execution is None:
+            sub_ai_responses, missing_sub_task_ids = await _execute_in_span(routing_decisions, deadline, on_event)
+        else:
+            sub_ai_responses, missing_sub_task_ids = await execution # Cancelled along with this task
+        if missing_sub_task_ids:
+            await on_event({"event": "sub_tasks_missing", "sub_task_ids": missing_sub_task_ids})
 
         successful_responses = [res for res in sub_ai_responses if res and res.status == "success"]
-        print(f"Number of successful Sub-AI responses: {len(successful_responses)}")
+        logger.debug("Sub-AI responses received", received=len(sub_ai_responses), successful=len(successful_responses))
         if not successful_responses:
-             # If all invocations failed after successful charge, maybe refund or just report error?
-             # For now, report error. Refunding logic could be added later.
-             raise Exception("All Sub-AI invocations failed after successful charge.")
+             # Nothing to synthesize: the hold is released below, so nothing is charged
+             raise Exception("All Sub-AI invocations failed.")
 
         # 5. Synthesis
-        final_answer_text: str = await synthesize_responses(
-            original_prompt=user_input.prompt,
-            sub_tasks=sub_tasks,
-            sub_ai_responses=successful_responses
-        )
+        with span("synthesis", streaming=stream_synthesis, response_count=len(successful_responses)):
+            if stream_synthesis:
+                chunks: List[str] = []
+                async for chunk in synthesize_responses_stream(
+                    original_prompt=user_input.prompt,
+                    sub_tasks=sub_tasks,
+                    sub_ai_responses=successful_responses
+                ):
+                    chunks.append(chunk)
+                    await on_event({"event": "synthesis_token", "text": chunk})
+                final_answer_text = "".join(chunks)
+            else:
+                final_answer_text: str = await synthesize_responses(
+                    original_prompt=user_input.prompt,
+                    sub_tasks=sub_tasks,
+                    sub_ai_responses=successful_responses
+                )
+
+        # 6. Settlement: charge for what was actually executed
+        with span("settlement") as settlement_span:
+            actual_cost = calculate_actual_query_cost(routing_decisions, sub_ai_responses)
+            settlement_span.set_attribute("cost", actual_cost)
+            captured = await capture_query_hold(user_input.user_id, hold_id, actual_cost, session_id=user_input.session_id)
+            settled = True
+        if not captured:
+            # Only if the hold expired and the balance no longer covers the cost
+            logger.warning("Capturing the hold failed", user_id=user_input.user_id, cost=actual_cost)
+            return _charge_failed_response(user_input)
+        await on_event({"event": "settled", "cost": actual_cost})
 
-        # 6. Construct Final Response
+        # 7. Construct Final Response
+        failed_sub_task_ids = [res.sub_task_id for res in sub_ai_responses if res.status != "success"]
         final_response = FinalResponse(
             session_id=user_input.session_id,
             original_prompt=user_input.prompt,
             synthesized_answer=final_answer_text,
-            status="success" # Consider 'partial_success' if some sub-tasks failed but synthesis worked
+            # 'partial_success' if some sub-tasks failed or were not waited for but synthesis worked
+            status="partial_success" if (missing_sub_task_ids or failed_sub_task_ids) else "success",
+            missing_sub_task_ids=(missing_sub_task_ids + failed_sub_task_ids) or None
         )
-        print(f"Successfully generated final response for session {user_input.session_id}")
+        logger.info("Generated final response", session_id=user_input.session_id, status=final_response.status)
+        if use_cache and final_response.status == "success":
+            response_cache.put(user_input.prompt, final_answer_text, actual_cost, prompt_embedding)
 
     except Exception as e:
-        print(f"Error processing prompt for session {user_input.session_id}: {e}")
+        logger.error("Error processing prompt", session_id=user_input.session_id, error=str(e))
         # Basic error handling
         final_response = FinalResponse(
             session_id=user_input.session_id,
@@ -109,5 +417,9 @@ async def process_user_prompt(user_input: UserInput) -> FinalResponse:
             status="error",
             error_message=str(e)
         )
+    finally:
+        # Failed or cancelled (e.g. the streaming client went away) before settlement: charge nothing
+        if hold_id is not None and not settled:
+            await release_query_hold(hold_id)
 
-    return final_response
\ No newline at end of file
+    return final_response
@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from ..config.settings import settings
+from .embedding_cache import normalize_text
+
+# --- Response Cache Config (Load from Settings) ---
+RESPONSE_CACHE_ENABLED = bool(getattr(settings, "RESPONSE_CACHE_ENABLED", True))
+RESPONSE_CACHE_MAX_ENTRIES = int(getattr(settings, "RESPONSE_CACHE_MAX_ENTRIES", 1000))
+RESPONSE_CACHE_TTL_SECONDS = float(getattr(settings, "RESPONSE_CACHE_TTL_SECONDS", 3600.0))
+# Semantic matching embeds every prompt; set the threshold to 0 to use exact matching only
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(getattr(settings, "RESPONSE_CACHE_SIMILARITY_THRESHOLD", 0.0))
+
+
+def make_prompt_key(prompt: str) -> str:
+    """Hashes the case- and whitespace-normalized prompt."""
+    return hashlib.sha256(normalize_text(prompt).lower().encode("utf-8")).hexdigest()
+
+
+class CachedResponse(BaseModel):
+    """A synthesized answer stored for reuse by later prompts."""
+    prompt: str
+    synthesized_answer: str
+    query_cost: float # What the original query was charged; input to the cache-hit charge policy
+    created_at: float
+
+
+class PromptResponseCache:
+    """
+    LRU cache of final answers keyed by normalized prompt hash.
+
+    Entries expire after `ttl_seconds`. If prompt embeddings are supplied, a lookup
+    that misses the exact key falls back to the most similar cached prompt whose
+    cosine similarity is at least `similarity_threshold`.
+
+    Prompt vectors are kept in the first rows of a matrix preallocated for
+    `max_entries` rows, so a semantic lookup is a single matrix-vector product
+    without restacking the vectors of every entry.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600.0, similarity_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None # Allocated when the first vector arrives
+        self._row_of: Dict[str, int] = {}
+        self._row_keys: List[str] = [] # Key stored in each used row
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def _set_vector(self, key: str, vector: np.ndarray):
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries + 1, vector.shape[0]), dtype=np.float32)
+        row = self._row_of.get(key)
+        if row is None:
+            row = len(self._row_keys)
+            self._row_of[key] = row
+            self._row_keys.append(key)
+        self._matrix[row] = vector
+
+    def _drop_vector(self, key: str):
+        row = self._row_of.pop(key, None)
+        if row is None:
+            return
+        # Move the last row into the freed one to keep used rows contiguous
+        last_key = self._row_keys.pop()
+        if last_key != key:
+            self._matrix[row] = self._matrix[len(self._row_keys)]
+            self._row_keys[row] = last_key
+            self._row_of[last_key] = row
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._drop_vector(key)
+
+    def get(self, prompt: str, embedding: Optional[Sequence[float]] = None) -> Optional[Tuple[CachedResponse, float]]:
+        """
+        Looks up a cached answer for `prompt`.
+
+        Returns:
+            (entry, similarity) on a hit, with similarity 1.0 for exact matches, or None.
+        """
+        key = make_prompt_key(prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self.stats["exact_hits"] += 1
+                    return entry, 1.0
+                self._remove(key)
+                self.stats["expirations"] += 1
+
+            if self.semantic_enabled and embedding is not None and self._row_keys:
+                keys = list(self._row_keys)
+                query = _normalize(embedding)
+                scores = self._matrix[:len(keys)] @ query
+                for i in np.argsort(-scores):
+                    if scores[i] < self.similarity_threshold:
+                        break
+                    candidate = self._entries[keys[i]]
+                    if self._expired(candidate, now):
+                        continue # Purged on its own exact lookup or by LRU eviction
+                    self._entries.move_to_end(keys[i])
+                    self.stats["semantic_hits"] += 1
+                    return candidate, float(scores[i])
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, prompt: str, synthesized_answer: str, query_cost: float, embedding: Optional[Sequence[float]] = None):
+        """Stores an answer, evicting least recently used entries beyond max_entries."""
+        key = make_prompt_key(prompt)
+        entry = CachedResponse(prompt=prompt, synthesized_answer=synthesized_answer, query_cost=query_cost, created_at=time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self.semantic_enabled and embedding is not None:
+                self._set_vector(key, _normalize(embedding))
+            while len(self._entries) > self.max_entries:
+                oldest_key, _ = self._entries.popitem(last=False)
+                self._drop_vector(oldest_key)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._row_of.clear()
+            self._row_keys.clear()
+
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+# Process-wide cache used by core_ai.orchestrator (None when disabled)
+response_cache: Optional[PromptResponseCache] = (
+    PromptResponseCache(
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        similarity_threshold=RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    )
+    if RESPONSE_CACHE_ENABLED else None
+)
@@ -1,26 +1,33 @@
 from typing import List, Tuple, Optional, Dict, Any
 from pydantic import BaseModel
 import asyncio
+import json
 import re # Added for parsing classification response
+import time
 
 from .models import SubTask
-from ..config import settings
+from .embedding_cache import embedding_cache, make_cache_key, normalize_text
+from .task_classifier import task_classifier, TASK_CLASSIFIER_CONFIDENCE_THRESHOLD
+from .vector_index import VectorIndex, InMemoryVectorIndex, PineconeVectorIndex, mirror_pinecone_to_memory
+from ..config.settings import settings
+from ..utils.single_flight import SingleFlight
+from ..utils.llm_gateway import llm_gateway
+from ..utils.telemetry import span
+from ..utils.log import get_logger
 # Assuming OpenAI for embeddings and Pinecone for vector DB, based on previous steps
 from openai import AsyncOpenAI
 # import pinecone # Deprecated client
 from pinecone import Pinecone, ServerlessSpec # Import Pinecone client
 
+logger = get_logger(__name__)
+
 # --- Client Initialization ---
-# Embedding Client (reuse from decomposition or create new instance)
-try:
-    embedding_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    # Specify the embedding model consistent with architecture doc
-    EMBEDDING_MODEL = "text-embedding-3-small"
-    # Consider dimensionality if using text-embedding-3
-    EMBEDDING_DIMENSIONS = 1536 # Or lower if configured
-except Exception as e:
-    print(f"Error initializing OpenAI client for embeddings: {e}")
-    embedding_client = None
+# Embedding and classification calls go through the shared LLM gateway
+embedding_client = llm_gateway
+# Specify the embedding model consistent with architecture doc
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Requested from the API, so it must match the Pinecone index and the in-memory routing index
+EMBEDDING_DIMENSIONS = int(getattr(settings, "EMBEDDING_DIMENSIONS", 1536))
 
 # Pinecone Client
 try:
@@ -46,6 +53,20 @@ except Exception as e:
     print(f"Error initializing Pinecone client: {e}")
     index = None
 
+# Upper bound on concurrent vector queries / classification calls per routing request
+ROUTING_MAX_CONCURRENCY = int(getattr(settings, "ROUTING_MAX_CONCURRENCY", 8))
+
+# Specialist routing index: 'memory' (default) answers queries in-process from a mirror of
+# the specialist vectors kept in Pinecone; 'pinecone' queries Pinecone directly.
+ROUTING_VECTOR_BACKEND = getattr(settings, "ROUTING_VECTOR_BACKEND", "memory")
+SPECIALIST_INDEX_SYNC_INTERVAL = float(getattr(settings, "SPECIALIST_INDEX_SYNC_INTERVAL", 300.0))
+specialist_index: Optional[VectorIndex] = None
+if ROUTING_VECTOR_BACKEND == "pinecone":
+    specialist_index = PineconeVectorIndex(index, max_concurrency=ROUTING_MAX_CONCURRENCY) if index else None
+else:
+    specialist_index = InMemoryVectorIndex(EMBEDDING_DIMENSIONS)
+_specialist_sync_task: Optional[asyncio.Task] = None
+
 # --- Routing Logic ---
 
 # Define a structure to hold routing results
@@ -57,104 +78,335 @@ class RoutingDecision(BaseModel):
     confidence_score: Optional[float] = None # Similarity score from vector search
     task_category: Optional[str] = None # Added for Transformer Squared Pass 1
 
-# TODO: Define confidence threshold in settings
-ROUTING_CONFIDENCE_THRESHOLD = 0.75 # Example threshold
+# Minimum similarity for a sub-task to be routed to a fixed specialist
+ROUTING_CONFIDENCE_THRESHOLD = float(getattr(settings, "ROUTING_CONFIDENCE_THRESHOLD", 0.75))
 
-async def generate_embedding(text: str) -> Optional[List[float]]:
-    """Generates embedding for a given text using the configured model."""
-    if not embedding_client:
-        print("Error: Embedding client not initialized.")
-        return None
+# Task categories for Transformer Squared Pass 1 (based on the paper/requirements)
+# TODO: Make categories configurable?
+TASK_CATEGORIES = ['math', 'code', 'reasoning', 'other']
+
+# Identical concurrent embedding / classification requests share one in-flight call
+_embedding_flight = SingleFlight("embedding")
+_classification_flight = SingleFlight("classification")
+
+# Batching limits for the embeddings API
+EMBEDDING_MAX_BATCH_SIZE = int(getattr(settings, "EMBEDDING_MAX_BATCH_SIZE", 256))
+EMBEDDING_MAX_BATCH_TOKENS = int(getattr(settings, "EMBEDDING_MAX_BATCH_TOKENS", 250000))
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for batch budgeting."""
+    return len(text) // 4 + 1
+
+def _batch_embedding_inputs(texts: List[str]) -> List[List[int]]:
+    """
+    Splits the indices of non-empty texts into batches that respect the
+    max batch size and the approximate token budget per request.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        if not text:
+            continue # The embeddings API rejects empty input
+        tokens = _estimate_tokens(text)
+        if current and (len(current) >= EMBEDDING_MAX_BATCH_SIZE or current_tokens + tokens > EMBEDDING_MAX_BATCH_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+async def _embed_batch(texts: List[str]) -> List[Optional[List[float]]]:
+    """Sends one embeddings request for a batch of texts."""
     try:
         response = await embedding_client.embeddings.create(
-            input=[text],
-            model=EMBEDDING_MODEL
-            # dimensions=EMBEDDING_DIMENSIONS # Add if using text-embedding-3 and want specific dims
+            input=texts,
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS # text-embedding-3 models can shorten their vectors
         )
-        return response.data[0].embedding
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+        return embeddings
     except Exception as e:
-        print(f"Error generating embedding for text '{text[:50]}...': {e}")
-        return None
+        logger.error("Error generating embeddings for batch", batch_size=len(texts), error=str(e))
+        return [None] * len(texts)
+
+async def generate_embeddings(texts: List[str]) -> List[Optional[List[float]]]:
+    """
+    Generates embeddings for a list of texts using as few API requests as possible.
+
+    Texts already in the embedding cache are served from it; the rest are chunked by
+    EMBEDDING_MAX_BATCH_SIZE and EMBEDDING_MAX_BATCH_TOKENS, the chunks are sent
+    concurrently and the results are written back to the cache.
+
+    Args:
+        texts: The texts to embed.
+
+    Returns:
+        A list aligned with `texts`; entries are None for empty texts or failed batches.
+    """
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    pending = texts
+    keys: List[str] = []
+    if embedding_cache is not None:
+        keys = [make_cache_key(text, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS) for text in texts]
+        # The disk tier does blocking SQLite I/O, so it is kept off the event loop
+        if embedding_cache.persistent:
+            cached = await asyncio.to_thread(embedding_cache.get_many, keys)
+        else:
+            cached = embedding_cache.get_many(keys)
+        for i, key in enumerate(keys):
+            embeddings[i] = cached.get(key)
+        # Blank out cached texts so only misses are sent to the API
+        pending = [text if embeddings[i] is None else "" for i, text in enumerate(texts)]
+        if not any(pending):
+            return embeddings
+
+    if not embedding_client:
+        logger.error("Embedding client not initialized")
+        return embeddings
+
+    batches = _batch_embedding_inputs(pending)
+    batch_results = await asyncio.gather(*(_embed_batch([pending[i] for i in batch]) for batch in batches))
+    fresh: Dict[str, List[float]] = {}
+    for batch, results in zip(batches, batch_results):
+        for i, embedding in zip(batch, results):
+            embeddings[i] = embedding
+            if embedding and keys:
+                fresh[keys[i]] = embedding
+    if embedding_cache is not None and fresh:
+        if embedding_cache.persistent:
+            await asyncio.to_thread(embedding_cache.put_many, fresh)
+        else:
+            embedding_cache.put_many(fresh)
+    return embeddings
+
+async def generate_embedding(text: str) -> Optional[List[float]]:
+    """
+    Generates embedding for a given text using the configured model.
+    Concurrent requests for the same text share one call.
+    """
+    key = make_cache_key(text, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+    embeddings = await _embedding_flight.do(key, lambda: generate_embeddings([text]))
+    return embeddings[0]
+
+async def sync_specialist_index(specialist_ids: List[str]) -> int:
+    """
+    Mirrors the vectors and metadata of the given fixed specialists from Pinecone into
+    the in-memory routing index. No-op for the 'pinecone' backend.
+
+    Returns:
+        The number of specialists mirrored (0 if nothing was synced).
+    """
+    if not isinstance(specialist_index, InMemoryVectorIndex):
+        return 0
+    if not index:
+        logger.warning("Skipping specialist index sync: Pinecone index not initialized")
+        return 0
+    try:
+        count = await mirror_pinecone_to_memory(index, specialist_index, specialist_ids)
+        if count:
+            logger.info("Synced specialists from Pinecone into the in-memory routing index", synced=count, requested=len(specialist_ids))
+        else:
+            logger.warning("No specialist vectors found in Pinecone, routing index is empty", requested=len(specialist_ids))
+        return count
+    except Exception as e:
+        logger.error("Error syncing specialist index from Pinecone, keeping previous contents", error=str(e))
+        return 0
+
+async def start_specialist_index_sync(specialist_ids: List[str], interval: float = SPECIALIST_INDEX_SYNC_INTERVAL):
+    """Performs an initial sync and then re-syncs the in-memory routing index every `interval` seconds."""
+    global _specialist_sync_task
+    await sync_specialist_index(specialist_ids)
+    if _specialist_sync_task or not isinstance(specialist_index, InMemoryVectorIndex) or interval <= 0:
+        return
+
+    async def _sync_loop():
+        while True:
+            await asyncio.sleep(interval)
+            await sync_specialist_index(specialist_ids)
+
+    _specialist_sync_task = asyncio.create_task(_sync_loop())
+
+async def stop_specialist_index_sync():
+    """Cancels the periodic specialist index sync, if running."""
+    global _specialist_sync_task
+    if _specialist_sync_task:
+        _specialist_sync_task.cancel()
+        try:
+            await _specialist_sync_task
+        except asyncio.CancelledError:
+            pass
+        _specialist_sync_task = None
+
+def _classify_tasks_locally(sub_tasks: List[SubTask], embeddings: List[Optional[List[float]]]) -> Dict[str, str]:
+    """
+    Classifies sub-tasks with the local embedding classifier.
+
+    Returns:
+        A dict of sub_task_id to category for the sub-tasks classified with a confidence
+        at or above TASK_CLASSIFIER_CONFIDENCE_THRESHOLD.
+    """
+    embedded = [(task, embedding) for task, embedding in zip(sub_tasks, embeddings) if embedding]
+    if not task_classifier or not embedded:
+        return {}
+    predictions = task_classifier.predict_many([embedding for _, embedding in embedded])
+    confident: Dict[str, str] = {}
+    for (task, _), (category, confidence) in zip(embedded, predictions):
+        if confidence >= TASK_CLASSIFIER_CONFIDENCE_THRESHOLD:
+            confident[task.sub_task_id] = category
+            logger.debug("Sub-task classified locally", sub_task_id=task.sub_task_id, category=category, confidence=confidence)
+    return confident
+
+async def _classify_tasks(sub_tasks: List[SubTask], semaphore: asyncio.Semaphore) -> Dict[str, Optional[str]]:
+    """
+    Classifies sub-tasks (Transformer Squared Pass 1) with one batched LLM call,
+    falling back to per-task calls for any sub-task the batch did not cover.
+
+    Returns:
+        A dict of sub_task_id to category; failures map to None.
+    """
+    if not sub_tasks:
+        return {}
+    # Use the existing embedding_client, assuming it can also handle chat completions
+    # or that a suitable client is configured.
+    if not embedding_client:
+        logger.warning("Skipping task classification: LLM client not available")
+        return {task.sub_task_id: None for task in sub_tasks}
+
+    try:
+        batch_categories = await classify_tasks_with_llm(sub_tasks, embedding_client)
+    except Exception as e:
+        logger.warning("Batched task classification failed, falling back to per-task classification", error=str(e))
+        batch_categories = {}
+
+    async def _classify_one(task: SubTask) -> Optional[str]:
+        if task.sub_task_id in batch_categories:
+            return batch_categories[task.sub_task_id]
+        try:
+            async with semaphore:
+                return await classify_task_with_llm(task.instruction, embedding_client)
+        except Exception as e:
+            logger.warning("Error classifying sub-task, setting category to None", sub_task_id=task.sub_task_id, error=str(e))
+            return None
+
+    task_categories = await asyncio.gather(*(_classify_one(task) for task in sub_tasks))
+    for task, task_category in zip(sub_tasks, task_categories):
+        logger.debug("Sub-task classified", sub_task_id=task.sub_task_id, category=task_category)
+    return {task.sub_task_id: task_category for task, task_category in zip(sub_tasks, task_categories)}
+
+async def _timed(coro, timings: Dict[str, float], stage: str):
+    """Awaits a coroutine in a `stage` span and records its wall-clock duration (ms) under `stage`."""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            return await coro
+    finally:
+        timings[stage] = (time.perf_counter() - start) * 1000
 
 async def route_sub_tasks(sub_tasks: List[SubTask]) -> List[RoutingDecision]:
     """
     Routes a list of sub-tasks to appropriate Sub-AIs (fixed or dynamic).
 
+    Routing runs as a concurrent pipeline: the instructions are embedded in one batch
+    and the specialist index is queried for all of them at once (a single matrix
+    multiply for the in-memory backend, parallel off-loop queries for Pinecone). Sub-tasks
+    are classified by the local embedding classifier when one is trained; the rest
+    (or all of them, without a classifier) are classified by one batched LLM call that
+    overlaps with the lookup. Concurrency per stage is bounded by ROUTING_MAX_CONCURRENCY.
+
     Args:
         sub_tasks: A list of SubTask objects.
 
     Returns:
         A list of RoutingDecision objects indicating the target for each sub-task.
     """
-    if not index or not embedding_client:
-        raise Exception("Routing components (Pinecone index or Embedding client) not initialized.")
+    if specialist_index is None or not embedding_client:
+        raise Exception("Routing components (specialist index or Embedding client) not initialized.")
 
-    routing_decisions: List[RoutingDecision] = []
+    timings: Dict[str, float] = {}
+    routing_start = time.perf_counter()
+    classify_semaphore = asyncio.Semaphore(ROUTING_MAX_CONCURRENCY)
+
+    task_categories: Dict[str, Optional[str]] = {}
+    classification_future: Optional[asyncio.Future] = None
+    if not task_classifier:
+        # LLM classification only needs the instruction text, so it overlaps with embedding + vector lookup
+        classification_future = asyncio.ensure_future(_timed(
+            _classify_tasks(sub_tasks, classify_semaphore), timings, "classification"
+        ))
 
-    # Generate embeddings for all tasks (can be done concurrently)
-    embedding_tasks = [generate_embedding(task.instruction) for task in sub_tasks]
-    embeddings = await asyncio.gather(*embedding_tasks)
+    try:
+        # Generate embeddings for all tasks in a single batched request
+        embeddings = await _timed(generate_embeddings([task.instruction for task in sub_tasks]), timings, "embedding")
+        for task, task_embedding in zip(sub_tasks, embeddings):
+            if not task_embedding:
+                logger.warning("Could not generate embedding for sub-task, falling back to dynamic", sub_task_id=task.sub_task_id)
+        if task_classifier:
+            # Local classification reuses the embeddings; only low-confidence sub-tasks go to the LLM
+            local_start = time.perf_counter()
+            with span("classification_local"):
+                task_categories.update(_classify_tasks_locally(sub_tasks, embeddings))
+            timings["classification_local"] = (time.perf_counter() - local_start) * 1000
+            unsure = [task for task in sub_tasks if task.sub_task_id not in task_categories]
+            if unsure:
+                classification_future = asyncio.ensure_future(_timed(
+                    _classify_tasks(unsure, classify_semaphore), timings, "classification"
+                ))
+        # Query the specialist index for the top matching fixed specialist of every sub-task at once
+        query_vectors = [emb for emb in embeddings if emb]
+        if isinstance(specialist_index, InMemoryVectorIndex) and len(specialist_index) == 0:
+            logger.warning("Specialist routing index is empty (not synced from Pinecone), routing every sub-task to the dynamic model")
+        try:
+            query_results = await _timed(specialist_index.query_many(
+                query_vectors,
+                top_k=1, # Find the single best match
+                filter={"status": {"$eq": "active"}} # Only route to active specialists
+            ), timings, "vector_query")
+        except Exception as e:
+            logger.error("Error querying specialist index, falling back to dynamic", error=str(e))
+            query_results = [[] for _ in query_vectors] # Keep default decisions (dynamic_instance)
+    finally:
+        # Classification failures are already mapped to None, so this never raises
+        if classification_future is not None:
+            task_categories.update(await classification_future)
 
-    for i, task in enumerate(sub_tasks):
-        task_embedding = embeddings[i]
-        route_decision = RoutingDecision(sub_task=task, route_type='dynamic_instance') # Default to dynamic
+    routing_decisions: List[RoutingDecision] = []
+    query_iter = iter(query_results)
+    for task, task_embedding in zip(sub_tasks, embeddings):
+        route_decision = RoutingDecision(
+            sub_task=task,
+            route_type='dynamic_instance', # Default to dynamic
+            task_category=task_categories.get(task.sub_task_id)
+        )
 
         if task_embedding:
-            try:
-                # Query Pinecone for top matching fixed specialists
-                query_response = index.query(
-                    vector=task_embedding,
-                    top_k=1, # Find the single best match
-                    include_metadata=True,
-                    filter={ # Example filter: only route to active specialists
-                        "status": {"$eq": "active"}
-                    }
-                )
-
-                if query_response.matches:
-                    best_match = query_response.matches[0]
-                    match_score = best_match.score
-                    match_id = best_match.id
-                    match_metadata = best_match.metadata
-
-                    print(f"Routing task '{task.instruction[:50]}...': Best match '{match_id}' score {match_score:.4f}")
-
-                    if match_score >= ROUTING_CONFIDENCE_THRESHOLD:
-                        route_decision.route_type = 'fixed_specialist'
-                        route_decision.target_id = match_id
-                        route_decision.target_metadata = match_metadata
-                        route_decision.confidence_score = match_score
-                    else:
-                         print(f"Match score {match_score:.4f} below threshold {ROUTING_CONFIDENCE_THRESHOLD}. Falling back to dynamic.")
+            matches = next(query_iter)
+            if matches:
+                best_match = matches[0]
+                match_score = best_match.score
+                match_id = best_match.id
+                match_metadata = best_match.metadata
+
+                logger.debug("Best specialist match", sub_task_id=task.sub_task_id, match_id=match_id, score=match_score)
+
+                if match_score >= ROUTING_CONFIDENCE_THRESHOLD:
+                    route_decision.route_type = 'fixed_specialist'
+                    route_decision.target_id = match_id
+                    route_decision.target_metadata = match_metadata
+                    route_decision.confidence_score = match_score
                 else:
-                    print(f"No active fixed specialist found for task '{task.instruction[:50]}...'. Falling back to dynamic.")
-
-            except Exception as e:
-                print(f"Error querying Pinecone for task '{task.instruction[:50]}...': {e}. Falling back to dynamic.")
-                # Keep default decision (dynamic_instance)
-
-        else:
-             print(f"Could not generate embedding for task '{task.instruction[:50]}...'. Falling back to dynamic.")
-             # Keep default decision (dynamic_instance)
-
-        # --- START: Add Task Classification Logic (Transformer Squared Pass 1) ---
-        try:
-            # Use the existing embedding_client, assuming it can also handle chat completions
-            # or that a suitable client is configured.
-            if embedding_client:
-                 task_category = await classify_task_with_llm(task.instruction, embedding_client)
-                 route_decision.task_category = task_category
-                 print(f"Task '{task.instruction[:50]}...' classified as: {task_category}")
+                     logger.debug("Match score below threshold, falling back to dynamic", sub_task_id=task.sub_task_id, score=match_score, threshold=ROUTING_CONFIDENCE_THRESHOLD)
             else:
-                print("Skipping task classification as LLM client is not available.")
-                route_decision.task_category = None
-        except Exception as e:
-            print(f"Error classifying task '{task.instruction[:50]}...': {e}. Setting category to None.")
-            route_decision.task_category = None
-        # --- END: Add Task Classification Logic ---
+                logger.debug("No active fixed specialist found, falling back to dynamic", sub_task_id=task.sub_task_id)
 
         routing_decisions.append(route_decision)
 
+    timings["total"] = (time.perf_counter() - routing_start) * 1000
+    logger.info("Routed %d sub-tasks", len(sub_tasks), **{f"{stage}_ms": round(ms, 1) for stage, ms in timings.items()})
     return routing_decisions
 
 
@@ -162,6 +414,7 @@ async def route_sub_tasks(sub_tasks: List[SubTask]) -> List[RoutingDecision]:
 async def classify_task_with_llm(instruction: str, client: AsyncOpenAI) -> Optional[str]:
     """
     Classifies a task instruction using an LLM prompt based on Transformer Squared Method A.
+    Concurrent classifications of the same instruction share one call.
 
     Args:
         instruction: The sub-task instruction text.
@@ -170,9 +423,10 @@ async def classify_task_with_llm(instruction: str, client: AsyncOpenAI) -> Optio
     Returns:
         The classified category ('math', 'code', 'reasoning', 'other') or None if classification fails.
     """
-    # Define categories based on the paper/requirements
-    # TODO: Make categories configurable?
-    categories = ['math', 'code', 'reasoning', 'other']
+    return await _classification_flight.do(normalize_text(instruction), lambda: _classify_task_with_llm(instruction, client))
+
+async def _classify_task_with_llm(instruction: str, client: AsyncOpenAI) -> Optional[str]:
+    categories = TASK_CATEGORIES
     categories_str = ", ".join([f"'{cat}'" for cat in categories])
 
     # Construct the prompt based on Figure 3 concept
@@ -206,7 +460,7 @@ Provide the classification in the format: Classification: \\boxed{{category}}
 
         content = response.choices[0].message.content
         if not content:
-            print(f"LLM classification returned empty content for instruction: {instruction[:50]}...")
+            logger.warning("LLM classification returned empty content, defaulting to 'other'", instruction=instruction[:50])
             return 'other' # Default to 'other' on empty response
 
         # Parse the response using regex to find Classification: \boxed{category}
@@ -216,20 +470,88 @@ Provide the classification in the format: Classification: \\boxed{{category}}
             if category in categories:
                 return category
             else:
-                print(f"LLM returned unrecognized category '{category}' in expected format. Defaulting to 'other'.")
+                logger.warning("LLM returned unrecognized category, defaulting to 'other'", category=category)
                 return 'other'
         else:
             # Fallback: Check if the response *only* contains a valid category name (case-insensitive)
             cleaned_content = content.strip().lower()
             if cleaned_content in categories:
-                print(f"LLM response format unexpected ('{content}'), but found valid category '{cleaned_content}'.")
+                logger.debug("Unexpected LLM classification format, but found a valid category", content=content, category=cleaned_content)
                 return cleaned_content
             else:
-                print(f"Could not parse classification from LLM response: '{content}'. Defaulting to 'other'.")
+                logger.warning("Could not parse LLM classification, defaulting to 'other'", content=content)
                 return 'other' # Default if parsing fails or format is wrong
 
     except Exception as e:
         # Log the specific exception for better debugging
-        print(f"Error during LLM classification call for instruction '{instruction[:50]}...': {type(e).__name__} - {e}")
+        logger.error("Error during LLM classification call", instruction=instruction[:50], error=f"{type(e).__name__}: {e}")
         # Depending on policy, might return 'other' or None. Returning None indicates failure.
         return None
+
+
+# Batched variant: classifies every sub-task of a prompt in a single structured-output call
+async def classify_tasks_with_llm(sub_tasks: List[SubTask], client: AsyncOpenAI) -> Dict[str, str]:
+    """
+    Classifies several task instructions with one LLM call using JSON mode.
+
+    Args:
+        sub_tasks: The sub-tasks to classify.
+        client: The AsyncOpenAI client instance (assumed capable of chat completions).
+
+    Returns:
+        A dict mapping sub_task_id to its category for every sub-task the LLM classified
+        with a valid category. Sub-tasks missing from the result (or the whole batch, on a
+        parse failure) should be classified individually by the caller.
+    """
+    if not sub_tasks:
+        return {}
+    categories_str = ", ".join([f"'{cat}'" for cat in TASK_CATEGORIES])
+    # Sub-task ids are long UUIDs: the LLM sees short positional ids, mapped back below
+    tasks_json = json.dumps([{"id": position, "instruction": task.instruction} for position, task in enumerate(sub_tasks, start=1)])
+
+    prompt = f"""Classify each of the following task instructions into one of the predefined categories: {categories_str}.
+
+Tasks (JSON list of objects with "id" and "instruction"):
+{tasks_json}
+
+Guidelines:
+- 'math': Problems involving mathematical calculations, equations, or logic.
+- 'code': Tasks related to writing, debugging, explaining, or translating code.
+- 'reasoning': Tasks requiring logical deduction, analysis, planning, or complex understanding.
+- 'other': General knowledge, creative writing, summarization, or tasks not fitting other categories.
+
+Output ONLY a valid JSON object of the form:
+{{"classifications": [{{"id": <task id>, "category": "<category>"}}]}}
+"""
+
+    response = await client.chat.completions.create(
+        model="gpt-3.5-turbo", # Example chat model, same as the per-task classifier
+        messages=[
+            {"role": "system", "content": "You are an expert task classifier."},
+            {"role": "user", "content": prompt}
+        ],
+        response_format={"type": "json_object"}, # Enforce JSON output
+        temperature=0.0, # For deterministic classification
+        max_tokens=30 * len(sub_tasks) + 20 # Roughly one short object per task
+    )
+
+    content = response.choices[0].message.content
+    try:
+        parsed = json.loads(content or "")
+        entries = parsed.get("classifications", [])
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.warning("Could not parse batched classification response", error=str(e), raw_response=content)
+        return {}
+
+    ids_by_position = {str(position): task.sub_task_id for position, task in enumerate(sub_tasks, start=1)}
+    results: Dict[str, str] = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        task_id = ids_by_position.get(str(entry.get("id")).strip())
+        category = str(entry.get("category", "")).strip().lower()
+        if task_id is not None and category in TASK_CATEGORIES:
+            results[task_id] = category
+    if len(results) < len(sub_tasks):
+        logger.debug("Batched classification was incomplete", classified=len(results), sub_task_count=len(sub_tasks))
+    return results
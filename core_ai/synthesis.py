@@ -1,87 +1,54 @@
-from typing import List, Dict, Any
-from openai import AsyncOpenAI
-import json # For pre-processing JSON content
+from typing import List, Dict, Any, AsyncIterator
+import hashlib
+import json
 
 from .models import SubTask, SubAIResponse
-from ..config import settings
-
-# Initialize the Async OpenAI client (can potentially reuse client from decomposition)
-# Ensure OPENAI_API_KEY is set in your environment or .env file
-try:
-    # Consider using a different client instance if different settings are needed
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    # Choose a powerful model suitable for synthesis
-    SYNTHESIS_MODEL = "gpt-4o" # Or "gpt-4-turbo", or Claude 3 Sonnet/Opus via anthropic client
-except Exception as e:
-    print(f"Error initializing LLM client for synthesis: {e}. Make sure API key is set.")
-    client = None
+from .context_packing import pack_synthesis_context, get_token_counter
+from ..config.settings import settings
+from ..utils.single_flight import SingleFlight
+from ..utils.llm_gateway import llm_gateway
+from ..utils.hedging import hedge_policy_from_settings
+from ..utils.telemetry import current_span
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Synthesis calls go through the shared LLM gateway (same client as decomposition and routing)
+client = llm_gateway
+# Choose a powerful model suitable for synthesis
+SYNTHESIS_MODEL = "gpt-4o" # Or "gpt-4-turbo", or Claude 3 Sonnet/Opus via anthropic client
+# Model for hedged requests when the primary is slow (see utils/hedging.py; off unless HEDGING_ENABLED).
+# Only the non-streaming call is hedged.
+SYNTHESIS_FALLBACK_MODEL = getattr(settings, "SYNTHESIS_FALLBACK_MODEL", "gpt-4o-mini")
+synthesis_hedge = hedge_policy_from_settings("synthesis")
+
+# Concurrent syntheses of identical messages (e.g. a burst of the same prompt) share one LLM call
+_synthesis_flight = SingleFlight("synthesis")
 
 def _preprocess_responses_for_synthesis(
+    original_prompt: str,
     sub_tasks: List[SubTask],
     sub_ai_responses: List[SubAIResponse]
 ) -> str:
     """
-    Formats the sub-tasks and responses into a string suitable for the synthesis prompt.
+    Formats the sub-tasks and responses into a string suitable for the synthesis prompt,
+    packed into the synthesis context token budget (see context_packing.py).
     """
-    processed_text = "--- Relevant Information from Sub-Tasks ---\n"
-    response_map: Dict[str, SubAIResponse] = {res.sub_task_id: res for res in sub_ai_responses}
-
-    for task in sub_tasks:
-        processed_text += f"\nSub-Task Instruction: {task.instruction}\n"
-        response = response_map.get(task.sub_task_id)
-        if response:
-            processed_text += f"Source AI: {response.source_sub_ai_id}\n"
-            if response.status == "success":
-                content = response.content
-                # Basic handling to convert dict/list to JSON string for the prompt
-                if isinstance(content, (dict, list)):
-                    try:
-                        content_str = json.dumps(content, indent=2)
-                    except TypeError:
-                        content_str = str(content) # Fallback
-                else:
-                    content_str = str(content)
-                processed_text += f"Response Content:\n```\n{content_str}\n```\n"
-            else:
-                processed_text += f"Response Status: {response.status}\n"
-                if response.error_message:
-                    processed_text += f"Error: {response.error_message}\n"
-        else:
-            processed_text += "Response: [No response received for this sub-task]\n"
-
-    processed_text += "\n--- End Relevant Information ---\n"
+    processed_text = pack_synthesis_context(original_prompt, sub_tasks, sub_ai_responses, SYNTHESIS_MODEL)
+    stage_span = current_span()
+    if stage_span is not None:
+        stage_span.set_attribute("context_tokens", get_token_counter(SYNTHESIS_MODEL).count(processed_text))
     return processed_text
 
 
-async def synthesize_responses(
+def _build_synthesis_messages(
     original_prompt: str,
     sub_tasks: List[SubTask],
     sub_ai_responses: List[SubAIResponse]
-) -> str:
-    """
-    Uses the configured Synthesizer LLM API to generate a final coherent response.
-
-    Args:
-        original_prompt: The initial prompt from the user.
-        sub_tasks: The list of decomposed sub-tasks.
-        sub_ai_responses: The list of responses received from Sub-AIs.
-
-    Returns:
-        The synthesized final answer as a string.
-
-    Raises:
-        Exception: If the API call fails.
-    """
-    if not client:
-        raise Exception("LLM Client not initialized for synthesis. Check API key configuration.")
-
-    if not sub_ai_responses:
-        print("Warning: No Sub-AI responses received for synthesis.")
-        # Handle case with no responses - maybe return a specific message
-        return "No information could be gathered to answer the prompt."
-
+) -> List[Dict[str, str]]:
+    """Builds the chat messages for the Synthesizer LLM."""
     # 1. Pre-process responses into a formatted string
-    processed_info = _preprocess_responses_for_synthesis(sub_tasks, sub_ai_responses)
+    processed_info = _preprocess_responses_for_synthesis(original_prompt, sub_tasks, sub_ai_responses)
 
     # 2. Construct the synthesis prompt
     system_prompt = """
@@ -107,25 +74,99 @@ Relevant Information Gathered from Sub-Tasks:
 Based *only* on the original prompt and the relevant information provided above, generate the final synthesized response:
 """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": final_prompt}
     ]
 
+
+async def synthesize_responses(
+    original_prompt: str,
+    sub_tasks: List[SubTask],
+    sub_ai_responses: List[SubAIResponse]
+) -> str:
+    """
+    Uses the configured Synthesizer LLM API to generate a final coherent response.
+
+    Args:
+        original_prompt: The initial prompt from the user.
+        sub_tasks: The list of decomposed sub-tasks.
+        sub_ai_responses: The list of responses received from Sub-AIs.
+
+    Returns:
+        The synthesized final answer as a string.
+
+    Raises:
+        Exception: If the API call fails.
+    """
+    if not client:
+        raise Exception("LLM Client not initialized for synthesis. Check API key configuration.")
+
+    if not sub_ai_responses:
+        logger.warning("No Sub-AI responses received for synthesis")
+        # Handle case with no responses - maybe return a specific message
+        return "No information could be gathered to answer the prompt."
+
+    messages = _build_synthesis_messages(original_prompt, sub_tasks, sub_ai_responses)
+    key = hashlib.sha256(json.dumps([SYNTHESIS_MODEL, messages]).encode("utf-8")).hexdigest()
+    return await _synthesis_flight.do(key, lambda: synthesis_hedge.run(
+        lambda: _synthesize_with_llm(messages, len(sub_ai_responses), SYNTHESIS_MODEL),
+        lambda: _synthesize_with_llm(messages, len(sub_ai_responses), SYNTHESIS_FALLBACK_MODEL)
+    ))
+
+async def _synthesize_with_llm(messages: List[Dict[str, str]], response_count: int, model: str) -> str:
     # 3. Call the Synthesizer LLM API
     try:
-        print(f"Sending {len(sub_ai_responses)} responses to Synthesizer LLM ({SYNTHESIS_MODEL})...")
+        logger.debug("Sending responses to Synthesizer LLM", response_count=response_count, model=model)
         response = await client.chat.completions.create(
-            model=SYNTHESIS_MODEL,
+            model=model,
             messages=messages,
             temperature=0.5, # Allow for some creativity in synthesis but keep it grounded
             # max_tokens can be set if needed
         )
 
         synthesized_answer = response.choices[0].message.content
-        print("Received synthesized answer from LLM.")
         return synthesized_answer if synthesized_answer else ""
 
     except Exception as e:
-        print(f"Error calling Synthesizer LLM API: {e}")
-        raise Exception(f"Synthesizer LLM API call failed: {e}")
\ No newline at end of file
+        logger.warning("Synthesizer LLM API call failed: %s", e)
+        raise Exception(f"Synthesizer LLM API call failed: {e}")
+
+
+async def synthesize_responses_stream(
+    original_prompt: str,
+    sub_tasks: List[SubTask],
+    sub_ai_responses: List[SubAIResponse]
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of synthesize_responses: yields the synthesized answer in
+    text chunks as the Synthesizer LLM produces them.
+
+    Raises:
+        Exception: If the API call fails (before or during streaming).
+    """
+    if not client:
+        raise Exception("LLM Client not initialized for synthesis. Check API key configuration.")
+
+    if not sub_ai_responses:
+        logger.warning("No Sub-AI responses received for synthesis")
+        yield "No information could be gathered to answer the prompt."
+        return
+
+    messages = _build_synthesis_messages(original_prompt, sub_tasks, sub_ai_responses)
+
+    try:
+        logger.debug("Streaming responses through Synthesizer LLM", response_count=len(sub_ai_responses), model=SYNTHESIS_MODEL)
+        stream = await client.chat.completions.create(
+            model=SYNTHESIS_MODEL,
+            messages=messages,
+            temperature=0.5, # Same settings as the non-streaming call
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    except Exception as e:
+        logger.warning("Synthesizer LLM API call failed: %s", e)
+        raise Exception(f"Synthesizer LLM API call failed: {e}")
@@ -0,0 +1,151 @@
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config.settings import settings
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# --- Classifier Config (Load from Settings) ---
+TASK_CLASSIFIER_PATH = getattr(settings, "TASK_CLASSIFIER_PATH", "./task_classifier.npz")
+# Below this confidence routing falls back to LLM classification
+TASK_CLASSIFIER_CONFIDENCE_THRESHOLD = float(getattr(settings, "TASK_CLASSIFIER_CONFIDENCE_THRESHOLD", 0.6))
+
+
+class CentroidTaskClassifier:
+    """
+    Nearest-centroid classifier over instruction embeddings.
+
+    Each category is represented by the normalized mean of its training embeddings.
+    Confidence is the softmax over cosine similarities to all centroids, sharpened
+    by `temperature` (cosine similarities between embeddings are tightly clustered,
+    so an unscaled softmax would be nearly uniform).
+    """
+
+    def __init__(self, categories: Sequence[str], centroids: np.ndarray, temperature: float = 0.05):
+        self.categories = list(categories)
+        self.centroids = _normalize_rows(np.asarray(centroids, dtype=np.float32))
+        self.temperature = temperature
+
+    @classmethod
+    def fit(cls, embeddings: Sequence[Sequence[float]], labels: Sequence[str], temperature: float = 0.05) -> "CentroidTaskClassifier":
+        """
+        Trains the classifier from labelled embeddings.
+
+        Args:
+            embeddings: One embedding per training example.
+            labels: The category of each example.
+            temperature: Softmax temperature used for confidence scores.
+
+        Returns:
+            A fitted CentroidTaskClassifier.
+        """
+        if len(embeddings) != len(labels) or not labels:
+            raise ValueError("Task classifier needs a non-empty, equal number of embeddings and labels.")
+        matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        label_array = np.asarray(labels)
+        categories = sorted(set(labels))
+        centroids = np.stack([matrix[label_array == category].mean(axis=0) for category in categories])
+        return cls(categories, centroids, temperature=temperature)
+
+    def predict_many(self, embeddings: Sequence[Sequence[float]]) -> List[Tuple[str, float]]:
+        """Returns (category, confidence) for each embedding using one matrix multiply."""
+        if len(embeddings) == 0:
+            return []
+        matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        logits = (matrix @ self.centroids.T) / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [(self.categories[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def predict(self, embedding: Sequence[float]) -> Tuple[str, float]:
+        """Returns (category, confidence) for a single embedding."""
+        return self.predict_many([embedding])[0]
+
+    def save(self, path: str):
+        """Persists the classifier as an .npz archive."""
+        np.savez(
+            path,
+            categories=np.asarray(self.categories),
+            centroids=self.centroids,
+            temperature=np.asarray(self.temperature),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CentroidTaskClassifier":
+        """Loads a classifier saved with `save`."""
+        with np.load(path) as data:
+            return cls(
+                [str(category) for category in data["categories"]],
+                data["centroids"],
+                temperature=float(data["temperature"]),
+            )
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scales each row to unit L2 norm (zero rows are left as-is)."""
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def load_labelled_examples(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads a labelled training set from a JSON Lines file where each line is
+    {"instruction": "...", "category": "..."}.
+    """
+    examples: List[Tuple[str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                examples.append((record["instruction"], record["category"]))
+    return examples
+
+async def train_task_classifier(examples: List[Tuple[str, str]], path: str = TASK_CLASSIFIER_PATH) -> CentroidTaskClassifier:
+    """
+    Embeds labelled instructions with the routing embedding model, fits a classifier
+    and saves it to `path`.
+
+    Args:
+        examples: (instruction, category) pairs.
+        path: Where to save the fitted classifier.
+
+    Returns:
+        The fitted classifier.
+    """
+    # Imported here to avoid a circular import (routing imports this module)
+    from .routing import generate_embeddings
+
+    embeddings = await generate_embeddings([instruction for instruction, _ in examples])
+    pairs = [(embedding, category) for embedding, (_, category) in zip(embeddings, examples) if embedding]
+    if not pairs:
+        raise ValueError("Could not embed any training examples for the task classifier.")
+    logger.info("Training task classifier", embedded_examples=len(pairs), examples=len(examples))
+    classifier = CentroidTaskClassifier.fit([e for e, _ in pairs], [c for _, c in pairs])
+    classifier.save(path)
+    logger.info("Task classifier saved", path=path, categories=classifier.categories)
+    return classifier
+
+def load_task_classifier(path: str = TASK_CLASSIFIER_PATH) -> Optional[CentroidTaskClassifier]:
+    """Loads the persisted classifier, or returns None if none has been trained yet."""
+    if not path or not os.path.exists(path):
+        logger.info("No task classifier found, classification will use the LLM", path=path)
+        return None
+    try:
+        classifier = CentroidTaskClassifier.load(path)
+        logger.info("Task classifier loaded", path=path, categories=classifier.categories)
+        return classifier
+    except Exception as e:
+        logger.error("Error loading task classifier, classification will use the LLM", path=path, error=str(e))
+        return None
+
+
+# Process-wide classifier used by core_ai.routing (None until one has been trained)
+task_classifier: Optional[CentroidTaskClassifier] = load_task_classifier()
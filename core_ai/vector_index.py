@@ -0,0 +1,185 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class VectorMatch(BaseModel):
+    """A single similarity search result."""
+    id: str
+    score: float
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class VectorIndex(ABC):
+    """
+    Minimal interface shared by the specialist routing backends.
+
+    Scores are cosine similarities (higher is better), matching the Pinecone index metric.
+    """
+
+    @abstractmethod
+    async def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 1,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[VectorMatch]]:
+        """Returns the top_k matches for each query vector, in query order."""
+
+    @abstractmethod
+    async def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict[str, Any]]]):
+        """Inserts or replaces (id, vector, metadata) items."""
+
+
+def _matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluates a Pinecone-style metadata filter ($eq, $ne, $in, $nin or a bare value)."""
+    if not filter:
+        return True
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+            if op not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"Unsupported metadata filter operator: {op}")
+    return True
+
+
+class InMemoryVectorIndex(VectorIndex):
+    """
+    In-process index holding a row-normalized float32 matrix.
+
+    Suited to small, slowly changing sets such as the fixed specialists: a batch of
+    queries is answered with a single matrix multiply and no network round-trip.
+    """
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _normalize(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        if any(len(vector) != self.dimensions for vector in vectors):
+            raise ValueError(f"Vector dimensions do not match the index ({self.dimensions})")
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def replace_all(self, items: Sequence[Tuple[str, Sequence[float], Dict[str, Any]]]):
+        """Atomically swaps the index contents for `items`."""
+        ids = [item_id for item_id, _, _ in items]
+        metadata = [dict(item_metadata or {}) for _, _, item_metadata in items]
+        matrix = self._normalize([vector for _, vector, _ in items]) if items else np.zeros((0, self.dimensions), dtype=np.float32)
+        with self._lock:
+            self._ids, self._metadata, self._matrix = ids, metadata, matrix
+
+    async def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict[str, Any]]]):
+        with self._lock:
+            merged = {item_id: (row, meta) for item_id, row, meta in zip(self._ids, self._matrix, self._metadata)}
+        for item_id, vector, item_metadata in items:
+            merged[item_id] = (vector, item_metadata or {})
+        self.replace_all([(item_id, vector, meta) for item_id, (vector, meta) in merged.items()])
+
+    async def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 1,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[VectorMatch]]:
+        if len(vectors) == 0:
+            return []
+        with self._lock:
+            ids, metadata, matrix = self._ids, self._metadata, self._matrix
+        if not ids:
+            return [[] for _ in vectors]
+
+        allowed = np.fromiter((_matches_filter(meta, filter) for meta in metadata), dtype=bool, count=len(ids))
+        scores = self._normalize(vectors) @ matrix.T # (queries, items) cosine similarities
+        scores[:, ~allowed] = -np.inf
+        k = min(top_k, int(allowed.sum()))
+        if k == 0:
+            return [[] for _ in vectors]
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results: List[List[VectorMatch]] = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([
+                VectorMatch(id=ids[i], score=float(scores[row, i]), metadata=metadata[i]) for i in ordered
+            ])
+        return results
+
+
+class PineconeVectorIndex(VectorIndex):
+    """Adapter over a Pinecone index; queries run in the default executor, in parallel."""
+
+    def __init__(self, index: Any, max_concurrency: int = 8):
+        self.index = index
+        self.max_concurrency = max_concurrency
+
+    async def _query_one(self, vector: Sequence[float], top_k: int, filter: Optional[Dict[str, Any]], semaphore: asyncio.Semaphore) -> List[VectorMatch]:
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                response = await loop.run_in_executor(
+                    None,
+                    lambda: self.index.query(vector=list(vector), top_k=top_k, include_metadata=True, filter=filter)
+                )
+            except Exception as e:
+                logger.error("Error querying Pinecone", error=str(e))
+                return []
+        return [VectorMatch(id=m.id, score=m.score, metadata=m.metadata or {}) for m in (response.matches or [])]
+
+    async def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 1,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[VectorMatch]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return list(await asyncio.gather(*(self._query_one(v, top_k, filter, semaphore) for v in vectors)))
+
+    async def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict[str, Any]]]):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: self.index.upsert(vectors=[(item_id, list(vector), metadata) for item_id, vector, metadata in items])
+        )
+
+
+async def mirror_pinecone_to_memory(pinecone_index: Any, memory_index: InMemoryVectorIndex, ids: Sequence[str]) -> int:
+    """
+    Copies the given vector ids (with metadata) from Pinecone into the in-memory index,
+    replacing its contents.
+
+    Returns:
+        The number of vectors mirrored.
+    """
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(None, lambda: pinecone_index.fetch(ids=list(ids)))
+    vectors = response.vectors or {}
+    items = [(vector_id, vector.values, vector.metadata or {}) for vector_id, vector in vectors.items()]
+    memory_index.replace_all(items)
+    return len(items)
@@ -3,7 +3,7 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 import httpx # Import httpx
 
-from ..config import settings # Import settings
+from ..config.settings import settings # Import settings
 
 # --- Placeholder Models for Query/Result ---
 # (Models DocumentInfo, IndexerQuery, IndexerResult remain the same)
@@ -1,5 +1,5 @@
 import ipfshttpclient
-from ..config import settings
+from ..config.settings import settings
 import asyncio # Although ipfshttpclient is primarily synchronous, we might wrap calls
 
 # --- IPFS Client Initialization ---
@@ -11,8 +11,9 @@ from openai import AsyncOpenAI # Example using OpenAI
 
 # Import settings, potentially shared or service-specific
 try:
-    from ...config import settings
-    llm_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    from ...config.settings import settings
+    from ...utils.llm_gateway import llm_gateway
+    llm_client = llm_gateway # Shared gateway: concurrency/rate limits, retries and usage metrics
     # Choose a model suitable for code generation
     CODE_GEN_MODEL = "gpt-4o" # Or gpt-4-turbo, or specialized code models
 except ImportError:
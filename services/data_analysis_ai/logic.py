@@ -13,9 +13,10 @@ except ImportError:
 
 # Import settings and LLM client
 try:
-    from ...config import settings
+    from ...config.settings import settings
     from openai import AsyncOpenAI
-    llm_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    from ...utils.llm_gateway import llm_gateway
+    llm_client = llm_gateway # Shared gateway: concurrency/rate limits, retries and usage metrics
     # Choose a model capable of data analysis based on text/samples
     ANALYSIS_MODEL = settings.SYNTHESIS_MODEL # Reuse synthesis model (e.g., GPT-4o)
 except ImportError:
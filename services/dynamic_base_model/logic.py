@@ -3,8 +3,9 @@ from openai import AsyncOpenAI # Example using OpenAI
 
 # Import settings, potentially shared or service-specific
 try:
-    from ...config import settings
-    llm_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    from ...config.settings import settings
+    from ...utils.llm_gateway import llm_gateway
+    llm_client = llm_gateway # Shared gateway: concurrency/rate limits, retries and usage metrics
     # Choose a model suitable for general instruction following
     # Could be the same as decomposition or a slightly more capable one
     DYNAMIC_MODEL = settings.DECOMPOSITION_MODEL # Example: Reuse decomposition model initially
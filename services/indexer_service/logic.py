@@ -1,16 +1,16 @@
 import asyncio
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 # Import models from the main data_layer. Assumes monorepo structure.
 try:
     from ...data_layer.indexer_client import IndexerQuery, IndexerResult, DocumentInfo
     # Need embedding generation capability (similar to routing)
-    from ...core_ai.routing import generate_embedding, EMBEDDING_DIMENSIONS
+    from ...core_ai.routing import generate_embeddings, EMBEDDING_DIMENSIONS
     # Need Pinecone client (similar to routing)
     from ...core_ai.routing import index as pinecone_index # Reuse index connection from routing
     # Need Elasticsearch client (from processing)
     from .processing import es_client # Reuse ES client from processing
-    from ...config import settings
+    from ...config.settings import settings
 except ImportError:
     print("Warning: Could not import shared clients/functions/settings for Indexer Logic. Using fallback simulation.")
     # Fallback definitions if imports fail
@@ -18,12 +18,15 @@ except ImportError:
     class DocumentInfo(BaseModel): cid: str; score: Optional[float] = None; metadata: Optional[Dict[str, Any]] = None; snippet: Optional[str] = None
     class IndexerQuery(BaseModel): query_text: Optional[str] = None; query_vector: Optional[List[float]] = None; keywords: Optional[List[str]] = None; metadata_filter: Optional[Dict[str, Any]] = None; top_k: int = 5
     class IndexerResult(BaseModel): query: IndexerQuery; results: List[DocumentInfo] = Field(default_factory=list); status: str = Field(default="success"); error_message: Optional[str] = None
-    async def generate_embedding(text: str) -> Optional[List[float]]: return [0.1] * 1536 # Simulate
+    async def generate_embeddings(texts: List[str]) -> List[Optional[List[float]]]: return [[0.1] * 1536 for _ in texts] # Simulate
     pinecone_index = None
     es_client = None
     settings = None
 
 
+# Rank offset for Reciprocal Rank Fusion; 60 is the value from the original RRF paper.
+RRF_K = 60
+
 async def perform_search(query: IndexerQuery) -> IndexerResult:
     """
     Performs search against Pinecone (vector) and Elasticsearch (keyword/text)
@@ -41,9 +44,9 @@ async def perform_search(query: IndexerQuery) -> IndexerResult:
     query_vector = query.query_vector
 
     # 1. Generate embedding if text query is provided but no vector
-    if query.query_text and not query.query_vector and generate_embedding:
+    if query.query_text and not query.query_vector and generate_embeddings:
         print("Generating embedding for query text...")
-        query_vector = await generate_embedding(query.query_text)
+        query_vector = (await generate_embeddings([query.query_text]))[0]
         if not query_vector:
             print("Warning: Failed to generate query vector from text.")
         else:
@@ -63,7 +66,7 @@ async def perform_search(query: IndexerQuery) -> IndexerResult:
 
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    # 5. Combine results (simple concatenation + deduplication by CID for V1)
+    # 5. Combine results
     pinecone_results: List[DocumentInfo] = []
     es_results: List[DocumentInfo] = []
 
@@ -78,18 +81,15 @@ async def perform_search(query: IndexerQuery) -> IndexerResult:
             elif source == "elasticsearch":
                 es_results = docs
 
-    # Combine and deduplicate
-    for doc in pinecone_results + es_results:
-        if doc.cid not in combined_results:
-            combined_results[doc.cid] = doc
-        else:
-            # Simple merge: keep existing, maybe update score if higher?
-            # More advanced fusion (RRF) could be implemented here later.
-            if doc.score and combined_results[doc.cid].score:
-                 combined_results[doc.cid].score = max(doc.score, combined_results[doc.cid].score or 0.0)
-            elif doc.score:
-                 combined_results[doc.cid].score = doc.score
-
+    # Combine and deduplicate with Reciprocal Rank Fusion: cosine and BM25 scores are not
+    # comparable, so each document scores sum(1 / (RRF_K + rank)) over the lists it appears in.
+    for ranked_docs in (pinecone_results, es_results):
+        for rank, doc in enumerate(ranked_docs, start=1):
+            rrf_score = 1.0 / (RRF_K + rank)
+            if doc.cid not in combined_results:
+                combined_results[doc.cid] = doc.model_copy(update={"score": rrf_score})
+            else:
+                combined_results[doc.cid].score += rrf_score
 
     final_results = sorted(combined_results.values(), key=lambda d: d.score or 0.0, reverse=True)
 
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 # Import the api module we created
 from . import api
+from ...utils.log import configure_logging, shutdown_logging
 # We might need settings later, potentially shared or service-specific
 # from ...config import settings # Adjust import based on final structure
 # We will need background task processing later
@@ -20,19 +21,20 @@ async def health_check():
 # Include the router from api.py
 app.include_router(api.router)
 
-# Add startup/shutdown events if needed
-# @app.on_event("startup")
-# async def startup_event():
-#     # Initialize resources like DB connections, IPFS client, queue connection
-#     # Start background worker task(s)
-#     # processing.start_workers()
-#     pass
-#
-# @app.on_event("shutdown")
-# async def shutdown_event():
-#     # Clean up resources, stop workers gracefully
-#     # await processing.stop_workers()
-#     pass
+@app.on_event("startup")
+async def startup_event():
+    """Starts the non-blocking log writer."""
+    configure_logging()
+    # TODO: Initialize resources like DB connections, IPFS client, queue connection
+    # Start background worker task(s)
+    # processing.start_workers()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flushes queued log records."""
+    # TODO: Clean up resources, stop workers gracefully
+    # await processing.stop_workers()
+    shutdown_logging()
 
 
 if __name__ == "__main__":
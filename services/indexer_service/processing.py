@@ -1,5 +1,6 @@
 import asyncio
 import io
+import logging
 from typing import Optional, Dict, Any, List
 from PyPDF2 import PdfReader
 from elasticsearch import AsyncElasticsearch # Import Elasticsearch async client
@@ -8,13 +9,15 @@ from elasticsearch import AsyncElasticsearch # Import Elasticsearch async client
 # Assumes monorepo structure or installed package
 try:
     from ...data_layer import ipfs_client
-    from ...core_ai.routing import generate_embedding, EMBEDDING_DIMENSIONS
+    from ...core_ai.routing import generate_embeddings, EMBEDDING_DIMENSIONS
     from ...core_ai.routing import index as pinecone_index
-    from ...config import settings # Import shared settings
+    from ...config.settings import settings # Import shared settings
+    from ...utils.log import get_logger
 except ImportError:
     print("Warning: Could not import shared clients/functions/settings. Processing will be purely simulated.")
+    get_logger = None
     ipfs_client = None
-    generate_embedding = None
+    generate_embeddings = None
     pinecone_index = None
     settings = None # Indicate settings are unavailable
     EMBEDDING_DIMENSIONS = 1536
@@ -54,11 +57,31 @@ else:
     print("Warning: Settings not loaded, cannot initialize Elasticsearch client.")
 
 
+class _StdlibLogger:
+    """Stand-in for the shared StructuredLogger when it cannot be imported: fields are appended to the message."""
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level: int, msg: str, *args: Any, **fields: Any):
+        if fields:
+            msg += " " + " ".join(f"{key}=%r" for key in fields)
+            args += tuple(fields.values())
+        self._logger.log(level, msg, *args)
+
+    def debug(self, msg: str, *args: Any, **fields: Any): self._log(logging.DEBUG, msg, *args, **fields)
+    def info(self, msg: str, *args: Any, **fields: Any): self._log(logging.INFO, msg, *args, **fields)
+    def warning(self, msg: str, *args: Any, **fields: Any): self._log(logging.WARNING, msg, *args, **fields)
+    def error(self, msg: str, *args: Any, **fields: Any): self._log(logging.ERROR, msg, *args, **fields)
+
+logger = get_logger(__name__) if get_logger else _StdlibLogger(__name__)
+
+
 async def process_cid(cid: str, user_metadata: Optional[Dict[str, Any]] = None):
     """
     Background task to fetch, process, and index content for a given CID.
     """
-    print(f"[Indexer Worker] Starting processing for CID: {cid}")
+    logger.info("Starting processing for CID %s", cid, cid=cid)
     metadata_to_store = user_metadata or {} # Use provided metadata or empty dict
 
     # 1. Fetch content from IPFS
@@ -68,14 +91,14 @@ async def process_cid(cid: str, user_metadata: Optional[Dict[str, Any]] = None):
         try:
             content_bytes = await ipfs_client.get_ipfs_content(cid)
             if not content_bytes:
-                print(f"[Indexer Worker] Error: Failed to fetch content for CID {cid}.")
+                logger.error("Failed to fetch content", cid=cid)
                 return
-            print(f"[Indexer Worker] Fetched {len(content_bytes)} bytes for CID {cid}.")
+            logger.debug("Fetched content", cid=cid, size_bytes=len(content_bytes))
         except Exception as e:
-            print(f"[Indexer Worker] Error fetching IPFS content for {cid}: {e}")
+            logger.error("Error fetching IPFS content", cid=cid, error=str(e))
             return
     else:
-        print("[Indexer Worker] Skipping IPFS fetch (client unavailable).")
+        logger.warning("Skipping IPFS fetch (client unavailable)", cid=cid)
         return
 
     # 2. Process Content - Extract Text
@@ -83,47 +106,48 @@ async def process_cid(cid: str, user_metadata: Optional[Dict[str, Any]] = None):
     # ... (Text extraction logic remains the same) ...
     content_type = metadata_to_store.get("content_type", "").lower()
     filename = metadata_to_store.get("filename", "").lower()
-    print(f"[Indexer Worker] Attempting text extraction for CID {cid} (type: {content_type}, filename: {filename})")
+    logger.debug("Attempting text extraction", cid=cid, content_type=content_type, filename=filename)
     try:
         if "application/pdf" in content_type or filename.endswith(".pdf"):
             pdf_file = io.BytesIO(content_bytes)
             reader = PdfReader(pdf_file)
             extracted_pages = [page.extract_text() for page in reader.pages if page.extract_text()]
             processed_text = "\n".join(extracted_pages)
-            if processed_text: print(f"[Indexer Worker] Extracted text from PDF CID {cid} ({len(reader.pages)} pages).")
-            else: print(f"[Indexer Worker] Warning: No text extracted from PDF CID {cid}.")
+            if processed_text: logger.debug("Extracted text from PDF", cid=cid, pages=len(reader.pages))
+            else: logger.warning("No text extracted from PDF", cid=cid)
         elif content_type.startswith("text/") or any(filename.endswith(ext) for ext in ['.txt', '.md', '.py', '.js', '.html', '.css', '.json', '.xml', '.csv']):
             processed_text = content_bytes.decode('utf-8')
-            print(f"[Indexer Worker] Decoded text content for CID {cid}.")
+            logger.debug("Decoded text content", cid=cid)
         else:
-            print(f"[Indexer Worker] Warning: Unsupported content type '{content_type}' or filename '{filename}' for text extraction.")
+            logger.warning("Unsupported content type or filename for text extraction", cid=cid, content_type=content_type, filename=filename)
             processed_text = None
     except Exception as e:
-        print(f"[Indexer Worker] Error during content processing for CID {cid}: {e}")
+        logger.error("Error during content processing", cid=cid, error=str(e))
         processed_text = None
 
     if not processed_text:
-        print(f"[Indexer Worker] No text extracted for CID {cid}. Aborting further indexing steps.")
+        logger.warning("No text extracted, aborting further indexing steps", cid=cid)
         return
 
     MAX_TEXT_LENGTH = 20000
     if len(processed_text) > MAX_TEXT_LENGTH:
-        print(f"[Indexer Worker] Truncating extracted text from {len(processed_text)} to {MAX_TEXT_LENGTH} chars for embedding.")
+        logger.debug("Truncating extracted text for embedding", cid=cid, length=len(processed_text), max_length=MAX_TEXT_LENGTH)
         processed_text = processed_text[:MAX_TEXT_LENGTH]
 
     # 3. Generate Embedding
     content_embedding: Optional[List[float]] = None
     # ... (Embedding generation logic remains the same) ...
-    if generate_embedding:
+    if generate_embeddings:
         try:
-            content_embedding = await generate_embedding(processed_text)
-            if content_embedding: print(f"[Indexer Worker] Generated embedding for CID {cid} (dim: {len(content_embedding)}).")
-            else: print(f"[Indexer Worker] Failed to generate embedding for CID {cid}.")
+            # One embedding of the whole (truncated) text per document, as stored in the existing index
+            content_embedding = (await generate_embeddings([processed_text]))[0]
+            if content_embedding: logger.debug("Generated embedding", cid=cid, dimensions=len(content_embedding))
+            else: logger.error("Failed to generate embedding", cid=cid)
         except Exception as e:
-            print(f"[Indexer Worker] Error generating embedding for {cid}: {e}")
+            logger.error("Error generating embedding", cid=cid, error=str(e))
             content_embedding = None
     else:
-        print("[Indexer Worker] Skipping embedding generation (function unavailable).")
+        logger.warning("Skipping embedding generation (function unavailable)", cid=cid)
 
 
     # 4. Upsert to Vector Database (Pinecone)
@@ -136,11 +160,11 @@ async def process_cid(cid: str, user_metadata: Optional[Dict[str, Any]] = None):
                 None,
                 lambda: pinecone_index.upsert(vectors=[(cid, content_embedding, metadata_to_store)])
             )
-            print(f"[Indexer Worker] Upserted vector for CID {cid} to Pinecone.")
+            logger.debug("Upserted vector to Pinecone", cid=cid)
         except Exception as e:
-            print(f"[Indexer Worker] Error upserting vector for {cid} to Pinecone: {e}")
+            logger.error("Error upserting vector to Pinecone", cid=cid, error=str(e))
     else:
-        print("[Indexer Worker] Skipping Pinecone upsert (index unavailable or no embedding).")
+        logger.warning("Skipping Pinecone upsert (index unavailable or no embedding)", cid=cid)
 
 
     # 5. Index in Keyword Search (Elasticsearch)
@@ -167,13 +191,13 @@ async def process_cid(cid: str, user_metadata: Optional[Dict[str, Any]] = None):
                 id=cid, # Use CID as the document ID (ensures updates overwrite)
                 document=doc_to_index
             )
-            print(f"[Indexer Worker] Indexed document for CID {cid} in Elasticsearch. Result: {response.get('result')}")
+            logger.debug("Indexed document in Elasticsearch", cid=cid, result=response.get('result'))
         except Exception as e:
-            print(f"[Indexer Worker] Error indexing document for {cid} in Elasticsearch: {e}")
+            logger.error("Error indexing document in Elasticsearch", cid=cid, error=str(e))
     else:
-        print("[Indexer Worker] Skipping Elasticsearch indexing (client unavailable, no text, or settings missing).")
+        logger.warning("Skipping Elasticsearch indexing (client unavailable, no text, or settings missing)", cid=cid)
 
-    print(f"[Indexer Worker] Finished processing for CID: {cid}")
+    logger.info("Finished processing for CID %s", cid, cid=cid)
 
 # Placeholder for starting/stopping background workers if not using simple BackgroundTasks
 # async def start_workers(): ...
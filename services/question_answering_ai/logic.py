@@ -18,8 +18,9 @@ except ImportError:
 
 # Import settings, potentially shared or service-specific
 try:
-    from ...config import settings
-    llm_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    from ...config.settings import settings
+    from ...utils.llm_gateway import llm_gateway
+    llm_client = llm_gateway # Shared gateway: concurrency/rate limits, retries and usage metrics
     # Choose a model suitable for QA/RAG
     QA_MODEL = settings.SYNTHESIS_MODEL # Example: Reuse synthesis model
 except ImportError:
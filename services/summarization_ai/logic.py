@@ -12,9 +12,10 @@ except ImportError:
 
 # Import settings, potentially shared or service-specific
 try:
-    from ...config import settings
+    from ...config.settings import settings
     # Initialize LLM client (reuse or create new)
-    llm_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    from ...utils.llm_gateway import llm_gateway
+    llm_client = llm_gateway # Shared gateway: concurrency/rate limits, retries and usage metrics
     # Choose a model suitable for summarization
     SUMMARY_MODEL = "gpt-3.5-turbo" # Example, could be configurable
 except ImportError:
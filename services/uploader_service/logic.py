@@ -8,7 +8,7 @@ try:
     from ...data_layer import ipfs_client
     from ...tokenomics import service as tokenomics_service
     from ...tokenomics import ledger # Import ledger module for DB functions
-    from ...config import settings
+    from ...config.settings import settings
     # Need the URL for the indexer's announcement endpoint
     INDEXER_ANNOUNCE_URL = getattr(settings, "INDEXER_API_URL", "http://localhost:8010") + "/announce"
     INTERNAL_API_KEY = getattr(settings, "INTERNAL_API_KEY", "change-this-in-production")
@@ -93,7 +93,7 @@ async def handle_upload(
 
             # 4. Award Reward (if applicable)
             if reward_amount > 0:
-                reward_success = await tokenomics_service.reward_user_for_data(user_id, reward_amount)
+                reward_success = await tokenomics_service.reward_user_for_data(user_id, reward_amount, cid=cid)
                 if reward_success:
                     # Use ledger function to mark as rewarded
                     await ledger.add_rewarded_upload(cid)
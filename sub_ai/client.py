@@ -1,5 +1,8 @@
 import asyncio
-from typing import Any, Optional
+import hashlib
+import importlib.util
+import json
+from typing import Any, Dict, List, Optional, Tuple
 import httpx # Import httpx
 import numpy as np
 # from scipy.linalg import svd # Import if/when SVD is implemented
@@ -7,7 +10,14 @@ import numpy as np
 # Adjust import path if structure changes
 from ..core_ai.routing import RoutingDecision
 from ..core_ai.models import SubAIResponse
-from ..config import settings # Import settings to potentially get base URLs or API keys later
+from ..core_ai.embedding_cache import normalize_text
+from ..utils.ttl_cache import TTLCache, MISSING
+from ..utils.single_flight import SingleFlight
+from ..utils.telemetry import span, trace_headers
+from ..utils.log import get_logger
+from ..config.settings import settings # Import settings to potentially get base URLs or API keys later
+
+logger = get_logger(__name__)
 
 # Placeholder for Sub-AI endpoint configuration
 # TODO: Move to settings or a dynamic service discovery mechanism
@@ -23,51 +33,219 @@ SUB_AI_ENDPOINTS = {
 DEFAULT_TIMEOUT = 60.0
 DYNAMIC_TIMEOUT = 120.0
 
-async def invoke_sub_ai(decision: RoutingDecision) -> SubAIResponse:
+# --- Shared HTTP Client Registry ---
+# One pooled AsyncClient per Sub-AI target, created lazily and reused for the lifetime
+# of the process so keep-alive connections survive across invocations.
+HTTP_MAX_CONNECTIONS = int(getattr(settings, "SUB_AI_HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(getattr(settings, "SUB_AI_HTTP_MAX_KEEPALIVE_CONNECTIONS", 10))
+HTTP_KEEPALIVE_EXPIRY = float(getattr(settings, "SUB_AI_HTTP_KEEPALIVE_EXPIRY", 30.0))
+# httpx needs the optional 'h2' package for HTTP/2; fall back to HTTP/1.1 without it
+HTTP2_ENABLED = bool(getattr(settings, "SUB_AI_HTTP2_ENABLED", True)) and importlib.util.find_spec("h2") is not None
+
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+# --- Specialist Result Cache ---
+# Responses are cached per (target, normalized payload) and concurrent identical calls
+# share a single in-flight request.
+RESULT_CACHE_ENABLED = bool(getattr(settings, "SUB_AI_RESULT_CACHE_ENABLED", True))
+RESULT_CACHE_MAX_ENTRIES = int(getattr(settings, "SUB_AI_RESULT_CACHE_MAX_ENTRIES", 10000))
+RESULT_CACHE_DEFAULT_TTL = float(getattr(settings, "SUB_AI_RESULT_CACHE_DEFAULT_TTL", 600.0))
+# Per-target TTL overrides in seconds (0 disables caching for that target, coalescing still applies)
+RESULT_CACHE_TTLS: Dict[str, float] = {
+    "IPFSSearch": 60.0, # Results change as new data is indexed
+    "DynamicBaseModel": 0.0, # Generative output, not worth replaying
+    **getattr(settings, "SUB_AI_RESULT_CACHE_TTLS", {}),
+}
+# HTTP/network errors are remembered briefly so a failing specialist is not hammered
+RESULT_CACHE_ERROR_TTL = float(getattr(settings, "SUB_AI_RESULT_CACHE_ERROR_TTL", 5.0))
+
+_result_cache: Optional[TTLCache] = TTLCache(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl_seconds=RESULT_CACHE_DEFAULT_TTL) if RESULT_CACHE_ENABLED else None
+_in_flight = SingleFlight("sub_ai")
+
+def get_http_client(target_key: str) -> httpx.AsyncClient:
+    """
+    Returns the pooled HTTP client for a Sub-AI target, creating it on first use.
+
+    Args:
+        target_key: Key of the target in SUB_AI_ENDPOINTS (e.g. 'SummarizationAI').
+
+    Returns:
+        A shared httpx.AsyncClient with its own connection pool.
+    """
+    client = _http_clients.get(target_key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=DEFAULT_TIMEOUT,
+            http2=HTTP2_ENABLED,
+        )
+        _http_clients[target_key] = client
+    return client
+
+async def startup_http_clients():
+    """Creates the pooled HTTP clients for all configured Sub-AI endpoints."""
+    for target_key in SUB_AI_ENDPOINTS:
+        get_http_client(target_key)
+    logger.info("Initialized pooled Sub-AI HTTP clients", count=len(_http_clients), http2=HTTP2_ENABLED)
+
+async def shutdown_http_clients():
+    """Closes all pooled HTTP clients and clears the registry."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    results = await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Error closing Sub-AI HTTP client", error=str(result))
+    logger.info("Closed pooled Sub-AI HTTP clients", count=len(clients))
+
+def _normalize_payload(payload: dict) -> dict:
+    """
+    Collapses whitespace in the natural-language instruction so trivially different requests
+    share a cache entry. Every other field (context, code, data) is hashed exactly.
+    """
+    instruction = payload.get("instruction")
+    if isinstance(instruction, str):
+        return {**payload, "instruction": normalize_text(instruction)}
+    return payload
+
+def _result_cache_key(endpoint_key: str, payload: dict) -> str:
+    canonical = json.dumps(_normalize_payload(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return f"{endpoint_key}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+async def _post(endpoint_key: str, endpoint: str, payload: dict, timeout: float) -> Any:
+    """
+    Posts the payload to a Sub-AI and returns the 'content' of its JSON response.
+    The request is traced as a 'sub_ai_request' span whose context is sent along
+    in a W3C `traceparent` header.
+    """
+    # Reuse the pooled client for this target instead of opening a new connection per call
+    client = get_http_client(endpoint_key)
+    with span("sub_ai_request", target=endpoint_key):
+        # TODO: Add internal API Key authentication header from settings if needed
+        # headers = {"X-API-Key": settings.INTERNAL_API_KEY}
+        headers = trace_headers()
+        response = await client.post(endpoint, json=payload, timeout=timeout, headers=headers)
+        response.raise_for_status() # Raise exception for bad status codes (4xx or 5xx)
+        # Assuming the Sub-AI endpoint returns JSON like {"content": ...}
+        response_data = response.json()
+        return response_data.get("content")
+
+async def _post_and_cache(cache_key: str, endpoint_key: str, endpoint: str, payload: dict, timeout: float) -> Any:
+    try:
+        content = await _post(endpoint_key, endpoint, payload, timeout)
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        if _result_cache is not None and RESULT_CACHE_ERROR_TTL > 0:
+            _result_cache.put(cache_key, ("error", e), ttl_seconds=RESULT_CACHE_ERROR_TTL)
+        raise
+    ttl = RESULT_CACHE_TTLS.get(endpoint_key, RESULT_CACHE_DEFAULT_TTL)
+    if _result_cache is not None and ttl > 0:
+        _result_cache.put(cache_key, ("success", content), ttl_seconds=ttl)
+    return content
+
+async def _post_cached(endpoint_key: str, endpoint: str, payload: dict, timeout: float) -> Tuple[Any, bool]:
+    """
+    Cached and coalesced variant of _post: repeats are served from the result cache
+    (re-raising a recently cached error) and concurrent identical calls await one request
+    (cancelled only once every caller waiting for it is cancelled, e.g. a dropped straggler,
+    so an abandoned request frees its connection and caches nothing).
+
+    Returns:
+        (content, whether it was served from the result cache)
+    """
+    cache_key = _result_cache_key(endpoint_key, payload)
+    if _result_cache is not None:
+        cached = _result_cache.get(cache_key)
+        if cached is not MISSING:
+            outcome, value = cached
+            logger.debug("Sub-AI result cache hit", target=endpoint_key, outcome=outcome)
+            if outcome == "error":
+                raise value
+            return value, True
+
+    return await _in_flight.do(cache_key, lambda: _post_and_cache(cache_key, endpoint_key, endpoint, payload, timeout)), False
+
+def _upstream_context(upstream_responses: List[SubAIResponse]) -> List[Dict[str, Any]]:
+    """Summarizes the responses of the sub-tasks this one depends on, for inclusion in its payload."""
+    return [
+        {"sub_task_id": res.sub_task_id, "source_sub_ai_id": res.source_sub_ai_id, "content": res.content}
+        for res in upstream_responses
+    ]
+
+async def invoke_sub_ai(decision: RoutingDecision, upstream_responses: Optional[List[SubAIResponse]] = None) -> SubAIResponse:
     """
     Invokes the appropriate Sub-AI via HTTP based on the routing decision.
+    Each invocation is traced as a 'sub_ai_invocation' span.
 
     Args:
         decision: The RoutingDecision object containing the sub-task and target info.
+        upstream_responses: Responses of the sub-tasks listed in the sub-task's `depends_on`,
+                            passed to the Sub-AI as context.
 
     Returns:
         A SubAIResponse object.
     """
+    with span(
+        "sub_ai_invocation",
+        sub_task_id=decision.sub_task.sub_task_id,
+        route_type=decision.route_type,
+        target=decision.target_id or "DynamicBaseModel"
+    ) as invocation_span:
+        response = await _invoke_sub_ai(decision, upstream_responses)
+        if response.status != "success":
+            invocation_span.set_status("error")
+            invocation_span.set_attribute("error", response.error_message)
+        return response
+
+async def _invoke_sub_ai(decision: RoutingDecision, upstream_responses: Optional[List[SubAIResponse]]) -> SubAIResponse:
     sub_task = decision.sub_task
     target_id = decision.target_id # Will be None for dynamic instances initially
     source_id_for_response = "unknown"
     response_content: Any = None
+    cached = False
     status = "error" # Default to error
     error_message: str | None = None
     endpoint: str | None = None
+    endpoint_key: str | None = None
     payload: dict = {}
     timeout: float = DEFAULT_TIMEOUT
 
     try:
         if decision.route_type == 'fixed_specialist' and target_id:
+            endpoint_key = target_id
             endpoint = SUB_AI_ENDPOINTS.get(target_id)
             source_id_for_response = target_id
             if not endpoint:
                 raise ValueError(f"No endpoint configured for fixed specialist: {target_id}")
             payload = {"instruction": sub_task.instruction}
+            if upstream_responses:
+                payload["context"] = _upstream_context(upstream_responses)
             timeout = DEFAULT_TIMEOUT
-            print(f"Calling FIXED specialist '{target_id}' at {endpoint} for task: {sub_task.sub_task_id}")
+            logger.debug("Calling fixed specialist", target=target_id, endpoint=endpoint, sub_task_id=sub_task.sub_task_id)
 
         elif decision.route_type == 'dynamic_instance':
-            endpoint = SUB_AI_ENDPOINTS.get("DynamicBaseModel")
+            endpoint_key = "DynamicBaseModel"
+            endpoint = SUB_AI_ENDPOINTS.get(endpoint_key)
             source_id_for_response = f"dynamic_instance_{sub_task.sub_task_id}" # Example ID
             if not endpoint:
                 raise ValueError("No endpoint configured for DynamicBaseModel")
             # TODO: Construct the dynamic prompt more robustly, potentially including context fetched based on task
             dynamic_prompt = f"Act as an expert and perform the following task: {sub_task.instruction}"
+            if upstream_responses:
+                # The base model only takes a prompt, so earlier results are inlined into it
+                context_json = json.dumps(_upstream_context(upstream_responses), default=str)
+                dynamic_prompt += f"\n\nUse these results from earlier steps as input:\n{context_json}"
             payload = {"prompt": dynamic_prompt} # Assuming base model takes 'prompt'
             timeout = DYNAMIC_TIMEOUT # Allow longer for potentially complex dynamic tasks
-            print(f"Calling DYNAMIC base model at {endpoint} for task: {sub_task.sub_task_id}")
+            logger.debug("Calling dynamic base model", endpoint=endpoint, sub_task_id=sub_task.sub_task_id)
 
             # --- Transformer Squared: Pass 2 - Model Adaptation ---
             adapted_model_instance = None # Placeholder for the adapted model
             if decision.task_category:
-                print(f"Task category '{decision.task_category}' detected. Attempting SVF adaptation.")
+                logger.debug("Task category detected, attempting SVF adaptation", category=decision.task_category)
 
                 # Placeholder Step 1: Retrieve SVF Vector (z)
                 # TODO: Implement get_svf_vector function
@@ -81,7 +259,7 @@ async def invoke_sub_ai(decision: RoutingDecision) -> SubAIResponse:
                 svf_vector_z = None # Placeholder value
 
                 if svf_vector_z is not None:
-                    print("Placeholder: SVF vector retrieved. Proceeding with adaptation.")
+                    logger.debug("Placeholder: SVF vector retrieved. Proceeding with adaptation.")
                     # Placeholder Step 2: Apply SVF Adaptation
                     # TODO: Implement the actual model adaptation logic
                     # 1. Identify the target model instance (e.g., load the base model)
@@ -97,7 +275,7 @@ async def invoke_sub_ai(decision: RoutingDecision) -> SubAIResponse:
                     #    e. Update the model in memory with W_prime
                     #       set_model_weight(target_model, layer_name, W_prime) # Hypothetical
                     # adapted_model_instance = target_model # Assign the adapted model
-                    print("Placeholder: SVF adaptation applied to model weights.")
+                    logger.debug("Placeholder: SVF adaptation applied to model weights.")
 
                     # Placeholder Step 3: Invoke Adapted Model
                     # The subsequent HTTP call should ideally use the adapted_model_instance
@@ -106,12 +284,12 @@ async def invoke_sub_ai(decision: RoutingDecision) -> SubAIResponse:
                     # - Serializing adapted weights and sending them.
                     # - Assuming the current endpoint can handle an adapted model state (if state is managed server-side).
                     # For now, we'll just note that the call below *should* use the adapted model.
-                    print("Placeholder: Proceeding to invoke the *adapted* model.")
+                    logger.debug("Placeholder: Proceeding to invoke the *adapted* model.")
 
                 else:
-                    print("Placeholder: SVF vector not found or adaptation failed. Using original model.")
+                    logger.debug("Placeholder: SVF vector not found or adaptation failed. Using original model.")
             else:
-                print("No task category provided. Using original model.")
+                logger.debug("No task category provided. Using original model.")
             # --- End Model Adaptation ---
 
             # If adaptation was successful and modified the model in memory,
@@ -122,45 +300,37 @@ async def invoke_sub_ai(decision: RoutingDecision) -> SubAIResponse:
             raise ValueError(f"Invalid route_type in decision: {decision.route_type}")
 
         # --- Actual HTTP call ---
-        async with httpx.AsyncClient() as client:
-            # TODO: Add internal API Key authentication header from settings if needed
-            # headers = {"X-API-Key": settings.INTERNAL_API_KEY}
-            headers = {} # Placeholder
-            response = await client.post(endpoint, json=payload, timeout=timeout, headers=headers)
-            response.raise_for_status() # Raise exception for bad status codes (4xx or 5xx)
-            # Assuming the Sub-AI endpoint returns JSON like {"content": ...}
-            response_data = response.json()
-            response_content = response_data.get("content")
-            status = "success"
-            print(f"Successful response received from {source_id_for_response} for task {sub_task.sub_task_id}")
-
-            # --- Transformer Squared: Post-Inference ---
-            # Placeholder Step 4: Revert Weights (Optional)
-            # If the adaptation was temporary for this request, revert weights here.
-            # TODO: Implement weight reversion if needed
-            # if adapted_model_instance and svf_vector_z is not None:
-            #     print("Placeholder: Reverting model weights to original state.")
-            #     # Logic to restore original weights to the model instance
-            # --- End Post-Inference ---
+        response_content, cached = await _post_cached(endpoint_key, endpoint, payload, timeout)
+        status = "success"
+        logger.debug("Sub-AI response received", source=source_id_for_response, sub_task_id=sub_task.sub_task_id)
+
+        # --- Transformer Squared: Post-Inference ---
+        # Placeholder Step 4: Revert Weights (Optional)
+        # If the adaptation was temporary for this request, revert weights here.
+        # TODO: Implement weight reversion if needed
+        # if adapted_model_instance and svf_vector_z is not None:
+        #     print("Placeholder: Reverting model weights to original state.")
+        #     # Logic to restore original weights to the model instance
+        # --- End Post-Inference ---
 
         # --- End HTTP call ---
 
     except httpx.HTTPStatusError as e:
         # Handle HTTP errors (e.g., 4xx, 5xx) specifically
         error_message = f"HTTP error calling {source_id_for_response}: {e.response.status_code} - {e.response.text}"
-        print(error_message)
+        logger.warning(error_message, sub_task_id=sub_task.sub_task_id)
     except httpx.RequestError as e:
         # Handle network-related errors (e.g., connection refused, timeout)
         error_message = f"Network error calling {source_id_for_response}: {e}"
-        print(error_message)
+        logger.warning(error_message, sub_task_id=sub_task.sub_task_id)
     except ValueError as e:
         # Handle configuration errors (e.g., missing endpoint)
         error_message = str(e)
-        print(error_message)
+        logger.warning(error_message, sub_task_id=sub_task.sub_task_id)
     except Exception as e:
         # Catch any other unexpected errors
         error_message = f"Unexpected error invoking {source_id_for_response}: {e}"
-        print(error_message)
+        logger.exception(error_message, sub_task_id=sub_task.sub_task_id)
         # Ensure content is None on error
         response_content = None
 
@@ -169,5 +339,6 @@ async def invoke_sub_ai(decision: RoutingDecision) -> SubAIResponse:
         source_sub_ai_id=source_id_for_response,
         content=response_content,
         status=status,
-        error_message=error_message
+        error_message=error_message,
+        metadata={"cached": True} if cached else None # Billed at TOKEN_CACHED_INVOCATION_RATE (see tokenomics)
     )
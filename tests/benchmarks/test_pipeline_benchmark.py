@@ -0,0 +1,69 @@
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from benchmarks.pipeline_benchmark import BenchmarkConfig, run_benchmark, summarize_latencies, compare_to_baseline
+from benchmarks.fakes import fake_embedding, specialist_vector
+from core_ai import orchestrator, routing
+
+# --- Test Cases ---
+
+def test_summarize_latencies_percentiles():
+    summary = summarize_latencies([i / 1000.0 for i in range(1, 101)]) # 1..100 ms
+
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == pytest.approx(50.0)
+    assert summary["p95_ms"] == pytest.approx(95.0)
+    assert summary["p99_ms"] == pytest.approx(99.0)
+    assert summary["max_ms"] == pytest.approx(100.0)
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {
+        "throughput_rps": 10.0,
+        "statuses": {"success": 100},
+        "end_to_end": {"p95_ms": 500.0},
+        "stages": {"synthesis": {"p95_ms": 300.0}, "cost_calculation": {"p95_ms": 0.1}},
+    }
+    report = {
+        "throughput_rps": 9.5,
+        "statuses": {"success": 100},
+        "end_to_end": {"p95_ms": 550.0}, # +10%: within tolerance
+        "stages": {"synthesis": {"p95_ms": 400.0}, "cost_calculation": {"p95_ms": 0.5}}, # +33%; tiny absolute change
+    }
+
+    regressions = compare_to_baseline(report, baseline, max_regression=0.2)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("synthesis")
+
+    report["statuses"] = {"success": 90, "error": 10}
+    assert any(r.startswith("error rate") for r in compare_to_baseline(report, baseline, max_regression=0.2))
+
+def test_fake_embeddings_route_by_keyword():
+    vector = fake_embedding("Summarize the background of: x", 64)
+    other = fake_embedding("Compose a short creative take on: x", 64)
+    target = specialist_vector("SummarizationAI", 64)
+
+    assert float(vector @ target) > routing.ROUTING_CONFIDENCE_THRESHOLD
+    assert float(other @ target) < routing.ROUTING_CONFIDENCE_THRESHOLD
+
+@pytest.mark.asyncio
+async def test_run_benchmark_end_to_end_offline():
+    """A small zero-latency run goes through every stage against the stand-ins and restores the patched modules."""
+    original_cache = orchestrator.response_cache
+    config = BenchmarkConfig(
+        requests=6, concurrency=1, warmup=1, users=2, sub_tasks=5,
+        llm_latency_ms=0, tokens_per_second=0, embedding_latency_ms=0,
+        specialist_latency_ms=0, dynamic_latency_ms=0,
+    )
+
+    report = await run_benchmark(config)
+
+    assert report["statuses"] == {"success": 6}
+    assert report["end_to_end"]["count"] == 6
+    for stage in ("decomposition", "embedding", "vector_query", "classification", "ledger_hold", "ledger_capture", "sub_ai_invocation", "synthesis"):
+        assert report["stages"][stage]["count"] >= 6
+    specialists = report["stand_in_requests"]["specialists"]
+    assert specialists["SummarizationAI"] == 7 # Warmup included
+    assert specialists["DynamicBaseModel"] == 7
+    assert report["stand_in_requests"]["openai"]["synthesis"] == 7
+    assert orchestrator.response_cache is original_cache
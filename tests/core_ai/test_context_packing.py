@@ -0,0 +1,105 @@
+import json
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai import context_packing
+from core_ai.context_packing import (
+    TokenCounter, allocate_budget, compact_content, condense, pack_synthesis_context,
+    CONDENSED_MARKER, TRUNCATION_MARKER,
+)
+from core_ai.models import SubTask, SubAIResponse
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def counter(mocker):
+    """Length-based counter (~4 chars per token), independent of whether tiktoken is installed."""
+    mocker.patch.object(context_packing, "tiktoken", None)
+    return TokenCounter("gpt-4o")
+
+# --- Building blocks ---
+
+def test_compact_content_drops_nulls_and_whitespace():
+    content = {"answer": "42", "notes": None, "items": [1, None, {"a": None, "b": 2}]}
+
+    assert compact_content(content) == '{"answer":"42","items":[1,{"b":2}]}'
+    assert compact_content("  plain text \n") == "plain text"
+
+def test_allocate_budget_redistributes_unused_share():
+    # Equal weights: the small item keeps its size, the others split what it leaves
+    assert allocate_budget([10, 500, 500], [1.0, 1.0, 1.0], 310) == [10, 150, 150]
+    # Proportional to weight when nothing fits
+    assert allocate_budget([1000, 1000], [1.5, 0.5], 400) == [300, 100]
+    # Everything fits: no cuts
+    assert allocate_budget([10, 20], [1.0, 1.0], 1000) == [10, 20]
+
+def test_condense_keeps_relevant_sentences_in_order(counter):
+    text = (
+        "Revenue grew twelve percent in the third quarter. "
+        "The office moved to a new building downtown. "
+        "Margins improved as revenue outpaced costs. "
+        "The cafeteria menu was updated."
+    )
+
+    condensed = condense(text, 30, {"revenue", "margins"}, counter)
+
+    assert condensed == "Revenue grew twelve percent in the third quarter. Margins improved as revenue outpaced costs." + CONDENSED_MARKER
+    assert counter.count(condensed) <= 30
+
+def test_condense_truncates_json(counter):
+    text = json.dumps({"rows": list(range(500))}, separators=(",", ":"))
+
+    condensed = condense(text, 50, set(), counter)
+
+    assert condensed.startswith('{"rows":[0,1,2')
+    assert condensed.endswith(TRUNCATION_MARKER)
+    assert counter.count(condensed) <= 51 # Marker and prefix are counted separately
+
+def test_token_counter_falls_back_when_encoding_cannot_load(mocker):
+    """An encoding that fails to load (e.g. offline BPE download) yields a cached length-based counter."""
+    fake_tiktoken = mocker.Mock()
+    fake_tiktoken.encoding_for_model.side_effect = ConnectionError("offline")
+    mocker.patch.object(context_packing, "tiktoken", fake_tiktoken)
+    mocker.patch.object(context_packing, "_counters", {})
+
+    counter = context_packing.get_token_counter("gpt-4o")
+
+    assert counter.count("a" * 40) == 11
+    assert context_packing.get_token_counter("gpt-4o") is counter
+    fake_tiktoken.encoding_for_model.assert_called_once()
+
+# --- pack_synthesis_context ---
+
+def test_pack_synthesis_context_within_budget(counter, mocker):
+    mocker.patch.object(context_packing, "get_token_counter", return_value=counter)
+    tasks = [
+        SubTask(sub_task_id="t1", instruction="Summarize solar panel efficiency"),
+        SubTask(sub_task_id="t2", instruction="List unrelated trivia"),
+        SubTask(sub_task_id="t3", instruction="Check panel prices"),
+        SubTask(sub_task_id="t4", instruction="Never answered"),
+    ]
+    responses = [
+        SubAIResponse(sub_task_id="t1", source_sub_ai_id="SummarizationAI", content="Solar panel efficiency is rising. " * 200),
+        SubAIResponse(sub_task_id="t2", source_sub_ai_id="DynamicBaseModel", content="Bananas are berries. " * 200),
+        SubAIResponse(sub_task_id="t3", source_sub_ai_id="DataAnalysisAI", content=None, status="error", error_message="timeout"),
+    ]
+
+    packed = pack_synthesis_context("How efficient are solar panels?", tasks, responses, "gpt-4o", budget=400)
+
+    assert counter.count(packed) <= 450 # Budget plus the fixed frame
+    assert packed.startswith("--- Relevant Information from Sub-Tasks ---\n")
+    assert packed.endswith("\n--- End Relevant Information ---\n")
+    assert "Response Status: error\nError: timeout" in packed
+    assert "Response: [No response received for this sub-task]" in packed
+    # The response matching the prompt gets the larger share
+    solar, bananas = packed.count("Solar panel efficiency"), packed.count("Bananas")
+    assert solar > bananas > 0
+
+def test_pack_synthesis_context_keeps_small_responses_verbatim():
+    tasks = [SubTask(sub_task_id="t1", instruction="Answer")]
+    responses = [SubAIResponse(sub_task_id="t1", source_sub_ai_id="QA", content={"answer": "yes", "source": None})]
+
+    packed = pack_synthesis_context("Question?", tasks, responses, "gpt-4o")
+
+    assert 'Source AI: QA\nResponse Content:\n```\n{"answer":"yes"}\n```' in packed
+    assert CONDENSED_MARKER not in packed and TRUNCATION_MARKER not in packed
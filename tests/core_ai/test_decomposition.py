@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from pytest_mock import MockerFixture
+from types import SimpleNamespace
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai import decomposition
+from utils.ttl_cache import TTLCache
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+def _chat_response(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+@pytest.fixture
+def mock_client(mocker: MockerFixture):
+    client = mocker.MagicMock()
+    mocker.patch.object(decomposition, "client", client)
+    mocker.patch.object(decomposition, "decomposition_cache", None)
+    return client
+
+# --- Test Cases ---
+
+async def test_decompose_prompt_maps_dependency_labels(mocker: MockerFixture, mock_client):
+    """The LLM's dependency labels are translated into generated sub_task_ids."""
+    mock_client.chat.completions.create = mocker.AsyncMock(return_value=_chat_response(
+        '{"sub_tasks": ['
+        '{"id": "t1", "instruction": "Search IPFS for X", "depends_on": []},'
+        '{"id": "t2", "instruction": "Explain Y"},'
+        '{"id": "t3", "instruction": "Summarize the search results", "depends_on": ["t1", "t3", "t9"]}]}'
+    ))
+
+    sub_tasks = await decomposition.decompose_prompt("Find X and summarize it, and explain Y")
+
+    assert [task.depends_on for task in sub_tasks[:2]] == [[], []]
+    assert sub_tasks[2].depends_on == [sub_tasks[0].sub_task_id] # Self and unknown labels dropped
+
+async def test_decompose_prompt_breaks_dependency_cycles(mocker: MockerFixture, mock_client):
+    """The edge closing a dependency cycle is dropped; other dependencies are kept."""
+    mock_client.chat.completions.create = mocker.AsyncMock(return_value=_chat_response(
+        '{"sub_tasks": ['
+        '{"id": "t1", "instruction": "A", "depends_on": ["t2"]},'
+        '{"id": "t2", "instruction": "B", "depends_on": ["t1"]},'
+        '{"id": "t3", "instruction": "C", "depends_on": ["t1"]}]}'
+    ))
+
+    sub_tasks = await decomposition.decompose_prompt("Cyclic request")
+
+    assert sub_tasks[0].depends_on == [sub_tasks[1].sub_task_id]
+    assert sub_tasks[1].depends_on == []
+    assert sub_tasks[2].depends_on == [sub_tasks[0].sub_task_id]
+
+async def test_decompose_prompt_memoizes_with_fresh_ids(mocker: MockerFixture, mock_client):
+    """A repeated prompt is served from the cache with new sub_task_ids and remapped dependencies."""
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    mocker.patch.object(decomposition, "decomposition_cache", cache)
+    mock_client.chat.completions.create = mocker.AsyncMock(return_value=_chat_response(
+        '{"sub_tasks": [{"id": "t1", "instruction": "A"}, {"id": "t2", "instruction": "B", "depends_on": ["t1"]}]}'
+    ))
+
+    first = await decomposition.decompose_prompt("Do A then B")
+    second = await decomposition.decompose_prompt("  Do A   then B ")
+
+    mock_client.chat.completions.create.assert_awaited_once()
+    assert [task.instruction for task in second] == ["A", "B"]
+    assert {task.sub_task_id for task in first}.isdisjoint(task.sub_task_id for task in second)
+    assert second[1].depends_on == [second[0].sub_task_id]
+    assert cache.stats["hits"] == 1
+
+async def test_concurrent_identical_prompts_share_one_llm_call(mocker: MockerFixture, mock_client):
+    """A burst of the same prompt issues one decomposition call; each caller gets its own sub_task_ids."""
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.01)
+        return _chat_response('{"sub_tasks": [{"id": "t1", "instruction": "A"}]}')
+    mock_client.chat.completions.create = mocker.AsyncMock(side_effect=slow_create)
+
+    results = await asyncio.gather(*(decomposition.decompose_prompt("Do A") for _ in range(3)))
+
+    mock_client.chat.completions.create.assert_awaited_once()
+    assert len({result[0].sub_task_id for result in results}) == 3
+
+async def test_fallback_model_answers_are_not_cached(mocker: MockerFixture, mock_client):
+    """A hedged call answered by the fallback model is returned but not cached under the primary's key."""
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    mocker.patch.object(decomposition, "decomposition_cache", cache)
+    mock_client.chat.completions.create = mocker.AsyncMock(return_value=_chat_response('{"sub_tasks": [{"id": "t1", "instruction": "A"}]}'))
+    cache_key = decomposition._decomposition_cache_key("Do A")
+
+    response = await decomposition._decompose_with_llm("Do A", cache_key, "fallback-model")
+
+    assert [task.instruction for task in response.sub_tasks] == ["A"]
+    assert len(cache) == 0
@@ -0,0 +1,51 @@
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai.embedding_cache import EmbeddingCache, make_cache_key
+
+# --- Test Cases ---
+
+def test_cache_key_normalizes_whitespace_and_includes_model():
+    """Whitespace-only differences share a key; model and dimensions do not."""
+    key = make_cache_key("hello   world", "text-embedding-3-small", 1536)
+
+    assert key == make_cache_key(" hello world\n", "text-embedding-3-small", 1536)
+    assert key != make_cache_key("hello world", "text-embedding-3-large", 1536)
+    assert key != make_cache_key("hello world", "text-embedding-3-small", 256)
+
+def test_memory_tier_lru_eviction():
+    """The least recently used entry is evicted once max_entries is exceeded."""
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.get_many(["a"]) # 'a' becomes most recently used
+    cache.put_many({"c": [3.0]})
+
+    found = cache.get_many(["a", "b", "c"])
+
+    assert set(found) == {"a", "c"}
+    assert cache.stats["memory_evictions"] == 1
+    assert cache.stats["misses"] == 1
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Vectors written to the SQLite tier are found by a fresh cache instance."""
+    db_path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(max_entries=10, db_path=db_path)
+    cache.put_many({"k": [0.5, -0.25]})
+    cache.close()
+
+    reopened = EmbeddingCache(max_entries=10, db_path=db_path)
+    found = reopened.get_many(["k"])
+
+    assert found["k"] == pytest.approx([0.5, -0.25])
+    assert reopened.stats["disk_hits"] == 1
+    assert len(reopened) == 1 # Promoted into the memory tier
+
+def test_disk_tier_size_cap(tmp_path):
+    """The SQLite tier evicts its oldest rows beyond max_disk_entries."""
+    cache = EmbeddingCache(max_entries=1, db_path=str(tmp_path / "embeddings.db"), max_disk_entries=2)
+    cache.put_many({"a": [1.0]})
+    cache.put_many({"b": [2.0]})
+    cache.put_many({"c": [3.0]})
+
+    assert cache.stats["disk_evictions"] == 1
+    assert len(cache.get_many(["a", "b", "c"])) == 2
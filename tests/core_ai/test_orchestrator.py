@@ -4,13 +4,32 @@ from typing import List
 import asyncio # Need asyncio for mocking gather
 
 # Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai import orchestrator
 from core_ai.orchestrator import process_user_prompt
-from core_ai.models import UserInput, SubTask, SubAIResponse, FinalResponse, RoutingDecision
+from core_ai.models import UserInput, SubTask, SubAIResponse, FinalResponse
+from core_ai.routing import RoutingDecision
+from core_ai.response_cache import PromptResponseCache
+from sub_ai import client as sub_ai_client
+from utils.ttl_cache import TTLCache
 
 # Mark all tests in this file as asyncio
 pytestmark = pytest.mark.asyncio
 
 # --- Test Fixtures (Optional but good practice) ---
+@pytest.fixture(autouse=True)
+def disable_response_cache(mocker: MockerFixture):
+    """Keeps the process-wide response cache from leaking answers between tests."""
+    mocker.patch.object(orchestrator, 'response_cache', None)
+
+@pytest.fixture(autouse=True)
+def ledger_holds(mocker: MockerFixture):
+    """Authorizes every query unless a test says otherwise; returns the place/capture/release mocks."""
+    return mocker.Mock(
+        place=mocker.patch.object(orchestrator, 'place_query_hold', return_value=(True, "hold-1")),
+        capture=mocker.patch.object(orchestrator, 'capture_query_hold', return_value=True),
+        release=mocker.patch.object(orchestrator, 'release_query_hold', return_value=True),
+    )
+
 @pytest.fixture
 def sample_user_input() -> UserInput:
     """Provides a sample UserInput object."""
@@ -44,6 +63,7 @@ def mock_sub_ai_responses(mock_sub_tasks) -> List[SubAIResponse]:
 
 async def test_process_user_prompt_success(
     mocker: MockerFixture,
+    ledger_holds,
     sample_user_input: UserInput,
     mock_sub_tasks: List[SubTask],
     mock_routing_decisions: List[RoutingDecision],
@@ -58,10 +78,8 @@ async def test_process_user_prompt_success(
     mock_decompose = mocker.patch('Co-Lab.core_ai.orchestrator.decompose_prompt', return_value=mock_sub_tasks)
     mock_route = mocker.patch('Co-Lab.core_ai.orchestrator.route_sub_tasks', return_value=mock_routing_decisions)
     mock_calc_cost = mocker.patch('Co-Lab.core_ai.orchestrator.calculate_query_cost', return_value=25.5) # Example cost
-    mock_charge_user = mocker.patch('Co-Lab.core_ai.orchestrator.charge_user_for_query', return_value=True) # Simulate successful charge
-    mock_invoke = mocker.patch('Co-Lab.core_ai.orchestrator.invoke_sub_ai')
-    # Mock asyncio.gather used within the orchestrator
-    mock_gather = mocker.patch('asyncio.gather', return_value=mock_sub_ai_responses)
+    mocker.patch('Co-Lab.core_ai.orchestrator.calculate_actual_query_cost', return_value=20.5)
+    mock_invoke = mocker.patch('Co-Lab.core_ai.orchestrator.invoke_sub_ai', side_effect=mock_sub_ai_responses)
     mock_synthesize = mocker.patch('Co-Lab.core_ai.orchestrator.synthesize_responses', return_value="Final synthesized answer.")
 
     # Act: Call the orchestrator function
@@ -71,12 +89,11 @@ async def test_process_user_prompt_success(
     mock_decompose.assert_awaited_once_with(sample_user_input.prompt)
     mock_route.assert_awaited_once_with(mock_sub_tasks)
     mock_calc_cost.assert_called_once_with(mock_routing_decisions)
-    mock_charge_user.assert_awaited_once_with(sample_user_input.user_id, 25.5)
-    # Check that invoke_sub_ai was called for each decision before gather
+    ledger_holds.place.assert_awaited_once_with(sample_user_input.user_id, 25.5, session_id=sample_user_input.session_id)
+    ledger_holds.capture.assert_awaited_once_with(sample_user_input.user_id, "hold-1", 20.5, session_id=sample_user_input.session_id)
+    ledger_holds.release.assert_not_called()
+    # Check that invoke_sub_ai was called for each decision
     assert mock_invoke.call_count == len(mock_routing_decisions)
-    # Check the arguments passed to gather (it should be a list of awaitables from invoke_sub_ai)
-    mock_gather.assert_awaited_once()
-    assert len(mock_gather.call_args[0][0]) == len(mock_routing_decisions) # Check number of tasks passed to gather
 
     mock_synthesize.assert_awaited_once_with(
         original_prompt=sample_user_input.prompt,
@@ -92,6 +109,7 @@ async def test_process_user_prompt_success(
 
 async def test_process_user_prompt_charge_failed(
     mocker: MockerFixture,
+    ledger_holds,
     sample_user_input: UserInput,
     mock_sub_tasks: List[SubTask],
     mock_routing_decisions: List[RoutingDecision]
@@ -103,8 +121,8 @@ async def test_process_user_prompt_charge_failed(
     mocker.patch('Co-Lab.core_ai.orchestrator.decompose_prompt', return_value=mock_sub_tasks)
     mocker.patch('Co-Lab.core_ai.orchestrator.route_sub_tasks', return_value=mock_routing_decisions)
     mocker.patch('Co-Lab.core_ai.orchestrator.calculate_query_cost', return_value=30.0)
-    # Mock charge_user_for_query to return False (failure)
-    mock_charge_user = mocker.patch('Co-Lab.core_ai.orchestrator.charge_user_for_query', return_value=False)
+    # Refuse the hold (failure)
+    ledger_holds.place.return_value = (False, None)
     # Mock subsequent functions to ensure they are NOT called
     mock_invoke = mocker.patch('Co-Lab.core_ai.orchestrator.invoke_sub_ai')
     mock_synthesize = mocker.patch('Co-Lab.core_ai.orchestrator.synthesize_responses')
@@ -114,7 +132,8 @@ async def test_process_user_prompt_charge_failed(
     final_response = await process_user_prompt(sample_user_input)
 
     # Assert: Check that charging failed and subsequent steps were skipped
-    mock_charge_user.assert_awaited_once_with(sample_user_input.user_id, 30.0)
+    ledger_holds.place.assert_awaited_once_with(sample_user_input.user_id, 30.0, session_id=sample_user_input.session_id)
+    ledger_holds.capture.assert_not_called()
     mock_invoke.assert_not_called()
     mock_gather.assert_not_called()
     mock_synthesize.assert_not_called()
@@ -124,9 +143,406 @@ async def test_process_user_prompt_charge_failed(
     assert final_response.synthesized_answer == ""
     assert "Failed to charge for query" in final_response.error_message
 
+async def test_process_user_prompt_stops_waiting_at_quorum(
+    mocker: MockerFixture,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    Once the fixed specialist has answered and the quorum is met, a slow dynamic
+    sub-task is cancelled and the response is marked partial_success.
+    """
+    straggler_cancelled = asyncio.Event()
+
+    async def invoke(decision, upstream_responses=None):
+        if decision.route_type == 'dynamic_instance':
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                straggler_cancelled.set()
+                raise
+        return mock_sub_ai_responses[0]
+
+    mocker.patch.object(orchestrator, 'ORCHESTRATION_QUORUM', 0.5)
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=25.5)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=invoke)
+    async def synthesize(**kwargs):
+        assert straggler_cancelled.is_set() # Awaited before synthesis starts, not left running
+        return "Partial answer."
+    mock_synthesize = mocker.patch.object(orchestrator, 'synthesize_responses', side_effect=synthesize)
+
+    final_response = await asyncio.wait_for(process_user_prompt(sample_user_input), timeout=1)
+
+    assert mock_synthesize.await_args.kwargs["sub_ai_responses"] == [mock_sub_ai_responses[0]]
+    assert final_response.status == "partial_success"
+    assert final_response.missing_sub_task_ids == ["st2"]
+
+async def test_process_user_prompt_synthesizes_at_deadline(
+    mocker: MockerFixture,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    A fixed specialist that misses the deadline is dropped instead of blocking synthesis.
+    """
+    async def invoke(decision, upstream_responses=None):
+        if decision.route_type == 'fixed_specialist':
+            await asyncio.sleep(10)
+        return mock_sub_ai_responses[1]
+
+    mocker.patch.object(orchestrator, 'ORCHESTRATION_DEADLINE_SECONDS', 0.05)
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=25.5)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=invoke)
+    mocker.patch.object(orchestrator, 'synthesize_responses', return_value="Partial answer.")
+
+    final_response = await asyncio.wait_for(process_user_prompt(sample_user_input), timeout=1)
+
+    assert final_response.status == "partial_success"
+    assert final_response.missing_sub_task_ids == ["st1"]
+
+async def test_process_user_prompt_runs_dependency_graph(
+    mocker: MockerFixture,
+    sample_user_input: UserInput
+):
+    """
+    Independent sub-tasks start together, a dependent sub-task starts only after its
+    upstream finished and receives the upstream response.
+    """
+    sub_tasks = [
+        SubTask(sub_task_id="search", instruction="Search IPFS for X"),
+        SubTask(sub_task_id="other", instruction="Explain Y"),
+        SubTask(sub_task_id="summary", instruction="Summarize the search results", depends_on=["search"]),
+    ]
+    decisions = [RoutingDecision(sub_task=task, route_type='dynamic_instance') for task in sub_tasks]
+    started: List[str] = []
+    upstream_seen = {}
+
+    async def invoke(decision, upstream_responses=None):
+        sub_task_id = decision.sub_task.sub_task_id
+        started.append(sub_task_id)
+        upstream_seen[sub_task_id] = [res.sub_task_id for res in upstream_responses or []]
+        await asyncio.sleep(0.01)
+        return SubAIResponse(sub_task_id=sub_task_id, source_sub_ai_id="dyn", content=f"{sub_task_id} result")
+
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=10.0)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=invoke)
+    mock_synthesize = mocker.patch.object(orchestrator, 'synthesize_responses', return_value="Answer.")
+
+    final_response = await process_user_prompt(sample_user_input)
+
+    assert started[:2] == ["search", "other"]
+    assert started[2] == "summary"
+    assert upstream_seen == {"search": [], "other": [], "summary": ["search"]}
+    assert len(mock_synthesize.await_args.kwargs["sub_ai_responses"]) == 3
+    assert final_response.status == "success"
+
+async def test_process_user_prompt_skips_dependants_of_failed_sub_task(
+    mocker: MockerFixture,
+    sample_user_input: UserInput
+):
+    """
+    A sub-task whose dependency failed is not invoked and is reported as missing.
+    """
+    sub_tasks = [
+        SubTask(sub_task_id="search", instruction="Search IPFS for X"),
+        SubTask(sub_task_id="other", instruction="Explain Y"),
+        SubTask(sub_task_id="summary", instruction="Summarize the search results", depends_on=["search"]),
+    ]
+    decisions = [RoutingDecision(sub_task=task, route_type='dynamic_instance') for task in sub_tasks]
+
+    async def invoke(decision, upstream_responses=None):
+        sub_task_id = decision.sub_task.sub_task_id
+        status = "error" if sub_task_id == "search" else "success"
+        return SubAIResponse(sub_task_id=sub_task_id, source_sub_ai_id="dyn", content=None, status=status)
+
+    mocker.patch.object(orchestrator, 'ORCHESTRATION_QUORUM', 1.0)
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=10.0)
+    mock_invoke = mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=invoke)
+    mocker.patch.object(orchestrator, 'synthesize_responses', return_value="Answer.")
+
+    final_response = await process_user_prompt(sample_user_input)
+
+    assert mock_invoke.await_count == 2
+    assert final_response.status == "partial_success"
+    assert sorted(final_response.missing_sub_task_ids) == ["search", "summary"]
+
+async def test_process_user_prompt_serves_repeated_prompt_from_cache(
+    mocker: MockerFixture,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    A repeated prompt (modulo case and whitespace) skips the pipeline and is charged per the hit policy.
+    """
+    mocker.patch.object(orchestrator, 'response_cache', PromptResponseCache(max_entries=10))
+    mock_decompose = mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=25.5)
+    mocker.patch.object(orchestrator, 'calculate_cache_hit_cost', return_value=1.0)
+    mock_charge_user = mocker.patch.object(orchestrator, 'charge_user_for_query', return_value=True)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=mock_sub_ai_responses)
+    mocker.patch.object(orchestrator, 'synthesize_responses', return_value="Final synthesized answer.")
+
+    first = await process_user_prompt(sample_user_input)
+    repeat_input = UserInput(prompt="  test PROMPT about topic x ", user_id="other_user")
+    repeat = await process_user_prompt(repeat_input)
+
+    assert first.status == "success"
+    assert repeat.status == "success_cached"
+    assert repeat.cache_similarity == 1.0
+    assert repeat.synthesized_answer == "Final synthesized answer."
+    mock_decompose.assert_awaited_once()
+    mock_charge_user.assert_awaited_with("other_user", 1.0, session_id=repeat_input.session_id, reason="cache_hit")
+
+async def test_process_user_prompt_cache_opt_out(
+    mocker: MockerFixture,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    Requests that opt out neither read from nor populate the response cache.
+    """
+    cache = PromptResponseCache(max_entries=10)
+    cache.put("Private prompt", "Cached answer.", 25.5)
+    mocker.patch.object(orchestrator, 'response_cache', cache)
+    mock_decompose = mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=25.5)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=mock_sub_ai_responses * 2)
+    mocker.patch.object(orchestrator, 'synthesize_responses', return_value="Fresh answer.")
+
+    response = await process_user_prompt(UserInput(prompt="Private prompt", user_id="u1", use_response_cache=False))
+    await process_user_prompt(UserInput(prompt="Another private prompt", user_id="u1", use_response_cache=False))
+
+    assert response.status == "success"
+    assert response.synthesized_answer == "Fresh answer."
+    assert mock_decompose.await_count == 2
+    assert len(cache) == 1
+
+async def test_process_user_prompt_releases_hold_when_all_invocations_fail(
+    mocker: MockerFixture,
+    ledger_holds,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision]
+):
+    """
+    A query with nothing to synthesize is not charged: its hold is released instead of captured.
+    """
+    failed = [SubAIResponse(sub_task_id=task.sub_task_id, source_sub_ai_id="x", content=None, status="error") for task in mock_sub_tasks]
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=25.5)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=failed)
+    mock_synthesize = mocker.patch.object(orchestrator, 'synthesize_responses')
+
+    final_response = await process_user_prompt(sample_user_input)
+
+    assert final_response.status == "error"
+    mock_synthesize.assert_not_called()
+    ledger_holds.capture.assert_not_called()
+    ledger_holds.release.assert_awaited_once_with("hold-1")
+
+async def test_process_user_prompt_charges_only_answered_sub_tasks(
+    mocker: MockerFixture,
+    ledger_holds,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    The capture covers the sub-tasks that were answered (a cached one at the cached rate), not the estimate.
+    """
+    cached_summary = mock_sub_ai_responses[0].model_copy(update={"metadata": {"cached": True}})
+    failed_dynamic = SubAIResponse(sub_task_id="st2", source_sub_ai_id="dynamic_instance_st2", content=None, status="error")
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=[cached_summary, failed_dynamic])
+    mocker.patch.object(orchestrator, 'synthesize_responses', return_value="Partial answer.")
+
+    final_response = await process_user_prompt(sample_user_input)
+
+    assert final_response.status == "partial_success"
+    # Base 1 + decomposition 5 + routing 2 x 0.5 + synthesis 10, held: plus invocations 2 + 10
+    ledger_holds.place.assert_awaited_once_with(sample_user_input.user_id, 29.0, session_id=sample_user_input.session_id)
+    ledger_holds.capture.assert_awaited_once_with(sample_user_input.user_id, "hold-1", 17.0, session_id=sample_user_input.session_id)
+
+async def test_optimistic_charge_cancels_invocations_when_hold_is_refused(
+    mocker: MockerFixture,
+    ledger_holds,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision]
+):
+    """
+    A refused hold cancels the invocations already in flight and nothing is synthesized or charged.
+    """
+    cancelled: List[str] = []
+
+    async def invoke(decision, upstream_responses=None):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(decision.sub_task.sub_task_id)
+            raise
+
+    async def place(user_id, cost, session_id=None):
+        await asyncio.sleep(0.02) # The invocations are in flight by now
+        return False, None
+
+    ledger_holds.place.side_effect = place
+    mocker.patch.object(orchestrator, 'ORCHESTRATION_OPTIMISTIC_CHARGE', True)
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=invoke)
+    mock_synthesize = mocker.patch.object(orchestrator, 'synthesize_responses')
+
+    final_response = await asyncio.wait_for(process_user_prompt(sample_user_input), timeout=1)
+
+    assert final_response.status == "error_charge_failed"
+    assert sorted(cancelled) == ["st1", "st2"]
+    mock_synthesize.assert_not_called()
+    ledger_holds.capture.assert_not_called()
+
+async def test_refused_hold_cancels_the_sub_ai_http_requests(
+    mocker: MockerFixture,
+    ledger_holds,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision]
+):
+    """
+    The cancellation reaches the Sub-AI HTTP requests themselves: they have unwound by the
+    time the response is returned, and no result is cached for the refused user.
+    """
+    requests_started, requests_cancelled = [], []
+
+    async def hanging_post(endpoint, **kwargs):
+        requests_started.append(endpoint)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            requests_cancelled.append(endpoint)
+            raise
+
+    async def place(user_id, cost, session_id=None):
+        await asyncio.sleep(0.02) # The requests are in flight by now
+        return False, None
+
+    ledger_holds.place.side_effect = place
+    result_cache = TTLCache(max_entries=10, ttl_seconds=60)
+    mocker.patch.object(sub_ai_client, '_result_cache', result_cache)
+    mocker.patch.object(sub_ai_client, 'get_http_client', return_value=mocker.Mock(post=mocker.AsyncMock(side_effect=hanging_post)))
+    mocker.patch.object(orchestrator, 'ORCHESTRATION_OPTIMISTIC_CHARGE', True)
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+
+    final_response = await asyncio.wait_for(process_user_prompt(sample_user_input), timeout=1)
+
+    assert final_response.status == "error_charge_failed"
+    assert len(requests_started) == 2
+    assert sorted(requests_cancelled) == sorted(requests_started)
+    assert len(result_cache) == 0
+    assert len(sub_ai_client._in_flight) == 0
+
 # TODO: Add more test cases:
 # - No user_id provided
 # - Decomposition returns empty list
 # - Routing fails
 # - Some or all Sub-AI invocations fail
-# - Synthesis fails
\ No newline at end of file
+# - Synthesis fails
+
+# --- Streaming ---
+
+async def _collect(stream) -> List[dict]:
+    return [event async for event in stream]
+
+async def test_process_user_prompt_stream_emits_stage_events(
+    mocker: MockerFixture,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    Tests that the streaming pipeline reports each stage and streams synthesis tokens.
+    """
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'calculate_query_cost', return_value=25.5)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=mock_sub_ai_responses)
+
+    async def fake_stream(**kwargs):
+        for chunk in ["Final ", "synthesized ", "answer."]:
+            yield chunk
+    mocker.patch.object(orchestrator, 'synthesize_responses_stream', side_effect=fake_stream)
+
+    events = await _collect(orchestrator.process_user_prompt_stream(sample_user_input))
+
+    names = [event["event"] for event in events]
+    assert names[:3] == ["decomposed", "routed", "charged"]
+    assert names[-2:] == ["settled", "final"]
+    assert names.count("sub_task_done") == len(mock_sub_ai_responses)
+    assert [e["text"] for e in events if e["event"] == "synthesis_token"] == ["Final ", "synthesized ", "answer."]
+    assert names[-1] == "final"
+    assert events[-1]["response"]["status"] == "success"
+    assert events[-1]["response"]["synthesized_answer"] == "Final synthesized answer."
+
+async def test_optimistic_charge_invokes_while_hold_is_placed(
+    mocker: MockerFixture,
+    ledger_holds,
+    sample_user_input: UserInput,
+    mock_sub_tasks: List[SubTask],
+    mock_routing_decisions: List[RoutingDecision],
+    mock_sub_ai_responses: List[SubAIResponse]
+):
+    """
+    Invocations start before the hold is placed, but their events still follow 'charged'.
+    """
+    hold_placed = False
+    invoked_before_hold: List[str] = []
+
+    async def place(user_id, cost, session_id=None):
+        nonlocal hold_placed
+        await asyncio.sleep(0.02)
+        hold_placed = True
+        return True, "hold-1"
+
+    async def invoke(decision, upstream_responses=None):
+        if not hold_placed:
+            invoked_before_hold.append(decision.sub_task.sub_task_id)
+        return next(res for res in mock_sub_ai_responses if res.sub_task_id == decision.sub_task.sub_task_id)
+
+    async def fake_stream(**kwargs):
+        yield "Answer."
+
+    ledger_holds.place.side_effect = place
+    mocker.patch.object(orchestrator, 'ORCHESTRATION_OPTIMISTIC_CHARGE', True)
+    mocker.patch.object(orchestrator, 'decompose_prompt', return_value=mock_sub_tasks)
+    mocker.patch.object(orchestrator, 'route_sub_tasks', return_value=mock_routing_decisions)
+    mocker.patch.object(orchestrator, 'invoke_sub_ai', side_effect=invoke)
+    mocker.patch.object(orchestrator, 'synthesize_responses_stream', side_effect=fake_stream)
+
+    events = await _collect(orchestrator.process_user_prompt_stream(sample_user_input))
+
+    names = [event["event"] for event in events]
+    assert sorted(invoked_before_hold) == ["st1", "st2"]
+    assert names[:5] == ["decomposed", "routed", "charged", "sub_task_done", "sub_task_done"]
+    assert events[-1]["response"]["status"] == "success"
+    ledger_holds.capture.assert_awaited_once()
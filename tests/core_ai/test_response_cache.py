@@ -0,0 +1,74 @@
+import pytest
+from pytest_mock import MockerFixture
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai import response_cache as response_cache_module
+from core_ai.response_cache import PromptResponseCache, make_prompt_key
+
+# --- Test Cases ---
+
+def test_exact_match_ignores_case_and_whitespace():
+    cache = PromptResponseCache(max_entries=10)
+    cache.put("What is  IPFS?", "A content-addressed network.", 20.0)
+
+    hit = cache.get("  what is ipfs? ")
+
+    assert hit is not None
+    entry, similarity = hit
+    assert entry.synthesized_answer == "A content-addressed network."
+    assert similarity == 1.0
+    assert cache.stats["exact_hits"] == 1
+
+def test_entries_expire_after_ttl(mocker: MockerFixture):
+    clock = mocker.patch.object(response_cache_module.time, "time", return_value=1000.0)
+    cache = PromptResponseCache(max_entries=10, ttl_seconds=60)
+    cache.put("prompt", "answer", 20.0)
+
+    clock.return_value = 1061.0
+
+    assert cache.get("prompt") is None
+    assert cache.stats["expirations"] == 1
+    assert len(cache) == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PromptResponseCache(max_entries=2)
+    cache.put("a", "A", 1.0)
+    cache.put("b", "B", 1.0)
+    cache.get("a") # 'b' becomes least recently used
+    cache.put("c", "C", 1.0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats["evictions"] == 1
+
+def test_semantic_match_above_threshold():
+    cache = PromptResponseCache(max_entries=10, similarity_threshold=0.95)
+    cache.put("Summarize the IPFS whitepaper", "Summary.", 20.0, embedding=[1.0, 0.0])
+
+    near = cache.get("Give me a summary of the IPFS whitepaper", embedding=[0.99, 0.05])
+    far = cache.get("Write a sorting function", embedding=[0.0, 1.0])
+
+    assert near is not None and near[0].synthesized_answer == "Summary."
+    assert near[1] == pytest.approx(0.9987, abs=1e-3)
+    assert far is None
+    assert cache.stats["semantic_hits"] == 1
+
+def test_semantic_rows_follow_eviction_and_expiry(mocker: MockerFixture):
+    clock = mocker.patch.object(response_cache_module.time, "time", return_value=1000.0)
+    cache = PromptResponseCache(max_entries=2, ttl_seconds=60, similarity_threshold=0.95)
+    cache.put("a", "A", 1.0, embedding=[1.0, 0.0, 0.0])
+    matrix = cache._matrix
+    clock.return_value = 1030.0
+    cache.put("b", "B", 1.0, embedding=[0.0, 1.0, 0.0])
+    clock.return_value = 1060.0
+    cache.put("c", "C", 1.0, embedding=[0.0, 0.0, 1.0]) # Evicts 'a'; 'c' takes over its row
+
+    assert cache.get("x", embedding=[1.0, 0.0, 0.0]) is None
+    assert cache.get("y", embedding=[0.0, 0.0, 1.0])[0].synthesized_answer == "C"
+
+    clock.return_value = 1095.0 # 'b' has expired, 'c' has not
+    assert cache.get("b") is None
+    assert cache.get("z", embedding=[0.0, 0.0, 1.0])[0].synthesized_answer == "C"
+    assert cache.get("w", embedding=[0.0, 1.0, 0.0]) is None
+    assert cache._matrix is matrix # Preallocated once, never restacked
+    assert cache._row_keys == [make_prompt_key("c")]
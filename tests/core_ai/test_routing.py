@@ -0,0 +1,188 @@
+import asyncio
+import time
+import pytest
+from pytest_mock import MockerFixture
+from types import SimpleNamespace
+from typing import List
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai import routing
+from core_ai.models import SubTask
+from core_ai.embedding_cache import EmbeddingCache
+from core_ai.vector_index import InMemoryVectorIndex, PineconeVectorIndex
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+# --- Helpers ---
+
+def _fake_embeddings_response(texts: List[str]) -> SimpleNamespace:
+    """Builds an embeddings API response with one distinct vector per input."""
+    return SimpleNamespace(data=[
+        SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(texts)
+    ])
+
+@pytest.fixture
+def mock_embedding_client(mocker: MockerFixture):
+    """Replaces the routing embedding client with one that echoes input lengths."""
+    client = mocker.MagicMock()
+    async def create(input, model, **kwargs):
+        return _fake_embeddings_response(input)
+    client.embeddings.create = mocker.AsyncMock(side_effect=create)
+    mocker.patch.object(routing, "embedding_client", client)
+    mocker.patch.object(routing, "embedding_cache", None)
+    mocker.patch.object(routing, "task_classifier", None)
+    return client
+
+# --- Test Cases ---
+
+async def test_generate_embeddings_single_request(mock_embedding_client):
+    """All texts of a prompt are embedded with one API request."""
+    texts = ["a", "bb", "ccc"]
+
+    embeddings = await routing.generate_embeddings(texts)
+
+    mock_embedding_client.embeddings.create.assert_awaited_once()
+    assert embeddings == [[1.0], [2.0], [3.0]]
+
+async def test_generate_embeddings_chunks_by_batch_size(mocker: MockerFixture, mock_embedding_client):
+    """Inputs beyond the max batch size are split across requests, order preserved."""
+    mocker.patch.object(routing, "EMBEDDING_MAX_BATCH_SIZE", 2)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    embeddings = await routing.generate_embeddings(texts)
+
+    assert mock_embedding_client.embeddings.create.await_count == 3
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+
+async def test_generate_embeddings_skips_empty_texts(mock_embedding_client):
+    """Empty texts are not sent to the API and yield None."""
+    embeddings = await routing.generate_embeddings(["a", "", "ccc"])
+
+    sent = mock_embedding_client.embeddings.create.await_args.kwargs["input"]
+    assert sent == ["a", "ccc"]
+    assert embeddings == [[1.0], None, [3.0]]
+
+async def test_generate_embeddings_serves_repeats_from_cache(mocker: MockerFixture, mock_embedding_client):
+    """Texts embedded once are served from the cache and only misses reach the API."""
+    mocker.patch.object(routing, "embedding_cache", EmbeddingCache(max_entries=10))
+
+    await routing.generate_embeddings(["a", "bb"])
+    embeddings = await routing.generate_embeddings(["  a ", "ccc"])
+
+    assert mock_embedding_client.embeddings.create.await_count == 2
+    assert mock_embedding_client.embeddings.create.await_args.kwargs["input"] == ["ccc"]
+    assert embeddings == [[1.0], [3.0]]
+
+async def test_generate_embeddings_runs_disk_tier_off_the_event_loop(tmp_path, mocker: MockerFixture, mock_embedding_client):
+    """With the SQLite tier enabled, cache lookups and stores run in a worker thread."""
+    cache = EmbeddingCache(max_entries=10, db_path=str(tmp_path / "embeddings.db"))
+    mocker.patch.object(routing, "embedding_cache", cache)
+    to_thread = mocker.spy(asyncio, "to_thread")
+
+    await routing.generate_embeddings(["a", "bb"])
+    embeddings = await routing.generate_embeddings(["a", "bb"])
+
+    assert [call.args[0] for call in to_thread.call_args_list] == [cache.get_many, cache.put_many, cache.get_many]
+    assert mock_embedding_client.embeddings.create.await_count == 1
+    assert embeddings == [[1.0], [2.0]]
+    cache.close()
+
+async def test_route_sub_tasks_runs_lookups_and_classification_concurrently(mocker: MockerFixture, mock_embedding_client):
+    """Vector queries run in parallel and overlap with the batched classification call."""
+    sub_tasks = [SubTask(sub_task_id=f"st{i}", instruction=f"Instruction {i}") for i in range(4)]
+
+    def slow_query(**kwargs):
+        time.sleep(0.05)
+        return SimpleNamespace(matches=[SimpleNamespace(score=0.9, id="SummarizationAI", metadata={"status": "active"})])
+
+    async def slow_batch_classify(tasks, client):
+        await asyncio.sleep(0.05)
+        return {task.sub_task_id: "other" for task in tasks}
+
+    mock_index = mocker.MagicMock()
+    mock_index.query.side_effect = slow_query
+    mocker.patch.object(routing, "specialist_index", PineconeVectorIndex(mock_index, max_concurrency=8))
+    mocker.patch.object(routing, "classify_tasks_with_llm", side_effect=slow_batch_classify)
+    mock_single_classify = mocker.patch.object(routing, "classify_task_with_llm")
+
+    start = asyncio.get_running_loop().time()
+    decisions = await routing.route_sub_tasks(sub_tasks)
+    elapsed = asyncio.get_running_loop().time() - start
+
+    assert [d.sub_task.sub_task_id for d in decisions] == ["st0", "st1", "st2", "st3"]
+    assert all(d.route_type == "fixed_specialist" and d.task_category == "other" for d in decisions)
+    mock_single_classify.assert_not_called()
+    assert elapsed < 0.15 # Serial execution would take ~0.4s
+
+def _chat_response(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+async def test_classify_tasks_with_llm_single_call(mocker: MockerFixture):
+    """All sub-tasks are classified by one chat completion; invalid entries are dropped."""
+    sub_tasks = [SubTask(sub_task_id="st1", instruction="Solve x^2 = 4"), SubTask(sub_task_id="st2", instruction="Write a sort")]
+    client = mocker.MagicMock()
+    client.chat.completions.create = mocker.AsyncMock(return_value=_chat_response(
+        '{"classifications": [{"id": 1, "category": "Math"}, {"id": "2", "category": "poetry"}, {"id": 9, "category": "code"}]}'
+    ))
+
+    categories = await routing.classify_tasks_with_llm(sub_tasks, client)
+
+    client.chat.completions.create.assert_awaited_once()
+    prompt = client.chat.completions.create.await_args.kwargs["messages"][1]["content"]
+    assert '"id": 1' in prompt and "st1" not in prompt
+    assert categories == {"st1": "math"}
+
+async def test_classify_tasks_falls_back_per_task_on_parse_failure(mocker: MockerFixture, mock_embedding_client):
+    """Sub-tasks the batch call could not classify are classified one by one."""
+    sub_tasks = [SubTask(sub_task_id="st1", instruction="Solve x^2 = 4"), SubTask(sub_task_id="st2", instruction="Write a sort")]
+    mock_embedding_client.chat.completions.create = mocker.AsyncMock(return_value=_chat_response("not json"))
+    mock_single_classify = mocker.patch.object(routing, "classify_task_with_llm", return_value="code")
+
+    categories = await routing._classify_tasks(sub_tasks, asyncio.Semaphore(2))
+
+    assert categories == {"st1": "code", "st2": "code"}
+    assert mock_single_classify.await_count == 2
+
+async def test_route_sub_tasks_uses_local_classifier_first(mocker: MockerFixture, mock_embedding_client):
+    """Confident local predictions skip the LLM; only low-confidence sub-tasks reach it."""
+    sub_tasks = [SubTask(sub_task_id="st1", instruction="a"), SubTask(sub_task_id="st2", instruction="bb")]
+    classifier = mocker.MagicMock()
+    classifier.predict_many.return_value = [("math", 0.95), ("code", 0.30)]
+    mocker.patch.object(routing, "task_classifier", classifier)
+    mocker.patch.object(routing, "specialist_index", InMemoryVectorIndex(dimensions=1))
+    mock_batch_classify = mocker.patch.object(routing, "classify_tasks_with_llm", return_value={"st2": "reasoning"})
+
+    decisions = await routing.route_sub_tasks(sub_tasks)
+
+    assert [d.task_category for d in decisions] == ["math", "reasoning"]
+    classified_ids = [task.sub_task_id for task in mock_batch_classify.await_args.args[0]]
+    assert classified_ids == ["st2"]
+
+async def test_route_sub_tasks_with_in_memory_index(mocker: MockerFixture):
+    """Routing against the in-memory index picks the best active specialist above the threshold."""
+    vectors = {"math question": [1.0, 0.0], "write code": [0.0, 1.0], "something else": [-1.0, 0.0]}
+    client = mocker.MagicMock()
+    async def create(input, model, **kwargs):
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=vectors[t]) for i, t in enumerate(input)])
+    client.embeddings.create = mocker.AsyncMock(side_effect=create)
+    mocker.patch.object(routing, "embedding_client", client)
+    mocker.patch.object(routing, "embedding_cache", None)
+    mocker.patch.object(routing, "task_classifier", None)
+    mocker.patch.object(routing, "classify_tasks_with_llm", return_value={})
+    mocker.patch.object(routing, "classify_task_with_llm", return_value="other")
+    memory_index = InMemoryVectorIndex(dimensions=2)
+    memory_index.replace_all([
+        ("DataAnalysisAI", [1.0, 0.0], {"status": "active"}),
+        ("CodeGeneration", [0.0, 1.0], {"status": "inactive"}),
+    ])
+    mocker.patch.object(routing, "specialist_index", memory_index)
+    sub_tasks = [SubTask(sub_task_id=f"st{i}", instruction=text) for i, text in enumerate(vectors)]
+
+    decisions = await routing.route_sub_tasks(sub_tasks)
+
+    assert decisions[0].route_type == "fixed_specialist"
+    assert decisions[0].target_id == "DataAnalysisAI"
+    assert decisions[0].confidence_score == pytest.approx(1.0)
+    assert decisions[1].route_type == "dynamic_instance" # Only match is inactive
+    assert decisions[2].route_type == "dynamic_instance" # Below confidence threshold
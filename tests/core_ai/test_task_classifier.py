@@ -0,0 +1,59 @@
+import importlib
+
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from config import settings as settings_module
+from core_ai import task_classifier
+from core_ai.task_classifier import CentroidTaskClassifier
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def trained_classifier() -> CentroidTaskClassifier:
+    """A classifier trained on well-separated toy embeddings."""
+    embeddings = [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.0, 1.0, 0.0], [0.1, 0.9, 0.0]]
+    labels = ["math", "math", "code", "code"]
+    return CentroidTaskClassifier.fit(embeddings, labels)
+
+# --- Test Cases ---
+
+def test_predict_nearest_centroid(trained_classifier: CentroidTaskClassifier):
+    """Embeddings close to a centroid get its category with high confidence."""
+    category, confidence = trained_classifier.predict([0.95, 0.05, 0.0])
+
+    assert category == "math"
+    assert confidence > 0.9
+
+def test_ambiguous_embedding_has_low_confidence(trained_classifier: CentroidTaskClassifier):
+    """An embedding equidistant from both centroids is not confidently classified."""
+    _, confidence = trained_classifier.predict([0.5, 0.5, 0.0])
+
+    assert confidence == pytest.approx(0.5, abs=0.05)
+
+def test_save_and_load_round_trip(tmp_path, trained_classifier: CentroidTaskClassifier):
+    """A saved classifier loads back with identical predictions."""
+    path = str(tmp_path / "classifier.npz")
+    trained_classifier.save(path)
+
+    loaded = CentroidTaskClassifier.load(path)
+
+    assert loaded.categories == trained_classifier.categories
+    assert loaded.predict_many([[0.0, 1.0, 0.0]]) == trained_classifier.predict_many([[0.0, 1.0, 0.0]])
+
+def test_fit_rejects_mismatched_inputs():
+    with pytest.raises(ValueError):
+        CentroidTaskClassifier.fit([[1.0, 0.0]], ["math", "code"])
+
+def test_settings_are_read_from_environment(monkeypatch):
+    """Module-level knobs come from the Settings instance, so environment overrides apply."""
+    monkeypatch.setenv("TASK_CLASSIFIER_CONFIDENCE_THRESHOLD", "0.9")
+    try:
+        importlib.reload(settings_module)
+        importlib.reload(task_classifier)
+        assert task_classifier.TASK_CLASSIFIER_CONFIDENCE_THRESHOLD == 0.9
+    finally:
+        monkeypatch.delenv("TASK_CLASSIFIER_CONFIDENCE_THRESHOLD")
+        importlib.reload(settings_module)
+        importlib.reload(task_classifier)
+    assert task_classifier.TASK_CLASSIFIER_CONFIDENCE_THRESHOLD == 0.6
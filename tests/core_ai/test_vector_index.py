@@ -0,0 +1,77 @@
+import pytest
+from pytest_mock import MockerFixture
+from types import SimpleNamespace
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from core_ai.vector_index import InMemoryVectorIndex, VectorIndex, mirror_pinecone_to_memory
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def specialist_index() -> InMemoryVectorIndex:
+    index = InMemoryVectorIndex(dimensions=3)
+    index.replace_all([
+        ("SummarizationAI", [1.0, 0.0, 0.0], {"status": "active"}),
+        ("QuestionAnsweringAI", [0.0, 2.0, 0.0], {"status": "active"}), # Not unit length on purpose
+        ("CodeGeneration", [0.9, 0.1, 0.0], {"status": "inactive"}),
+    ])
+    return index
+
+# --- Test Cases ---
+
+async def test_query_many_returns_ranked_cosine_matches(specialist_index: InMemoryVectorIndex):
+    results = await specialist_index.query_many([[2.0, 0.0, 0.0], [0.0, 1.0, 0.0]], top_k=2)
+
+    assert [m.id for m in results[0]] == ["SummarizationAI", "CodeGeneration"]
+    assert results[0][0].score == pytest.approx(1.0)
+    assert results[1][0].id == "QuestionAnsweringAI"
+    assert results[1][0].score == pytest.approx(1.0)
+
+async def test_query_many_applies_metadata_filter(specialist_index: InMemoryVectorIndex):
+    results = await specialist_index.query_many([[0.9, 0.1, 0.0]], top_k=3, filter={"status": {"$eq": "active"}})
+
+    assert {m.id for m in results[0]} == {"SummarizationAI", "QuestionAnsweringAI"}
+
+async def test_upsert_replaces_existing_ids(specialist_index: InMemoryVectorIndex):
+    await specialist_index.upsert([("SummarizationAI", [0.0, 0.0, 1.0], {"status": "active"})])
+
+    results = await specialist_index.query_many([[0.0, 0.0, 1.0]], top_k=1)
+
+    assert len(specialist_index) == 3
+    assert results[0][0].id == "SummarizationAI"
+
+async def test_empty_index_returns_no_matches():
+    results = await InMemoryVectorIndex(dimensions=2).query_many([[1.0, 0.0]], top_k=1)
+
+    assert results == [[]]
+
+async def test_mismatched_dimensions_are_rejected(specialist_index: InMemoryVectorIndex):
+    """Vectors of another size raise instead of being reshaped into garbage rows."""
+    with pytest.raises(ValueError):
+        specialist_index.replace_all([("SummarizationAI", [1.0, 0.0], {})])
+    with pytest.raises(ValueError):
+        await specialist_index.query_many([[1.0, 0.0, 0.0, 0.0, 0.0, 0.0]])
+
+def test_backend_missing_a_method_cannot_be_instantiated():
+    class QueryOnlyIndex(VectorIndex):
+        async def query_many(self, vectors, top_k=1, filter=None):
+            return []
+
+    with pytest.raises(TypeError):
+        QueryOnlyIndex()
+
+async def test_mirror_pinecone_to_memory(mocker: MockerFixture):
+    pinecone_index = mocker.MagicMock()
+    pinecone_index.fetch.return_value = SimpleNamespace(vectors={
+        "SummarizationAI": SimpleNamespace(values=[1.0, 0.0], metadata={"status": "active"}),
+    })
+    memory_index = InMemoryVectorIndex(dimensions=2)
+
+    count = await mirror_pinecone_to_memory(pinecone_index, memory_index, ["SummarizationAI", "MissingAI"])
+
+    pinecone_index.fetch.assert_called_once_with(ids=["SummarizationAI", "MissingAI"])
+    assert count == 1
+    assert (await memory_index.query_many([[1.0, 0.0]]))[0][0].id == "SummarizationAI"
@@ -17,6 +17,12 @@ pytestmark = pytest.mark.asyncio
 
 # --- Test Fixtures ---
 
+@pytest.fixture(autouse=True)
+def search_clients(mocker: MockerFixture):
+    """perform_search only queries the backends whose clients are configured: pretend both are."""
+    mocker.patch.object(logic, 'pinecone_index', mocker.Mock())
+    mocker.patch.object(logic, 'es_client', mocker.Mock())
+
 @pytest.fixture
 def sample_query_text() -> IndexerQuery:
     return IndexerQuery(query_text="find documents about python", top_k=5)
@@ -62,9 +68,9 @@ async def test_perform_search_vector_only(
     """Tests search when only a vector query is feasible."""
     # Arrange
     # Mock helpers called by perform_search
-    mock_gen_embed = mocker.patch('Co-Lab.services.indexer_service.logic.generate_embedding')
-    mock_query_pine = mocker.patch('Co-Lab.services.indexer_service.logic.query_pinecone', return_value=mock_pinecone_results)
-    mock_query_es = mocker.patch('Co-Lab.services.indexer_service.logic.query_elasticsearch') # Should not be called
+    mock_gen_embed = mocker.patch.object(logic, 'generate_embeddings')
+    mock_query_pine = mocker.patch.object(logic, 'query_pinecone', return_value=mock_pinecone_results)
+    mock_query_es = mocker.patch.object(logic, 'query_elasticsearch') # Should not be called
 
     # Act
     result = await logic.perform_search(sample_query_vector)
@@ -84,9 +90,9 @@ async def test_perform_search_keyword_only(
 ):
     """Tests search when only a keyword query is feasible."""
     # Arrange
-    mock_gen_embed = mocker.patch('Co-Lab.services.indexer_service.logic.generate_embedding')
-    mock_query_pine = mocker.patch('Co-Lab.services.indexer_service.logic.query_pinecone') # Should not be called
-    mock_query_es = mocker.patch('Co-Lab.services.indexer_service.logic.query_elasticsearch', return_value=mock_es_results)
+    mock_gen_embed = mocker.patch.object(logic, 'generate_embeddings')
+    mock_query_pine = mocker.patch.object(logic, 'query_pinecone') # Should not be called
+    mock_query_es = mocker.patch.object(logic, 'query_elasticsearch', return_value=mock_es_results)
 
     # Act
     result = await logic.perform_search(sample_query_keywords)
@@ -109,15 +115,15 @@ async def test_perform_search_hybrid_rrf(
     """Tests hybrid search and RRF combination."""
     # Arrange
     mock_vector = [0.2] * 1536
-    mock_gen_embed = mocker.patch('Co-Lab.services.indexer_service.logic.generate_embedding', return_value=mock_vector)
-    mock_query_pine = mocker.patch('Co-Lab.services.indexer_service.logic.query_pinecone', return_value=mock_pinecone_results)
-    mock_query_es = mocker.patch('Co-Lab.services.indexer_service.logic.query_elasticsearch', return_value=mock_es_results)
+    mock_gen_embed = mocker.patch.object(logic, 'generate_embeddings', return_value=[mock_vector])
+    mock_query_pine = mocker.patch.object(logic, 'query_pinecone', return_value=mock_pinecone_results)
+    mock_query_es = mocker.patch.object(logic, 'query_elasticsearch', return_value=mock_es_results)
 
     # Act
     result = await logic.perform_search(sample_query_hybrid)
 
     # Assert
-    mock_gen_embed.assert_awaited_once_with(sample_query_hybrid.query_text)
+    mock_gen_embed.assert_awaited_once_with([sample_query_hybrid.query_text])
     mock_query_pine.assert_awaited_once()
     mock_query_es.assert_awaited_once()
     assert result.status == "success"
@@ -141,9 +147,9 @@ async def test_perform_search_no_query(mocker: MockerFixture):
     """Tests search when no valid query parameters are provided."""
      # Arrange
     empty_query = IndexerQuery(top_k=5) # No text, keywords, or vector
-    mock_gen_embed = mocker.patch('Co-Lab.services.indexer_service.logic.generate_embedding')
-    mock_query_pine = mocker.patch('Co-Lab.services.indexer_service.logic.query_pinecone')
-    mock_query_es = mocker.patch('Co-Lab.services.indexer_service.logic.query_elasticsearch')
+    mock_gen_embed = mocker.patch.object(logic, 'generate_embeddings')
+    mock_query_pine = mocker.patch.object(logic, 'query_pinecone')
+    mock_query_es = mocker.patch.object(logic, 'query_elasticsearch')
 
     # Act
     result = await logic.perform_search(empty_query)
@@ -0,0 +1,206 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+import httpx
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from sub_ai import client as sub_ai_client
+from core_ai.models import SubTask, SubAIResponse
+from core_ai.routing import RoutingDecision
+from utils.ttl_cache import TTLCache
+from utils.telemetry import span
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+# --- Test Fixtures ---
+
+@pytest_asyncio.fixture(autouse=True)
+async def clean_client_registry():
+    """Ensures every test starts and ends with an empty client registry."""
+    await sub_ai_client.shutdown_http_clients()
+    yield
+    await sub_ai_client.shutdown_http_clients()
+
+@pytest.fixture(autouse=True)
+def fresh_result_cache(mocker: MockerFixture) -> TTLCache:
+    """Gives every test its own empty result cache."""
+    cache = TTLCache(max_entries=100, ttl_seconds=600)
+    mocker.patch.object(sub_ai_client, "_result_cache", cache)
+    return cache
+
+@pytest.fixture
+def fixed_decision() -> RoutingDecision:
+    return RoutingDecision(
+        sub_task=SubTask(sub_task_id="st1", instruction="Summarize the document"),
+        route_type='fixed_specialist',
+        target_id='SummarizationAI',
+        confidence_score=0.9
+    )
+
+# --- Test Cases ---
+
+async def test_get_http_client_reuses_client_per_target():
+    """The same pooled client is returned for repeated calls to one target."""
+    first = sub_ai_client.get_http_client("SummarizationAI")
+    second = sub_ai_client.get_http_client("SummarizationAI")
+    other = sub_ai_client.get_http_client("QuestionAnsweringAI")
+
+    assert first is second
+    assert first is not other
+
+async def test_shutdown_closes_and_clears_clients():
+    """Shutdown closes every pooled client and a new one is created afterwards."""
+    await sub_ai_client.startup_http_clients()
+    created = list(sub_ai_client._http_clients.values())
+    assert len(created) == len(sub_ai_client.SUB_AI_ENDPOINTS)
+
+    await sub_ai_client.shutdown_http_clients()
+
+    assert sub_ai_client._http_clients == {}
+    assert all(client.is_closed for client in created)
+    assert sub_ai_client.get_http_client("SummarizationAI") not in created
+
+async def test_invoke_sub_ai_uses_pooled_client(mocker: MockerFixture, fixed_decision: RoutingDecision):
+    """invoke_sub_ai posts through the pooled client instead of opening a new one."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    mock_post = mocker.patch.object(
+        pooled_client,
+        "post",
+        return_value=httpx.Response(200, json={"content": "Summary."}, request=httpx.Request("POST", "http://test")),
+    )
+    mock_async_client = mocker.patch.object(sub_ai_client.httpx, "AsyncClient")
+
+    response = await sub_ai_client.invoke_sub_ai(fixed_decision)
+
+    mock_post.assert_awaited_once()
+    mock_async_client.assert_not_called()
+    assert response.status == "success"
+    assert response.content == "Summary."
+
+async def test_invoke_sub_ai_passes_upstream_responses_as_context(mocker: MockerFixture, fixed_decision: RoutingDecision):
+    """Responses of the sub-tasks a sub-task depends on are sent with its payload."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    mock_post = mocker.patch.object(
+        pooled_client,
+        "post",
+        return_value=httpx.Response(200, json={"content": "Summary."}, request=httpx.Request("POST", "http://test")),
+    )
+    upstream = [SubAIResponse(sub_task_id="st0", source_sub_ai_id="IPFSSearch", content={"cids": ["Qm1"]})]
+
+    await sub_ai_client.invoke_sub_ai(fixed_decision, upstream_responses=upstream)
+
+    payload = mock_post.await_args.kwargs["json"]
+    assert payload["context"] == [{"sub_task_id": "st0", "source_sub_ai_id": "IPFSSearch", "content": {"cids": ["Qm1"]}}]
+
+async def test_invoke_sub_ai_propagates_trace_context(mocker: MockerFixture, fixed_decision: RoutingDecision):
+    """The request carries a W3C traceparent header from the caller's trace."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    mock_post = mocker.patch.object(pooled_client, "post", return_value=_ok("Summary."))
+
+    with span("pipeline") as pipeline_span:
+        await sub_ai_client.invoke_sub_ai(fixed_decision)
+
+    traceparent = mock_post.await_args.kwargs["headers"]["traceparent"]
+    version, trace_id, parent_id, flags = traceparent.split("-")
+    assert (version, trace_id, flags) == ("00", pipeline_span.trace_id, "01")
+    assert parent_id != pipeline_span.span_id # The innermost 'sub_ai_request' span
+
+def _ok(content) -> httpx.Response:
+    return httpx.Response(200, json={"content": content}, request=httpx.Request("POST", "http://test"))
+
+def _dynamic_decision(sub_task_id: str) -> RoutingDecision:
+    return RoutingDecision(sub_task=SubTask(sub_task_id=sub_task_id, instruction="Write a haiku"), route_type='dynamic_instance')
+
+async def test_repeated_specialist_call_is_served_from_cache(mocker: MockerFixture, fixed_decision: RoutingDecision):
+    """A repeated (target, payload) pair skips the HTTP call but keeps the caller's sub_task_id."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    mock_post = mocker.patch.object(pooled_client, "post", return_value=_ok("Summary."))
+    repeat = RoutingDecision(
+        sub_task=SubTask(sub_task_id="st2", instruction="  Summarize the   document "),
+        route_type='fixed_specialist',
+        target_id='SummarizationAI'
+    )
+
+    await sub_ai_client.invoke_sub_ai(fixed_decision)
+    response = await sub_ai_client.invoke_sub_ai(repeat)
+
+    mock_post.assert_awaited_once()
+    assert response.sub_task_id == "st2"
+    assert response.content == "Summary."
+    assert response.metadata == {"cached": True} # Billed at the cached invocation rate
+
+async def test_whitespace_outside_the_instruction_is_significant(mocker: MockerFixture, fixed_decision: RoutingDecision):
+    """Only the instruction is whitespace-normalized: differently indented context is a distinct request."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    mock_post = mocker.patch.object(pooled_client, "post", return_value=_ok("Summary."))
+    code = SubAIResponse(sub_task_id="st0", source_sub_ai_id="CodeGeneration", content="if x:\n    return y")
+    reindented = SubAIResponse(sub_task_id="st0", source_sub_ai_id="CodeGeneration", content="if x: return y")
+
+    await sub_ai_client.invoke_sub_ai(fixed_decision, upstream_responses=[code])
+    await sub_ai_client.invoke_sub_ai(fixed_decision, upstream_responses=[reindented])
+
+    assert mock_post.await_count == 2
+
+async def test_dynamic_results_are_not_cached(mocker: MockerFixture):
+    """DynamicBaseModel has caching disabled by default."""
+    pooled_client = sub_ai_client.get_http_client("DynamicBaseModel")
+    mock_post = mocker.patch.object(pooled_client, "post", return_value=_ok("A haiku."))
+
+    await sub_ai_client.invoke_sub_ai(_dynamic_decision("st1"))
+    await sub_ai_client.invoke_sub_ai(_dynamic_decision("st2"))
+
+    assert mock_post.await_count == 2
+
+async def test_errors_are_negatively_cached(mocker: MockerFixture, fixed_decision: RoutingDecision):
+    """A failing call is remembered briefly and its error replayed without another request."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    mock_post = mocker.patch.object(
+        pooled_client,
+        "post",
+        return_value=httpx.Response(503, text="busy", request=httpx.Request("POST", "http://test")),
+    )
+
+    first = await sub_ai_client.invoke_sub_ai(fixed_decision)
+    second = await sub_ai_client.invoke_sub_ai(fixed_decision)
+
+    mock_post.assert_awaited_once()
+    assert first.status == second.status == "error"
+    assert "503" in second.error_message
+
+async def test_concurrent_identical_calls_are_coalesced(mocker: MockerFixture):
+    """Concurrent identical requests share one in-flight HTTP call, even with caching disabled."""
+    pooled_client = sub_ai_client.get_http_client("DynamicBaseModel")
+    async def slow_post(*args, **kwargs):
+        await asyncio.sleep(0.02)
+        return _ok("A haiku.")
+    mock_post = mocker.patch.object(pooled_client, "post", side_effect=slow_post)
+
+    responses = await asyncio.gather(*(sub_ai_client.invoke_sub_ai(_dynamic_decision(f"st{i}")) for i in range(3)))
+
+    mock_post.assert_awaited_once()
+    assert [r.content for r in responses] == ["A haiku."] * 3
+    assert len(sub_ai_client._in_flight) == 0
+
+async def test_cancelled_invocation_cancels_the_http_request(mocker: MockerFixture, fixed_decision: RoutingDecision, fresh_result_cache: TTLCache):
+    """Cancelling the only caller cancels the request itself, and nothing is cached for it."""
+    pooled_client = sub_ai_client.get_http_client("SummarizationAI")
+    started, request_cancelled = asyncio.Event(), asyncio.Event()
+    async def hanging_post(*args, **kwargs):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            request_cancelled.set()
+            raise
+    mocker.patch.object(pooled_client, "post", side_effect=hanging_post)
+
+    invocation = asyncio.ensure_future(sub_ai_client.invoke_sub_ai(fixed_decision))
+    await started.wait()
+    invocation.cancel()
+    await asyncio.gather(invocation, return_exceptions=True)
+
+    assert request_cancelled.is_set()
+    assert len(fresh_result_cache) == 0
+    assert len(sub_ai_client._in_flight) == 0
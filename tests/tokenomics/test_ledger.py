@@ -0,0 +1,141 @@
+import asyncio
+from decimal import Decimal
+
+import databases
+import pytest
+import pytest_asyncio
+import sqlalchemy
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from tokenomics import ledger
+
+# --- Test Fixtures ---
+
+@pytest_asyncio.fixture
+async def database(tmp_path, mocker):
+    """Points the ledger at a fresh SQLite database with the ledger schema."""
+    path = tmp_path / "ledger.db"
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    ledger.metadata.create_all(engine)
+    engine.dispose()
+    db = databases.Database(f"sqlite:///{path}")
+    await db.connect()
+    mocker.patch.object(ledger, "database", db)
+    mocker.patch.object(ledger, "write_behind_ledger", None)
+    yield db
+    await db.disconnect()
+
+@pytest.fixture(params=[True, False], ids=["returning", "locked_fallback"])
+def returning(request, mocker):
+    mocker.patch.object(ledger, "_supports_returning", return_value=request.param)
+    return request.param
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_credit_creates_user_and_debit_is_conditional(database, returning):
+    assert await ledger.update_user_balance("alice", -1.0) is False # Unknown users cannot be debited
+    assert await ledger.get_user_balance("alice") is None
+
+    assert await ledger.update_user_balance("alice", Decimal("10")) is True
+    assert await ledger.update_user_balance("alice", 2.5) is True
+    assert await ledger.update_user_balance("alice", -12.50000001) is False
+    assert await ledger.update_user_balance("alice", -12.5) is True
+
+    assert await ledger.get_user_balance("alice") == Decimal("0")
+
+@pytest.mark.asyncio
+async def test_amounts_are_decimal_at_ledger_precision(database, returning):
+    await ledger.update_user_balance("bob", 1.0)
+    await ledger.update_user_balance("bob", -0.1)
+    await ledger.update_user_balance("bob", -0.2)
+
+    balance = await ledger.get_user_balance("bob")
+    assert isinstance(balance, Decimal)
+    assert balance == Decimal("0.70000000")
+
+@pytest.mark.asyncio
+async def test_concurrent_debits_never_overdraw(database):
+    await ledger.update_user_balance("carol", 10.0)
+
+    results = await asyncio.gather(*(ledger.update_user_balance("carol", -1.0) for _ in range(25)))
+
+    assert results.count(True) == 10
+    assert await ledger.get_user_balance("carol") == Decimal("0")
+
+def test_supports_returning_by_dialect(mocker):
+    def use(url):
+        mocker.patch.object(ledger, "database", mocker.Mock(url=databases.DatabaseURL(url)))
+
+    use("postgresql://localhost/ledger")
+    assert ledger._supports_returning() is True
+    use("mysql://localhost/ledger")
+    assert ledger._supports_returning() is False
+    use("sqlite+aiosqlite:///ledger.db")
+    mocker.patch.object(ledger.sqlite3, "sqlite_version_info", (3, 31, 1))
+    assert ledger._supports_returning() is False
+
+@pytest.mark.asyncio
+async def test_changes_are_recorded_as_entries(database, returning):
+    await ledger.update_user_balance("dana", 5.0, reason="data_reward", cid="bafy123")
+    await ledger.update_user_balance("dana", -2.0, reason="query", session_id="s1")
+    assert await ledger.update_user_balance("dana", -10.0, reason="query", session_id="s2") is False # Refused: no entry
+
+    entries = await ledger.get_ledger_entries("dana")
+
+    assert [(e["amount"], e["reason"], e["session_id"], e["cid"]) for e in entries] == [
+        (Decimal("-2"), "query", "s1", None),
+        (Decimal("5"), "data_reward", None, "bafy123"),
+    ]
+    older = await ledger.get_ledger_entries("dana", before_entry_id=entries[0]["entry_id"])
+    assert [e["entry_id"] for e in older] == [entries[1]["entry_id"]]
+
+@pytest.mark.asyncio
+async def test_compaction_rolls_entries_into_snapshots(database):
+    await database.execute("INSERT INTO user_balances (user_id, balance) VALUES ('erin', 10)") # Pre-entries balance
+    await ledger.update_user_balance("erin", -3.0)
+    await ledger.update_user_balance("frank", 4.0)
+
+    assert await ledger.compact_ledger(min_age_seconds=3600) is None # Entries too recent
+    upto = await ledger.compact_ledger(min_age_seconds=0)
+
+    snapshots = {row["user_id"]: row for row in await database.fetch_all(ledger.user_balances.select())}
+    assert snapshots["erin"]["snapshot_entry_id"] == upto
+    assert ledger.to_amount(snapshots["erin"]["balance"]) == Decimal("7")
+    assert ledger.to_amount(snapshots["frank"]["balance"]) == Decimal("4")
+    # Balances are unchanged by compaction, and entries after the snapshot still count
+    await ledger.update_user_balance("erin", -1.0)
+    assert await ledger.get_user_balance("erin") == Decimal("6")
+    assert len(await ledger.get_ledger_entries("erin")) == 2 # History is kept
+
+@pytest.mark.asyncio
+async def test_holds_reserve_funds_until_captured(database, returning):
+    await ledger.update_user_balance("gail", 10.0)
+    assert await ledger.place_hold("nobody", 1.0, ttl=60) is None
+
+    hold_id = await ledger.place_hold("gail", 8.0, ttl=60, session_id="s1")
+    assert hold_id is not None
+    assert await ledger.place_hold("gail", 2.5, ttl=60) is None # Only 2 available
+    assert await ledger.update_user_balance("gail", -2.5) is False
+    assert await ledger.get_user_balance("gail") == Decimal("10") # Holds are not debits
+
+    assert await ledger.capture_hold(hold_id, "gail", 5.0, session_id="s1") is True # Less than held: the rest is freed
+    assert await ledger.capture_hold(hold_id, "gail", 5.0) is True # Gone: an ordinary debit, which 5 covers
+    assert await ledger.get_user_balance("gail") == Decimal("0")
+    assert [(e["amount"], e["reason"]) for e in await ledger.get_ledger_entries("gail")][:2] == [
+        (Decimal("-5"), "query"), (Decimal("-5"), "query"),
+    ]
+
+@pytest.mark.asyncio
+async def test_released_and_expired_holds_free_funds(database, returning):
+    await ledger.update_user_balance("hugo", 5.0)
+
+    hold_id = await ledger.place_hold("hugo", 5.0, ttl=60)
+    assert await ledger.release_hold(hold_id) is True
+    assert await ledger.release_hold(hold_id) is False
+    stale = await ledger.place_hold("hugo", 5.0, ttl=-1) # Already expired
+    assert await ledger.update_user_balance("hugo", -1.0) is True
+
+    assert await ledger.expire_holds() == 1
+    assert await ledger.capture_hold(stale, "hugo", 5.0) is False # Expired, and 4 no longer covers it
+    assert await ledger.get_user_balance("hugo") == Decimal("4")
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import threading
+from decimal import Decimal
+
+import databases
+import pytest
+import pytest_asyncio
+import sqlalchemy
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from tokenomics import ledger
+from tokenomics.write_behind import LedgerJournal, WriteBehindLedger, SELECT_BALANCE_SQL
+
+# --- Test Fixtures ---
+
+@pytest_asyncio.fixture
+async def database(tmp_path):
+    """A connected SQLite database with the ledger schema."""
+    path = tmp_path / "ledger.db"
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    ledger.metadata.create_all(engine)
+    engine.dispose()
+    db = databases.Database(f"sqlite:///{path}")
+    await db.connect()
+    yield db
+    await db.disconnect()
+
+def _engine(database, tmp_path, **kwargs) -> WriteBehindLedger:
+    kwargs.setdefault("flush_interval", 3600.0) # Flush explicitly unless a test says otherwise
+    return WriteBehindLedger(database, LedgerJournal(str(tmp_path / "ledger.journal"), fsync=False), **kwargs)
+
+async def _db_balance(database, user_id):
+    row = await database.fetch_one(SELECT_BALANCE_SQL, {"user_id": user_id})
+    return Decimal(str(row["balance"])) if row else None
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_balances_are_served_from_memory_and_flushed_in_batches(database, tmp_path):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        assert await engine.apply("alice", 100.0) is True
+        assert await engine.apply("alice", -30.5) is True
+        assert await engine.apply("bob", 5) is True
+
+        assert await engine.get_balance("alice") == Decimal("69.5")
+        assert await _db_balance(database, "alice") is None # Not flushed yet
+
+        assert await engine.flush() == 3
+        assert await _db_balance(database, "alice") == Decimal("69.5")
+        assert await _db_balance(database, "bob") == Decimal("5")
+        assert await engine.flush() == 0
+    finally:
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_debits_are_checked_against_cached_balance(database, tmp_path):
+    await database.execute("INSERT INTO user_balances (user_id, balance) VALUES ('carol', 10)")
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        assert await engine.apply("nobody", -1.0) is False
+        assert await engine.apply("carol", -10.01) is False
+        # Concurrent debits for the same user are serialized: only ten of these fit
+        results = await asyncio.gather(*(engine.apply("carol", -1.0) for _ in range(15)))
+        assert results.count(True) == 10
+        assert await engine.get_balance("carol") == Decimal(0)
+    finally:
+        await engine.stop()
+    assert await _db_balance(database, "carol") == Decimal(0) # stop() flushes
+
+@pytest.mark.asyncio
+async def test_size_trigger_flushes_in_background(database, tmp_path):
+    engine = _engine(database, tmp_path, flush_max_entries=2)
+    await engine.start()
+    try:
+        await engine.apply("dave", 1.0)
+        await engine.apply("dave", 1.0)
+        for _ in range(50):
+            if await _db_balance(database, "dave") is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert await _db_balance(database, "dave") == Decimal(2)
+    finally:
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_unflushed_entries_are_replayed_on_start(database, tmp_path):
+    crashed = _engine(database, tmp_path)
+    await crashed.start()
+    await crashed.apply("erin", 50.0)
+    await crashed.flush() # Checkpointed: must not be replayed
+    await crashed.apply("erin", -20.0)
+    await crashed.apply("frank", 7.0)
+    # Simulate a crash: the journal writer stops without the final flush
+    crashed._flusher.cancel()
+    await crashed.journal.stop()
+    with open(crashed.journal.segments()[-1], "a") as f:
+        f.write('{"seq": 99, "user_id": "erin", "de') # Torn write
+
+    recovered = _engine(database, tmp_path)
+    await recovered.start()
+    try:
+        assert await _db_balance(database, "erin") == Decimal(30)
+        assert await _db_balance(database, "frank") == Decimal(7)
+        assert await recovered.get_balance("erin") == Decimal(30)
+        await recovered.apply("erin", 1.0)
+        entries = recovered.journal.read_entries()
+        assert [entry["seq"] for entry in entries] == [4] # Sequence continues after the replayed entries
+    finally:
+        await recovered.stop()
+
+@pytest.mark.asyncio
+async def test_journal_segments_are_deleted_once_checkpointed(database, tmp_path):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        await engine.apply("gina", 1.0)
+        await engine.flush()
+        await engine.apply("gina", 1.0) # Rotates to a new segment
+        await engine.flush()
+
+        segments = engine.journal.segments()
+        assert len(segments) == 1
+        with open(segments[0]) as f:
+            assert [json.loads(line)["seq"] for line in f] == [2]
+    finally:
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_failed_journal_write_rolls_back(database, tmp_path, mocker):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        await engine.apply("hank", 10.0)
+        mocker.patch.object(engine.journal, "_write", side_effect=OSError("disk full"))
+        with pytest.raises(IOError):
+            await engine.apply("hank", -4.0)
+        assert await engine.get_balance("hank") == Decimal(10)
+    finally:
+        mocker.stopall()
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_failed_credit_does_not_create_user(database, tmp_path, mocker):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        mocker.patch.object(engine.journal, "_write", side_effect=OSError("disk full"))
+        with pytest.raises(IOError):
+            await engine.apply("iris", 10.0)
+        assert await engine.get_balance("iris") is None # No zero-balance placeholder left behind
+    finally:
+        mocker.stopall()
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_ledger_delegates_to_running_engine(database, tmp_path, mocker):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    mocker.patch.object(ledger, "write_behind_ledger", engine)
+    try:
+        assert await ledger.update_user_balance("ivy", 3.0) is True
+        assert await ledger.get_user_balance("ivy") == 3.0
+        assert await _db_balance(database, "ivy") is None
+    finally:
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_holds_count_against_cached_balance(database, tmp_path):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        await engine.apply("jack", 10.0)
+        hold_id = await engine.place_hold("jack", 6.0, ttl=60)
+        assert await engine.place_hold("jack", 5.0, ttl=60) is None
+        assert await engine.apply("jack", -5.0) is False
+        await engine.place_hold("jack", 4.0, ttl=-1) # Expired: reserves nothing
+        assert engine.expire_holds() == 1
+
+        assert await engine.capture_hold(hold_id, "jack", 7.0) is True # Capped at the amount held
+        assert engine.release_hold(hold_id) is False
+        assert await engine.get_balance("jack") == Decimal(4)
+    finally:
+        await engine.stop()
+    assert await _db_balance(database, "jack") == Decimal(4)
+
+@pytest.mark.asyncio
+async def test_hold_is_only_captured_by_its_owner(database, tmp_path):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        await engine.apply("kate", 10.0)
+        await engine.apply("liam", 10.0)
+        hold_id = await engine.place_hold("kate", 8.0, ttl=60)
+
+        assert await engine.capture_hold(hold_id, "liam", 5.0) is True # An ordinary debit of liam
+        assert await engine.get_balance("liam") == Decimal(5)
+        assert await engine.place_hold("kate", 3.0, ttl=60) is None # kate's hold is still in place
+        assert await engine.capture_hold(hold_id, "kate", 8.0) is True
+        assert await engine.get_balance("kate") == Decimal(2)
+    finally:
+        await engine.stop()
+
+@pytest.mark.asyncio
+async def test_failed_write_keeps_later_in_flight_change(database, tmp_path, mocker):
+    engine = _engine(database, tmp_path)
+    await engine.start()
+    try:
+        await engine.apply("mia", 10.0)
+        await engine.flush() # Nothing pending: only the in-flight change keeps the cache
+        write = engine.journal._write
+        started, release = threading.Event(), threading.Event()
+        def first_write_fails(data, first_seq):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+                raise OSError("disk full")
+            return write(data, first_seq)
+        mocker.patch.object(engine.journal, "_write", side_effect=first_write_fails)
+
+        cancelled = asyncio.ensure_future(engine.apply("mia", -3.0))
+        await asyncio.to_thread(started.wait, 5)
+        cancelled.cancel() # Frees the user's lock with the write still in progress
+        later = asyncio.ensure_future(engine.apply("mia", -2.0))
+        await asyncio.sleep(0.01)
+        release.set()
+
+        assert await later is True
+        assert await engine.get_balance("mia") == Decimal(8)
+    finally:
+        mocker.stopall()
+        await engine.stop()
+    assert await _db_balance(database, "mia") == Decimal(8)
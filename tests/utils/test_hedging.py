@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from utils.hedging import HedgePolicy
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+# --- Helpers ---
+
+def _warmed_policy(**kwargs) -> HedgePolicy:
+    """A policy whose latency history puts the hedge delay at 10ms."""
+    policy = HedgePolicy("test", min_samples=5, min_delay=0.0, **kwargs)
+    for _ in range(100):
+        policy._latencies.append(0.01)
+    return policy
+
+def _call(result, delay: float, log: list, name: str):
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"{name} cancelled")
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+# --- Test Cases ---
+
+async def test_no_hedge_without_latency_history():
+    policy = HedgePolicy("test", min_samples=5)
+    log = []
+
+    result = await policy.run(_call("primary", 0.02, log, "primary"), _call("hedge", 0, log, "hedge"))
+
+    assert result == "primary"
+    assert policy.stats["hedged"] == 0
+
+async def test_slow_primary_is_hedged_and_cancelled():
+    policy = _warmed_policy(max_hedge_rate=1.0)
+    log = []
+
+    result = await policy.run(_call("primary", 1.0, log, "primary"), _call("hedge", 0.0, log, "hedge"))
+    await asyncio.sleep(0)
+
+    assert result == "hedge"
+    assert log == ["primary cancelled"]
+    assert policy.stats["hedged"] == 1 and policy.stats["hedge_wins"] == 1
+
+async def test_failed_hedge_falls_back_to_primary():
+    policy = _warmed_policy(max_hedge_rate=1.0)
+    log = []
+
+    result = await policy.run(_call("primary", 0.05, log, "primary"), _call(RuntimeError("boom"), 0.0, log, "hedge"))
+
+    assert result == "primary"
+    assert policy.stats["primary_wins"] == 1
+
+async def test_hedge_rate_is_capped():
+    policy = _warmed_policy(max_hedge_rate=0.5)
+    log = []
+
+    for _ in range(4):
+        await policy.run(_call("primary", 0.03, log, "primary"), _call("hedge", 0.0, log, "hedge"))
+
+    assert policy.stats["hedged"] == 2
+    assert policy.stats["rate_capped"] == 2
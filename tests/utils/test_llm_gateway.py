@@ -0,0 +1,117 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from pytest_mock import MockerFixture
+from types import SimpleNamespace
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from utils import llm_gateway as llm_gateway_module
+from utils.llm_gateway import LLMGateway, TokenBucket
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+# --- Helpers ---
+
+def _completion(prompt_tokens: int = 10, completion_tokens: int = 5) -> SimpleNamespace:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+def _api_error(status_code: int, headers=None) -> openai.APIStatusError:
+    response = httpx.Response(status_code, headers=headers or {}, request=httpx.Request("POST", "https://api.openai.test"))
+    error_class = openai.RateLimitError if status_code == 429 else openai.InternalServerError
+    return error_class("error", response=response, body=None)
+
+@pytest.fixture
+def client(mocker: MockerFixture):
+    client = mocker.MagicMock()
+    client.chat.completions.create = mocker.AsyncMock(return_value=_completion())
+    return client
+
+@pytest.fixture
+def no_sleep(mocker: MockerFixture):
+    """Replaces sleeping with advancing a fake monotonic clock."""
+    clock = mocker.patch.object(llm_gateway_module.time, "monotonic", return_value=0.0)
+    async def fake_sleep(seconds):
+        clock.return_value += seconds
+    return mocker.patch.object(llm_gateway_module.asyncio, "sleep", side_effect=fake_sleep)
+
+# --- Test Cases ---
+
+async def test_records_usage_per_model(client):
+    gateway = LLMGateway(client)
+
+    await gateway.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    await gateway.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+
+    usage = gateway.usage()["gpt-4o"]
+    assert usage["requests"] == 2
+    assert usage["prompt_tokens"] == 20
+    assert usage["completion_tokens"] == 10
+    assert usage["failures"] == 0
+
+async def test_retries_rate_limit_honoring_retry_after(client, no_sleep):
+    client.chat.completions.create.side_effect = [_api_error(429, {"retry-after": "3"}), _completion()]
+    gateway = LLMGateway(client, max_retries=2, backoff_base=0.01)
+
+    response = await gateway.chat.completions.create(model="gpt-4o", messages=[])
+
+    assert response.choices[0].message.content == "ok"
+    assert no_sleep.await_args_list[0].args[0] == pytest.approx(3.0)
+    usage = gateway.usage()["gpt-4o"]
+    assert usage["retries"] == 1 and usage["rate_limited"] == 1
+
+async def test_gives_up_after_max_retries(client, no_sleep):
+    client.chat.completions.create.side_effect = _api_error(503)
+    gateway = LLMGateway(client, max_retries=2)
+
+    with pytest.raises(openai.InternalServerError):
+        await gateway.chat.completions.create(model="gpt-4o", messages=[])
+
+    assert client.chat.completions.create.await_count == 3
+
+async def test_does_not_retry_client_errors(client, no_sleep):
+    client.chat.completions.create.side_effect = openai.BadRequestError(
+        "bad", response=httpx.Response(400, request=httpx.Request("POST", "https://api.openai.test")), body=None
+    )
+    gateway = LLMGateway(client, max_retries=3)
+
+    with pytest.raises(openai.BadRequestError):
+        await gateway.chat.completions.create(model="gpt-4o", messages=[])
+
+    client.chat.completions.create.assert_awaited_once()
+
+async def test_per_model_concurrency_limit(client):
+    active = 0
+    peak = 0
+
+    async def slow_create(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return _completion()
+    client.chat.completions.create.side_effect = slow_create
+    gateway = LLMGateway(client, max_concurrency=8, model_limits={"gpt-4o": {"max_concurrency": 2}})
+
+    await asyncio.gather(*(gateway.chat.completions.create(model="gpt-4o", messages=[]) for _ in range(6)))
+
+    assert peak == 2
+
+async def test_token_bucket_waits_for_refill(mocker: MockerFixture):
+    clock = mocker.patch.object(llm_gateway_module.time, "monotonic", return_value=0.0)
+    sleeps = []
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock.return_value += seconds
+    mocker.patch.object(llm_gateway_module.asyncio, "sleep", side_effect=fake_sleep)
+    bucket = TokenBucket(rate_per_minute=60) # One token per second
+
+    await bucket.acquire(60)
+    await bucket.acquire(2)
+
+    assert sleeps == [pytest.approx(2.0)]
@@ -0,0 +1,135 @@
+import io
+import json
+import logging
+import queue
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from utils import log as log_module
+from utils.log import JsonFormatter, TextFormatter, NonBlockingQueueHandler, StructuredLogger, configure_logging, shutdown_logging
+from utils.telemetry import span
+
+# --- Test Fixtures ---
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+@pytest.fixture
+def captured():
+    """A fresh stdlib logger at DEBUG with a handler collecting its records."""
+    std_logger = logging.getLogger("colab.test.log")
+    std_logger.handlers = []
+    handler = _ListHandler()
+    std_logger.addHandler(handler)
+    std_logger.setLevel(logging.DEBUG)
+    std_logger.propagate = False
+    yield std_logger, handler.records
+    std_logger.handlers = []
+
+def _record(msg="Charged %s", args=("u1",), fields=None) -> logging.LogRecord:
+    record = logging.LogRecord("colab.test", logging.INFO, __file__, 1, msg, args, None)
+    record.fields = fields or {}
+    return record
+
+# --- Formatters ---
+
+def test_json_formatter_puts_fields_at_top_level_and_truncates():
+    line = JsonFormatter(max_field_chars=10).format(_record(fields={"cost": 1.5, "raw_response": "x" * 25}))
+    payload = json.loads(line)
+
+    assert payload["msg"] == "Charged u1"
+    assert payload["level"] == "INFO"
+    assert payload["cost"] == 1.5
+    assert payload["raw_response"] == "x" * 10 + "...[15 more chars]"
+
+def test_text_formatter_appends_fields():
+    line = TextFormatter().format(_record(fields={"user_id": "u1"}))
+
+    assert line.endswith("INFO colab.test: Charged u1 user_id=u1")
+
+# --- StructuredLogger ---
+
+def test_fields_and_trace_id_are_attached(captured):
+    std_logger, records = captured
+    logger = StructuredLogger(std_logger, debug_sample_rate=1.0)
+
+    with span("request") as request_span:
+        logger.info("Charged %s", "u1", cost=2.0)
+
+    assert records[0].getMessage() == "Charged u1"
+    assert records[0].fields == {"cost": 2.0, "trace_id": request_span.trace_id}
+    assert records[0].funcName == "test_fields_and_trace_id_are_attached"
+
+def test_disabled_level_is_not_formatted(captured):
+    std_logger, records = captured
+    std_logger.setLevel(logging.INFO)
+    logger = StructuredLogger(std_logger, debug_sample_rate=1.0)
+
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    logger.debug("Payload %s", Exploding(), payload=Exploding())
+
+    assert records == []
+
+def test_debug_lines_are_sampled_per_trace(captured):
+    std_logger, records = captured
+    logger = StructuredLogger(std_logger, debug_sample_rate=0.5)
+
+    kept_traces = 0
+    for _ in range(200):
+        with span("request"):
+            before = len(records)
+            for _ in range(3):
+                logger.debug("detail")
+            logger.info("summary")
+            # A trace keeps all of its debug lines or none of them; INFO is never sampled
+            assert len(records) - before in (1, 4)
+            kept_traces += len(records) - before == 4
+
+    assert 50 < kept_traces < 150
+
+# --- Queue handler ---
+
+def test_queue_handler_defers_formatting_and_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    first, second = _record(), _record()
+
+    handler.handle(first)
+    handler.handle(second)
+
+    queued = handler.queue.get_nowait()
+    assert queued is first
+    assert queued.msg == "Charged %s" and queued.args == ("u1",) # Not interpolated by the caller
+    assert handler.dropped == 1
+
+def test_queue_handler_snapshots_mutable_fields():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    stats = {"hits": 1}
+    handler.handle(_record(fields={"cache_stats": stats, "count": 3}))
+
+    stats["hits"] += 1 # The event loop keeps updating the live dict
+
+    queued = handler.queue.get_nowait()
+    assert queued.fields == {"cache_stats": {"hits": 1}, "count": 3}
+
+def test_configure_logging_writes_through_background_thread(mocker):
+    root = logging.getLogger()
+    mocker.patch.object(root, "level", root.level) # Restored after the test
+    stream = io.StringIO()
+    try:
+        configure_logging(level="INFO", fmt="json", stream=stream)
+        assert configure_logging(level="INFO", fmt="json", stream=stream) is log_module._queue_handler # Idempotent
+        log_module.get_logger("colab.test.configured").info("Hello %s", "world", user_id="u1")
+    finally:
+        shutdown_logging()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert {"msg": "Hello world", "user_id": "u1"}.items() <= lines[-1].items()
+    assert log_module._queue_handler is None
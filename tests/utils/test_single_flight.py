@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from utils.single_flight import SingleFlight
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+# --- Test Cases ---
+
+async def test_concurrent_calls_share_one_invocation():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats == {"calls": 1, "coalesced": 4, "cancelled": 0}
+    assert len(flight) == 0
+
+async def test_sequential_calls_are_not_cached():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", work) == 1
+    assert await flight.do("key", work) == 2
+
+async def test_exception_is_shared_by_all_waiters():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats["calls"] == 1
+
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    first = asyncio.ensure_future(flight.do("key", work))
+    second = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "result"
+    assert flight.stats["cancelled"] == 0
+
+async def test_call_is_cancelled_with_its_last_caller():
+    flight = SingleFlight("test")
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.ensure_future(flight.do("key", work))
+    second = asyncio.ensure_future(flight.do("key", work))
+    await started.wait()
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set() # Still shielded for the second caller
+    second.cancel()
+    await asyncio.gather(first, second, return_exceptions=True)
+
+    assert cancelled.is_set() # The call had unwound by the time the last caller returned
+    assert flight.stats["cancelled"] == 1
+    assert len(flight) == 0
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import pytest
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from utils import telemetry
+from utils.telemetry import Histogram, MetricsRegistry, span, current_span, trace_headers, STAGE_DURATION
+
+# --- Histogram / Registry ---
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test durations.", labelnames=("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    lines = histogram.render()
+
+    assert '# TYPE test_seconds histogram' in lines
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="a"} 5.55' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+def test_histogram_escapes_label_values():
+    histogram = Histogram("test_seconds", "Test durations.", labelnames=("stage",), buckets=(1.0,))
+    histogram.observe(0.5, stage='we"ird\\')
+
+    assert 'test_seconds_count{stage="we\\"ird\\\\"} 1' in histogram.render()
+
+def test_registry_returns_existing_histogram_and_renders_all():
+    registry = MetricsRegistry()
+    first = registry.histogram("b_seconds", "B.")
+    assert registry.histogram("b_seconds", "B.") is first
+    registry.histogram("a_seconds", "A.").observe(0.2)
+    first.observe(0.3)
+
+    text = registry.render()
+
+    assert text.index("a_seconds_count 1") < text.index("b_seconds_count 1")
+    assert text.endswith("\n")
+
+# --- Spans ---
+
+def test_span_records_duration_and_status():
+    before = (STAGE_DURATION.snapshot(stage="test_stage", status="ok") or {"count": 0})["count"]
+    with span("test_stage"):
+        pass
+    with pytest.raises(ValueError):
+        with span("test_stage"):
+            raise ValueError("boom")
+
+    assert STAGE_DURATION.snapshot(stage="test_stage", status="ok")["count"] == before + 1
+    assert STAGE_DURATION.snapshot(stage="test_stage", status="error")["count"] >= 1
+
+def test_nested_spans_share_trace_and_link_parent():
+    with span("outer") as outer:
+        with span("inner") as inner:
+            assert current_span() is inner
+        assert current_span() is outer
+    assert current_span() is None
+
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id is None
+
+@pytest.mark.asyncio
+async def test_tasks_inherit_current_span():
+    async def child():
+        with span("child") as child_span:
+            return child_span
+
+    with span("parent") as parent_span:
+        child_span = await asyncio.ensure_future(child())
+
+    assert child_span.parent_id == parent_span.span_id
+    assert child_span.trace_id == parent_span.trace_id
+
+@pytest.mark.asyncio
+async def test_cancelled_span_status():
+    async def slow():
+        with span("slow") as slow_span:
+            spans.append(slow_span)
+            await asyncio.sleep(10)
+
+    spans = []
+    task = asyncio.ensure_future(slow())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert spans[0].status == "cancelled"
+
+def test_trace_headers_use_current_span():
+    assert trace_headers() == {}
+    with span("request") as request_span:
+        headers = trace_headers()
+
+    assert headers == {"traceparent": f"00-{request_span.trace_id}-{request_span.span_id}-01"}
+    assert len(request_span.trace_id) == 32 and len(request_span.span_id) == 16
+
+def test_span_logs_structured_record(caplog):
+    with caplog.at_level(logging.INFO, logger=telemetry.TRACING_LOGGER_NAME):
+        with span("logged", sub_task_id="t1") as logged:
+            logged.set_attribute("hit", True)
+
+    record = caplog.records[-1].fields
+    assert record["span"] == "logged"
+    assert record["sub_task_id"] == "t1"
+    assert record["hit"] is True
+    assert record["status"] == "ok"
+    assert record["trace_id"] == logged.trace_id
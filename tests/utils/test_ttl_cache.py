@@ -0,0 +1,48 @@
+import pytest
+from pytest_mock import MockerFixture
+
+# Modules to test (using imports relative to project root 'Co-Lab')
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache, MISSING
+
+# --- Test Cases ---
+
+def test_get_returns_missing_for_absent_key():
+    cache = TTLCache(max_entries=2)
+
+    assert cache.get("absent") is MISSING
+    assert cache.stats["misses"] == 1
+
+def test_none_can_be_cached():
+    cache = TTLCache(max_entries=2)
+    cache.put("key", None)
+
+    assert cache.get("key") is None
+    assert cache.stats["hits"] == 1
+
+def test_entries_expire_with_default_and_per_entry_ttl(mocker: MockerFixture):
+    clock = mocker.patch.object(ttl_cache.time, "monotonic", return_value=100.0)
+    cache = TTLCache(max_entries=10, ttl_seconds=10)
+    cache.put("default", 1)
+    cache.put("short", 2, ttl_seconds=1)
+    cache.put("forever", 3, ttl_seconds=0)
+
+    clock.return_value = 105.0
+    assert cache.get("short") is MISSING
+    assert cache.get("default") == 1
+
+    clock.return_value = 1000.0
+    assert cache.get("default") is MISSING
+    assert cache.get("forever") == 3
+    assert cache.stats["expirations"] == 2
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.stats["evictions"] == 1
@@ -1,9 +1,20 @@
+import asyncio
 import databases
 import sqlalchemy # Using SQLAlchemy core for query building
-from ..config import settings
+from ..config.settings import settings
 from contextlib import asynccontextmanager
-from typing import Optional
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Union
 import datetime # Import datetime for potential timestamp logic later
+import sqlite3
+import uuid
+from ..utils.log import get_logger
+from .write_behind import (
+    LedgerJournal, WriteBehindLedger, to_amount,
+    BALANCE_EXPR, SELECT_BALANCE_SQL, ENSURE_ACCOUNT_SQL, INSERT_ENTRY_SQL,
+)
+
+logger = get_logger(__name__)
 
 # --- Database Setup ---
 
@@ -15,6 +26,8 @@ database = databases.Database(DATABASE_URL, connect_args=connect_args)
 # Define the table structure using SQLAlchemy Core (more flexible than ORM for simple cases)
 metadata = sqlalchemy.MetaData()
 
+# A user's balance is the snapshot here plus the ledger_entries after snapshot_entry_id
+# (see compact_ledger, which rolls entries into the snapshot)
 user_balances = sqlalchemy.Table(
     "user_balances",
     metadata,
@@ -22,9 +35,26 @@ user_balances = sqlalchemy.Table(
     # Using Numeric for potentially fractional tokens, adjust precision as needed
     # Defaulting balance to 0
     sqlalchemy.Column("balance", sqlalchemy.Numeric(18, 8), nullable=False, server_default=sqlalchemy.text("0.0")),
+    sqlalchemy.Column("snapshot_entry_id", sqlalchemy.BigInteger, nullable=False, server_default=sqlalchemy.text("0")),
     sqlalchemy.Column("last_updated", sqlalchemy.DateTime, server_default=sqlalchemy.func.now(), onupdate=sqlalchemy.func.now())
 )
 
+# Append-only record of every credit and debit (never updated or deleted)
+ledger_entries = sqlalchemy.Table(
+    "ledger_entries",
+    metadata,
+    # SQLite only autoincrements INTEGER primary keys
+    sqlalchemy.Column("entry_id", sqlalchemy.BigInteger().with_variant(sqlalchemy.Integer, "sqlite"), primary_key=True, autoincrement=True),
+    sqlalchemy.Column("user_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("amount", sqlalchemy.Numeric(18, 8), nullable=False), # Positive for credits, negative for debits
+    sqlalchemy.Column("reason", sqlalchemy.String, nullable=False), # e.g. 'query', 'cache_hit', 'data_reward'
+    sqlalchemy.Column("session_id", sqlalchemy.String, nullable=True), # Query session for charges
+    sqlalchemy.Column("cid", sqlalchemy.String, nullable=True), # Uploaded content for rewards
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False, server_default=sqlalchemy.func.now()),
+    sqlalchemy.Index("ix_ledger_entries_user_id_entry_id", "user_id", "entry_id"),
+    sqlalchemy.Index("ix_ledger_entries_created_at", "created_at"),
+)
+
 # New table to track rewarded uploads for duplicate checking
 rewarded_uploads = sqlalchemy.Table(
     "rewarded_uploads",
@@ -36,6 +66,52 @@ rewarded_uploads = sqlalchemy.Table(
     # sqlalchemy.Column("reward_amount", sqlalchemy.Numeric(18, 8))
 )
 
+# Last journal entry flushed by the write-behind ledger (see write_behind.py), per journal
+ledger_journal_checkpoints = sqlalchemy.Table(
+    "ledger_journal_checkpoints",
+    metadata,
+    sqlalchemy.Column("journal_id", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("last_seq", sqlalchemy.BigInteger, nullable=False),
+)
+
+# Funds reserved for a query in progress (see place_hold): they count against the available
+# balance until captured, released or expired
+ledger_holds = sqlalchemy.Table(
+    "ledger_holds",
+    metadata,
+    sqlalchemy.Column("hold_id", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("user_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("amount", sqlalchemy.Numeric(18, 8), nullable=False),
+    sqlalchemy.Column("session_id", sqlalchemy.String, nullable=True),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("expires_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Index("ix_ledger_holds_user_id_expires_at", "user_id", "expires_at"),
+)
+
+# --- Write-Behind Engine (Load from Settings) ---
+# Off by default: balances are then cached in this process, which must be the only ledger writer
+LEDGER_WRITE_BEHIND_ENABLED = bool(getattr(settings, "LEDGER_WRITE_BEHIND_ENABLED", False))
+LEDGER_JOURNAL_PATH = getattr(settings, "LEDGER_JOURNAL_PATH", "./colab_ledger.journal")
+LEDGER_JOURNAL_FSYNC = bool(getattr(settings, "LEDGER_JOURNAL_FSYNC", True))
+LEDGER_FLUSH_MAX_ENTRIES = int(getattr(settings, "LEDGER_FLUSH_MAX_ENTRIES", 500))
+LEDGER_FLUSH_INTERVAL = float(getattr(settings, "LEDGER_FLUSH_INTERVAL", 1.0))
+
+write_behind_ledger: Optional[WriteBehindLedger] = None
+if LEDGER_WRITE_BEHIND_ENABLED:
+    write_behind_ledger = WriteBehindLedger(
+        database,
+        LedgerJournal(LEDGER_JOURNAL_PATH, fsync=LEDGER_JOURNAL_FSYNC),
+        flush_max_entries=LEDGER_FLUSH_MAX_ENTRIES,
+        flush_interval=LEDGER_FLUSH_INTERVAL,
+    )
+
+# --- Snapshot Compaction (Load from Settings) ---
+LEDGER_COMPACTION_INTERVAL = float(getattr(settings, "LEDGER_COMPACTION_INTERVAL", 300.0)) # Seconds, 0 disables the periodic job
+# Only entries at least this old are rolled into snapshots, so an entry whose (short) transaction
+# commits after a later-numbered one is never skipped
+LEDGER_COMPACTION_MIN_AGE = float(getattr(settings, "LEDGER_COMPACTION_MIN_AGE", 60.0))
+
+_compaction_task: Optional[asyncio.Task] = None
 
 # --- Database Connection Management ---
 
@@ -45,12 +121,16 @@ async def connect_db():
         await database.connect()
         print("Ledger database connected.")
         # REMOVED: Schema creation is now handled by Alembic
+        if write_behind_ledger is not None:
+            await write_behind_ledger.start() # Replays any journal entries left unflushed by a crash
     except Exception as e:
         print(f"Error connecting to ledger database: {e}")
 
 async def disconnect_db():
     """Disconnects from the database."""
     try:
+        if write_behind_ledger is not None:
+            await write_behind_ledger.stop() # Flushes pending balance changes
         if database.is_connected:
             await database.disconnect()
             print("Ledger database disconnected.")
@@ -59,56 +139,341 @@ async def disconnect_db():
     except Exception as e:
         print(f"Error disconnecting from ledger database: {e}")
 
-@asynccontextmanager
-async def db_session():
-    """Provides a transactional database session."""
+async def _connected_database() -> databases.Database:
     if not database.is_connected:
-        print("Warning: DB session requested but database not connected. Attempting connect.")
+        logger.warning("DB session requested but database not connected. Attempting connect.")
         await connect_db()
         if not database.is_connected:
              raise ConnectionError("Database connection failed within db_session context manager.")
-    try:
-        async with database.transaction():
-            yield database
-    except Exception:
-        raise
+    return database
+
+@asynccontextmanager
+async def db_session():
+    """Provides a transactional database session."""
+    session = await _connected_database()
+    async with session.transaction():
+        yield session
 
 # --- Ledger Operations ---
 
-async def get_user_balance(user_id: str) -> Optional[float]:
-    """Gets the current balance for a user."""
-    async with db_session() as session:
-        query = user_balances.select().where(user_balances.c.user_id == user_id)
-        result = await session.fetch_one(query)
-        return float(result["balance"]) if result else None
+# Available balance: the balance less the user's unexpired holds (:now is the current UTC time)
+AVAILABLE_EXPR = (
+    f"{BALANCE_EXPR} - COALESCE((SELECT SUM(h.amount) FROM ledger_holds h "
+    "WHERE h.user_id = b.user_id AND h.expires_at > :now), 0)"
+)
+_SELECT_AVAILABLE_SQL = f"SELECT {AVAILABLE_EXPR} AS available FROM user_balances b WHERE b.user_id = :user_id"
+# A debit is a conditional insert: it only adds the entry while the available balance covers it
+_CONDITIONAL_DEBIT_SQL = (
+    "INSERT INTO ledger_entries (user_id, amount, reason, session_id, cid) "
+    "SELECT b.user_id, :amount, :reason, :session_id, :cid FROM user_balances b "
+    f"WHERE b.user_id = :user_id AND {AVAILABLE_EXPR} + :amount >= 0 RETURNING entry_id"
+)
+# Likewise a hold: it is only placed while the available balance covers it
+_CONDITIONAL_HOLD_SQL = (
+    "INSERT INTO ledger_holds (hold_id, user_id, amount, session_id, created_at, expires_at) "
+    "SELECT :hold_id, b.user_id, :amount, :session_id, :now, :expires_at FROM user_balances b "
+    f"WHERE b.user_id = :user_id AND {AVAILABLE_EXPR} >= :amount RETURNING hold_id"
+)
+_TAKE_HOLD_SQL = "DELETE FROM ledger_holds WHERE hold_id = :hold_id AND expires_at > :now RETURNING amount"
+_RELEASE_HOLD_SQL = "DELETE FROM ledger_holds WHERE hold_id = :hold_id RETURNING hold_id"
+# Rolls the entries up to :upto into each affected user's snapshot (SET expressions see the old row)
+_COMPACT_SQL = (
+    "UPDATE user_balances SET "
+    "balance = balance + COALESCE((SELECT SUM(e.amount) FROM ledger_entries e WHERE e.user_id = user_balances.user_id "
+    "AND e.entry_id > user_balances.snapshot_entry_id AND e.entry_id <= :upto), 0), "
+    "snapshot_entry_id = :upto, last_updated = CURRENT_TIMESTAMP "
+    "WHERE snapshot_entry_id < :upto AND EXISTS (SELECT 1 FROM ledger_entries e WHERE e.user_id = user_balances.user_id "
+    "AND e.entry_id > user_balances.snapshot_entry_id AND e.entry_id <= :upto)"
+)
 
-async def update_user_balance(user_id: str, amount_change: float) -> bool:
+def _supports_returning() -> bool:
+    """INSERT ... RETURNING: PostgreSQL, and SQLite from 3.35. Others use the locked fallback."""
+    dialect = database.url.dialect
+    if dialect == "postgresql":
+        return True
+    if dialect == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+def _utcnow() -> datetime.datetime:
+    """Naive UTC, matching how the DateTime columns are stored."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+async def _lock_user(session: databases.Database, user_id: str):
     """
-    Updates a user's balance by a given amount (positive for credit, negative for debit).
-    Uses a transaction for atomicity.
+    Serializes the user's debits and holds for the rest of the transaction.
+
+    On PostgreSQL concurrent READ COMMITTED inserts would each see the other's debit
+    missing, so they take an advisory lock (credits need none, they cannot overdraw).
+    SQLite serializes writers itself; other databases go through the locked fallbacks.
     """
-    amount_str = f"{amount_change:.8f}"
+    if database.url.dialect == "postgresql":
+        await session.execute("SELECT pg_advisory_xact_lock(hashtext(:user_id))", {"user_id": user_id})
+
+@asynccontextmanager
+async def _debit_transaction(session: databases.Database, user_id: str):
+    """A locked transaction for a conditional debit or hold, except where it is one self-serializing statement (SQLite)."""
+    if database.url.dialect == "sqlite" and _supports_returning():
+        yield
+        return
+    async with session.transaction():
+        await _lock_user(session, user_id)
+        yield
+
+async def _available_locked(session: databases.Database, user_id: str, now: datetime.datetime) -> Optional[Decimal]:
+    """Available balance for the locked fallbacks: locks the user's snapshot row first. None for unknown users."""
+    select_query = user_balances.select().where(user_balances.c.user_id == user_id).with_for_update()
+    if await session.fetch_one(select_query) is None:
+        return None
+    return to_amount((await session.fetch_one(_SELECT_AVAILABLE_SQL, {"user_id": user_id, "now": now}))["available"])
+
+async def _insert_debit(session: databases.Database, entry: dict, now: datetime.datetime) -> bool:
+    """Records a debit if the available balance covers it. The caller holds a transaction and the user's lock."""
+    if _supports_returning():
+        return await session.fetch_one(_CONDITIONAL_DEBIT_SQL, {**entry, "now": now}) is not None
+    available = await _available_locked(session, entry["user_id"], now)
+    if available is None or available + entry["amount"] < 0:
+        return False
+    await session.execute(ledger_entries.insert().values(**entry))
+    return True
+
+async def _log_refused_debit(user_id: str, amount: Decimal):
+    # Off the hot path: only to tell the two failure cases apart in the log
+    if await get_user_balance(user_id) is None:
+        logger.warning("User not found, cannot debit", user_id=user_id)
+    else:
+        logger.warning("Insufficient balance to debit", user_id=user_id, amount=float(amount))
+
+async def get_user_balance(user_id: str) -> Optional[Decimal]:
+    """Gets the current balance for a user: their snapshot plus the entries since."""
+    if write_behind_ledger is not None and write_behind_ledger.running:
+        return await write_behind_ledger.get_balance(user_id)
+    session = await _connected_database()
+    result = await session.fetch_one(SELECT_BALANCE_SQL, {"user_id": user_id})
+    return to_amount(result["balance"]) if result else None
+
+async def update_user_balance(
+    user_id: str,
+    amount_change: Union[Decimal, float],
+    reason: str = "adjustment",
+    session_id: Optional[str] = None,
+    cid: Optional[str] = None,
+) -> bool:
+    """
+    Records a credit (positive) or debit (negative) for a user as a ledger entry.
+    A debit never takes the available balance (the balance less active holds, see
+    place_hold) below zero, and unknown users can only be credited.
+
+    Writes are inserts only: a debit is one conditional INSERT ... SELECT where the
+    database supports RETURNING, otherwise a locked read-then-insert transaction; or
+    the change goes through the write-behind engine when enabled. Amounts are Decimals
+    at ledger precision throughout.
+    """
+    if write_behind_ledger is not None and write_behind_ledger.running:
+        return await write_behind_ledger.apply(user_id, amount_change, reason, session_id, cid)
+    amount = to_amount(amount_change)
+    entry = {"user_id": user_id, "amount": amount, "reason": reason, "session_id": session_id, "cid": cid}
+    session = await _connected_database()
+    if amount > 0:
+        if not _supports_returning():
+            return await _credit_locked(entry)
+        async with session.transaction():
+            await session.execute(ENSURE_ACCOUNT_SQL, {"user_id": user_id})
+            await session.execute(INSERT_ENTRY_SQL, entry)
+    else:
+        async with _debit_transaction(session, user_id):
+            recorded = await _insert_debit(session, entry, _utcnow())
+        if not recorded:
+            await _log_refused_debit(user_id, -amount)
+            return False
+    logger.debug("Recorded ledger entry", user_id=user_id, amount=float(amount), reason=reason)
+    return True
+
+async def _credit_locked(entry: dict) -> bool:
+    """Credit for databases without RETURNING (nor, presumably, ON CONFLICT): lock or create the user's snapshot row, insert."""
+    user_id, amount = entry["user_id"], entry["amount"]
     async with db_session() as session:
         select_query = user_balances.select().where(user_balances.c.user_id == user_id).with_for_update()
-        result = await session.fetch_one(select_query)
-        if not result:
-            if amount_change > 0:
-                print(f"User {user_id} not found, creating with balance {amount_change}")
-                insert_query = user_balances.insert().values(user_id=user_id, balance=amount_str)
-                await session.execute(insert_query)
-                return True
-            else:
-                print(f"User {user_id} not found, cannot debit.")
-                return False
-        current_balance = float(result["balance"])
-        new_balance = current_balance + amount_change
-        if new_balance < 0:
-            print(f"Insufficient balance for user {user_id} to debit {abs(amount_change)}")
+        if not await session.fetch_one(select_query):
+            logger.info("User not found, creating with initial balance", user_id=user_id, balance=float(amount))
+            await session.execute(user_balances.insert().values(user_id=user_id, balance=0, snapshot_entry_id=0))
+        await session.execute(ledger_entries.insert().values(**entry))
+    logger.debug("Recorded ledger entry", user_id=user_id, amount=float(amount), reason=entry["reason"])
+    return True
+
+# --- Holds ---
+
+async def place_hold(user_id: str, amount: Union[Decimal, float], ttl: float, session_id: Optional[str] = None) -> Optional[str]:
+    """
+    Reserves `amount` of the user's available balance for `ttl` seconds, e.g. the
+    estimated cost of a query while it runs. Held funds cannot be debited or held
+    again until the hold is captured, released or expires.
+
+    Returns:
+        The hold_id, or None if the user is unknown or their available balance is insufficient.
+    """
+    if write_behind_ledger is not None and write_behind_ledger.running:
+        return await write_behind_ledger.place_hold(user_id, amount, ttl, session_id)
+    now = _utcnow()
+    hold = {
+        "hold_id": uuid.uuid4().hex, "user_id": user_id, "amount": to_amount(amount), "session_id": session_id,
+        "now": now, "expires_at": now + datetime.timedelta(seconds=ttl),
+    }
+    session = await _connected_database()
+    async with _debit_transaction(session, user_id):
+        if _supports_returning():
+            placed = await session.fetch_one(_CONDITIONAL_HOLD_SQL, hold) is not None
+        else:
+            available = await _available_locked(session, user_id, now)
+            placed = available is not None and available >= hold["amount"]
+            if placed:
+                await session.execute(ledger_holds.insert().values(
+                    hold_id=hold["hold_id"], user_id=user_id, amount=hold["amount"], session_id=session_id,
+                    created_at=now, expires_at=hold["expires_at"],
+                ))
+    if not placed:
+        await _log_refused_debit(user_id, hold["amount"])
+        return None
+    logger.debug("Placed hold", user_id=user_id, hold_id=hold["hold_id"], amount=float(hold["amount"]))
+    return hold["hold_id"]
+
+async def _take_hold(session: databases.Database, hold_id: str, now: datetime.datetime) -> Optional[Decimal]:
+    """Deletes the hold and returns its amount, unless it expired (then expire_holds deletes it). The caller holds a transaction."""
+    if _supports_returning():
+        row = await session.fetch_one(_TAKE_HOLD_SQL, {"hold_id": hold_id, "now": now})
+    else:
+        query = ledger_holds.select().where(ledger_holds.c.hold_id == hold_id, ledger_holds.c.expires_at > now).with_for_update()
+        row = await session.fetch_one(query)
+        if row is not None:
+            await session.execute(ledger_holds.delete().where(ledger_holds.c.hold_id == hold_id))
+    return to_amount(row["amount"]) if row else None
+
+async def capture_hold(
+    hold_id: str,
+    user_id: str,
+    amount: Union[Decimal, float],
+    reason: str = "query",
+    session_id: Optional[str] = None,
+) -> bool:
+    """
+    Settles a hold: debits `amount` (at most the amount held) and removes the hold, in
+    one transaction. A hold that expired in the meantime no longer guarantees the
+    funds, so the debit is then an ordinary conditional one.
+
+    Returns:
+        True if the debit was recorded.
+    """
+    if write_behind_ledger is not None and write_behind_ledger.running:
+        return await write_behind_ledger.capture_hold(hold_id, user_id, amount, reason, session_id)
+    amount = to_amount(amount)
+    now = _utcnow()
+    session = await _connected_database()
+    async with session.transaction():
+        await _lock_user(session, user_id)
+        held = await _take_hold(session, hold_id, now)
+        if held is None:
+            logger.warning("Hold expired or missing, debiting the balance directly", user_id=user_id, hold_id=hold_id)
+        elif amount > held:
+            logger.warning("Capture exceeds hold, capturing the amount held", hold_id=hold_id, amount=float(amount), held=float(held))
+            amount = held
+        entry = {"user_id": user_id, "amount": -amount, "reason": reason, "session_id": session_id, "cid": None}
+        # Freed by the delete above, so a live hold's funds are always there
+        recorded = amount == 0 or await _insert_debit(session, entry, now)
+    if not recorded:
+        await _log_refused_debit(user_id, amount)
+        return False
+    logger.debug("Captured hold", user_id=user_id, hold_id=hold_id, amount=float(amount))
+    return True
+
+async def release_hold(hold_id: str) -> bool:
+    """Removes a hold without debiting anything. Returns False if it was already gone."""
+    if write_behind_ledger is not None and write_behind_ledger.running:
+        return write_behind_ledger.release_hold(hold_id)
+    session = await _connected_database()
+    if _supports_returning():
+        # One statement, so concurrent releases cannot both see the hold and both succeed
+        if await session.fetch_one(_RELEASE_HOLD_SQL, {"hold_id": hold_id}) is None:
             return False
-        update_query = user_balances.update().where(user_balances.c.user_id == user_id).values(balance=f"{new_balance:.8f}")
-        await session.execute(update_query)
-        print(f"Updated balance for user {user_id} to {new_balance:.8f}")
-        return True
+    else:
+        query = ledger_holds.select().where(ledger_holds.c.hold_id == hold_id).with_for_update()
+        async with session.transaction():
+            if await session.fetch_one(query) is None:
+                return False
+            await session.execute(ledger_holds.delete().where(ledger_holds.c.hold_id == hold_id))
+    logger.debug("Released hold", hold_id=hold_id)
+    return True
+
+async def expire_holds() -> int:
+    """
+    Deletes expired holds. They already stopped counting against balances when they
+    expired; this only keeps the table small. Returns the number deleted.
+    """
+    if write_behind_ledger is not None and write_behind_ledger.running:
+        return write_behind_ledger.expire_holds()
+    session = await _connected_database()
+    now = _utcnow()
+    expired = ledger_holds.c.expires_at <= now
+    count = await session.fetch_val(sqlalchemy.select(sqlalchemy.func.count()).select_from(ledger_holds).where(expired))
+    if count:
+        await session.execute(ledger_holds.delete().where(expired))
+        logger.info("Expired stale holds", count=count)
+    return count or 0
+
+async def get_ledger_entries(user_id: str, limit: int = 100, before_entry_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """A user's ledger history, newest first. Pass the last entry_id seen as `before_entry_id` to page."""
+    session = await _connected_database()
+    query = ledger_entries.select().where(ledger_entries.c.user_id == user_id)
+    if before_entry_id is not None:
+        query = query.where(ledger_entries.c.entry_id < before_entry_id)
+    rows = await session.fetch_all(query.order_by(ledger_entries.c.entry_id.desc()).limit(limit))
+    return [dict(row._mapping) for row in rows]
+
+async def compact_ledger(min_age_seconds: float = LEDGER_COMPACTION_MIN_AGE) -> Optional[int]:
+    """
+    Rolls ledger entries older than `min_age_seconds` into the users' balance snapshots,
+    keeping balance reads to a snapshot plus a short tail of entries. Entries themselves
+    are kept as history. One UPDATE, so balances read concurrently stay consistent.
+
+    Returns:
+        The entry_id the snapshots now cover, or None if there was nothing to compact.
+    """
+    session = await _connected_database()
+    cutoff = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(seconds=min_age_seconds)
+    query = sqlalchemy.select(sqlalchemy.func.max(ledger_entries.c.entry_id)).where(ledger_entries.c.created_at <= cutoff)
+    upto = await session.fetch_val(query)
+    if upto is None:
+        return None
+    await session.execute(_COMPACT_SQL, {"upto": upto})
+    logger.info("Compacted ledger entries into balance snapshots", upto_entry_id=upto)
+    return upto
+
+async def start_ledger_compaction(interval: float = LEDGER_COMPACTION_INTERVAL):
+    """Runs compact_ledger and expire_holds every `interval` seconds in the background."""
+    global _compaction_task
+    if _compaction_task or interval <= 0:
+        return
+
+    async def _compaction_loop():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await compact_ledger()
+                await expire_holds()
+            except Exception as e:
+                logger.warning("Ledger compaction failed, will retry", error=str(e))
+
+    _compaction_task = asyncio.create_task(_compaction_loop())
+
+async def stop_ledger_compaction():
+    """Cancels the periodic ledger compaction, if running."""
+    global _compaction_task
+    if _compaction_task:
+        _compaction_task.cancel()
+        try:
+            await _compaction_task
+        except asyncio.CancelledError:
+            pass
+        _compaction_task = None
 
 # --- Rewarded Upload Tracking ---
 
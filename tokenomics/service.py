@@ -1,16 +1,21 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import math
 
 # Use Decimal for precise calculations if needed, especially for currency/tokens
 # from decimal import Decimal, getcontext
 # getcontext().prec = 18 # Set precision
 
-from ..config import settings
+from ..config.settings import settings
 # Assuming ledger functions are in ledger.py within the same package
 from . import ledger
 # Assuming routing decision model is available
 # Adjust import path if needed
 from ..core_ai.routing import RoutingDecision
+from ..core_ai.models import SubAIResponse
+from ..utils.telemetry import span
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
 
 # --- V1 Cost Parameters (Load from Settings) ---
 # TODO: Add these specific cost parameters to config/settings.py and .env
@@ -35,6 +40,14 @@ SPECIALIST_COST_TIERS = {
     # Add other fixed specialists here
 }
 
+# Charge applied when a prompt is answered from the response cache:
+# 'free' (no charge), 'base_fee' (BASE_FEE only) or 'full' (the original query's cost)
+CACHE_HIT_CHARGE_POLICY = getattr(settings, "TOKEN_CACHE_HIT_CHARGE_POLICY", "base_fee")
+# Fraction of the invocation cost charged for a sub-task answered from the Sub-AI result cache
+CACHED_INVOCATION_RATE = float(getattr(settings, "TOKEN_CACHED_INVOCATION_RATE", 0.0))
+# How long a query's hold reserves funds if it is never captured or released (e.g. the process died)
+HOLD_TTL_SECONDS = float(getattr(settings, "TOKEN_HOLD_TTL_SECONDS", 300.0))
+
 # --- V1 Reward Parameters (Load from Settings) ---
 # TODO: Add these reward parameters to config/settings.py and .env
 REWARD_PER_MB = float(getattr(settings, "TOKEN_REWARD_PER_MB", 0.01))
@@ -47,6 +60,17 @@ MAX_FILE_SIZE_BYTES = int(getattr(settings, "REWARD_MAX_FILE_SIZE_BYTES", 1 * 10
 
 # --- Service Functions ---
 
+def _invocation_cost(decision: RoutingDecision) -> float:
+    """The V1 cost tier price of invoking the Sub-AI a sub-task was routed to."""
+    if decision.route_type == 'fixed_specialist':
+        specialist_id = decision.target_id or "unknown"
+        # Determine cost tier based on specialist ID (or tags in metadata later)
+        tier = SPECIALIST_COST_TIERS.get(specialist_id, "complex_fixed") # Default to complex if unknown
+        return INVOCATION_COSTS.get(tier, 0.0)
+    if decision.route_type == 'dynamic_instance':
+        return INVOCATION_COSTS.get("dynamic", 0.0)
+    return 0.0
+
 def calculate_query_cost(routing_decisions: List[RoutingDecision]) -> float:
     """
     Calculates the total cost for processing a query based on V1 pricing model.
@@ -58,16 +82,7 @@ def calculate_query_cost(routing_decisions: List[RoutingDecision]) -> float:
         The total calculated cost in COLAB tokens.
     """
     num_sub_tasks = len(routing_decisions)
-    total_invocation_cost = 0.0
-
-    for decision in routing_decisions:
-        if decision.route_type == 'fixed_specialist':
-            specialist_id = decision.target_id or "unknown"
-            # Determine cost tier based on specialist ID (or tags in metadata later)
-            tier = SPECIALIST_COST_TIERS.get(specialist_id, "complex_fixed") # Default to complex if unknown
-            total_invocation_cost += INVOCATION_COSTS.get(tier, 0.0)
-        elif decision.route_type == 'dynamic_instance':
-            total_invocation_cost += INVOCATION_COSTS.get("dynamic", 0.0)
+    total_invocation_cost = sum(_invocation_cost(decision) for decision in routing_decisions)
 
     total_cost = (
         BASE_FEE +
@@ -77,39 +92,172 @@ def calculate_query_cost(routing_decisions: List[RoutingDecision]) -> float:
         SYNTHESIS_COST
     )
 
-    print(f"Calculated Query Cost: Base({BASE_FEE}) + Decomp({DECOMPOSITION_COST}) + "
-          f"Routing({num_sub_tasks}*{ROUTING_COST_PER_TASK}={num_sub_tasks * ROUTING_COST_PER_TASK}) + "
-          f"Invocation({total_invocation_cost}) + Synthesis({SYNTHESIS_COST}) = {total_cost}")
+    logger.debug(
+        "Calculated query cost", base=BASE_FEE, decomposition=DECOMPOSITION_COST,
+        routing=num_sub_tasks * ROUTING_COST_PER_TASK, invocation=total_invocation_cost,
+        synthesis=SYNTHESIS_COST, total=total_cost
+    )
 
     # Return cost, perhaps rounded or as Decimal
     return round(total_cost, 8) # Round to typical token precision
 
-async def charge_user_for_query(user_id: str, cost: float) -> bool:
+def calculate_actual_query_cost(routing_decisions: List[RoutingDecision], responses: List[SubAIResponse]) -> float:
+    """
+    Calculates what a completed query is charged: like calculate_query_cost, but the
+    invocation cost only applies to sub-tasks that were actually answered, at
+    CACHED_INVOCATION_RATE for those served from the Sub-AI result cache. Never more
+    than calculate_query_cost, so it always fits the query's hold.
+
+    Args:
+        routing_decisions: List of routing decisions made for the query's sub-tasks.
+        responses: The Sub-AI responses the query was synthesized from.
+
+    Returns:
+        The total cost in COLAB tokens.
+    """
+    answered = {res.sub_task_id: res for res in responses if res.status == "success"}
+    invocation_cost = 0.0
+    for decision in routing_decisions:
+        response = answered.get(decision.sub_task.sub_task_id)
+        if response is None:
+            continue # Failed, skipped or dropped as a straggler
+        cached = bool(response.metadata and response.metadata.get("cached"))
+        invocation_cost += _invocation_cost(decision) * (CACHED_INVOCATION_RATE if cached else 1.0)
+
+    total_cost = (
+        BASE_FEE +
+        DECOMPOSITION_COST +
+        (len(routing_decisions) * ROUTING_COST_PER_TASK) +
+        invocation_cost +
+        SYNTHESIS_COST
+    )
+    logger.debug("Calculated actual query cost", invocation=invocation_cost, answered=len(answered), total=total_cost)
+    return round(total_cost, 8)
+
+def calculate_cache_hit_cost(original_cost: float) -> float:
+    """
+    Calculates the cost of a query answered from the response cache, per CACHE_HIT_CHARGE_POLICY.
+
+    Args:
+        original_cost: What the query that produced the cached answer was charged.
+
+    Returns:
+        The cost in COLAB tokens.
+    """
+    if CACHE_HIT_CHARGE_POLICY == "free":
+        return 0.0
+    if CACHE_HIT_CHARGE_POLICY == "full":
+        return round(original_cost, 8)
+    if CACHE_HIT_CHARGE_POLICY != "base_fee":
+        logger.warning("Unknown cache hit charge policy, charging the base fee", policy=CACHE_HIT_CHARGE_POLICY)
+    return round(min(BASE_FEE, original_cost), 8)
+
+async def charge_user_for_query(user_id: str, cost: float, session_id: Optional[str] = None, reason: str = "query") -> bool:
     """
     Attempts to deduct the query cost from the user's balance.
 
     Args:
         user_id: The ID of the user to charge.
         cost: The amount to deduct.
+        session_id: The query session, recorded on the ledger entry.
+        reason: Recorded on the ledger entry ('query', or 'cache_hit' for cached answers).
 
     Returns:
         True if the charge was successful, False otherwise (e.g., insufficient funds).
     """
     if not user_id:
-        print("Error: Cannot charge user without user_id.")
+        logger.error("Cannot charge user without user_id")
         return False
     if cost <= 0:
-        print("Info: Query cost is zero or negative, no charge applied.")
+        logger.debug("Query cost is zero or negative, no charge applied", user_id=user_id, cost=cost)
         return True # No cost means success
 
-    print(f"Attempting to charge user '{user_id}' {cost:.8f} COLAB...")
-    success = await ledger.update_user_balance(user_id, -abs(cost)) # Ensure cost is negative for debit
+    logger.debug("Charging user", user_id=user_id, cost=cost)
+    with span("ledger_charge", user_id=user_id, cost=cost) as charge_span:
+        success = await ledger.update_user_balance(user_id, -abs(cost), reason=reason, session_id=session_id) # Ensure cost is negative for debit
+        charge_span.set_attribute("charged", success)
     if success:
-        print(f"Successfully charged user '{user_id}'.")
+        logger.info("Charged user %s %.8f COLAB", user_id, cost, user_id=user_id, cost=cost)
     else:
-        print(f"Failed to charge user '{user_id}' (likely insufficient funds).")
+        logger.warning("Failed to charge user %s (likely insufficient funds)", user_id, user_id=user_id, cost=cost)
     return success
 
+async def place_query_hold(user_id: str, estimated_cost: float, session_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Pre-authorizes a query: reserves its estimated cost on the user's balance for
+    HOLD_TTL_SECONDS, so the query can run before it is charged. Settle the hold with
+    capture_query_hold once the actual cost is known, or release_query_hold if the
+    query fails.
+
+    Args:
+        user_id: The ID of the user to charge.
+        estimated_cost: The most the query can cost (calculate_query_cost).
+        session_id: The query session, recorded on the hold.
+
+    Returns:
+        (True, hold_id) if authorized, (False, None) otherwise (e.g., insufficient funds).
+        A zero cost needs no hold: (True, None).
+    """
+    if not user_id:
+        logger.error("Cannot place hold without user_id")
+        return False, None
+    if estimated_cost <= 0:
+        return True, None
+
+    with span("ledger_hold", user_id=user_id, cost=estimated_cost) as hold_span:
+        hold_id = await ledger.place_hold(user_id, estimated_cost, HOLD_TTL_SECONDS, session_id=session_id)
+        hold_span.set_attribute("held", hold_id is not None)
+    if hold_id is None:
+        logger.warning("Failed to place hold for user %s (likely insufficient funds)", user_id, user_id=user_id, cost=estimated_cost)
+        return False, None
+    logger.debug("Placed hold", user_id=user_id, hold_id=hold_id, cost=estimated_cost)
+    return True, hold_id
+
+async def capture_query_hold(user_id: str, hold_id: Optional[str], actual_cost: float, session_id: Optional[str] = None) -> bool:
+    """
+    Charges the actual cost of a query against its hold and releases the rest.
+
+    Args:
+        user_id: The ID of the user to charge.
+        hold_id: From place_query_hold (None if no hold was needed).
+        actual_cost: What the query is charged (calculate_actual_query_cost), at most the amount held.
+        session_id: The query session, recorded on the ledger entry.
+
+    Returns:
+        True if the charge was successful. It can only fail if the hold expired first
+        and the balance no longer covers the cost.
+    """
+    if actual_cost <= 0:
+        await release_query_hold(hold_id)
+        return True
+    if hold_id is None:
+        return await charge_user_for_query(user_id, actual_cost, session_id=session_id)
+
+    with span("ledger_capture", user_id=user_id, cost=actual_cost) as capture_span:
+        success = await ledger.capture_hold(hold_id, user_id, actual_cost, reason="query", session_id=session_id)
+        capture_span.set_attribute("charged", success)
+    if success:
+        logger.info("Charged user %s %.8f COLAB", user_id, actual_cost, user_id=user_id, cost=actual_cost, hold_id=hold_id)
+    else:
+        logger.warning("Failed to capture hold for user %s", user_id, user_id=user_id, cost=actual_cost, hold_id=hold_id)
+    return success
+
+async def release_query_hold(hold_id: Optional[str]) -> bool:
+    """
+    Cancels a query's hold without charging anything, e.g. when the query failed.
+
+    Returns:
+        True if the hold was released (or there was none to release).
+    """
+    if hold_id is None:
+        return True
+    released = await ledger.release_hold(hold_id)
+    if released:
+        logger.debug("Released hold", hold_id=hold_id)
+    else:
+        logger.warning("Hold already gone when releasing", hold_id=hold_id)
+    return released
+
 def _check_quality_v1(file_size_bytes: int, metadata: Optional[Dict[str, Any]]) -> bool:
     """Performs basic V1 quality checks."""
     if not (MIN_FILE_SIZE_BYTES <= file_size_bytes <= MAX_FILE_SIZE_BYTES):
@@ -157,13 +305,14 @@ def calculate_data_reward(file_size_bytes: int, metadata: Optional[Dict[str, Any
     print(f"Calculated Data Reward: Size({size_reward:.8f}) + Bonus({bonus:.8f}) = {total_reward:.8f}")
     return round(total_reward, 8)
 
-async def reward_user_for_data(user_id: str, reward: float) -> bool:
+async def reward_user_for_data(user_id: str, reward: float, cid: Optional[str] = None) -> bool:
     """
     Credits a user's balance with the calculated data contribution reward.
 
     Args:
         user_id: The ID of the user to reward.
         reward: The amount to credit.
+        cid: The rewarded upload, recorded on the ledger entry.
 
     Returns:
         True if the credit was successful, False otherwise.
@@ -177,7 +326,7 @@ async def reward_user_for_data(user_id: str, reward: float) -> bool:
 
     print(f"Attempting to reward user '{user_id}' {reward:.8f} COLAB...")
     # Use abs(reward) to ensure we are crediting
-    success = await ledger.update_user_balance(user_id, abs(reward))
+    success = await ledger.update_user_balance(user_id, abs(reward), reason="data_reward", cid=cid)
     if success:
         print(f"Successfully rewarded user '{user_id}'.")
     else:
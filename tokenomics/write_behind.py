@@ -0,0 +1,461 @@
+import asyncio
+import datetime
+import glob
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import databases
+
+from ..utils.log import get_logger
+
+logger = get_logger(__name__)
+
+_QUANTUM = Decimal("0.00000001") # Matches user_balances.balance Numeric(18, 8)
+
+# Balances are a snapshot in user_balances plus the ledger_entries recorded after it (see ledger.py)
+BALANCE_EXPR = (
+    "b.balance + COALESCE((SELECT SUM(e.amount) FROM ledger_entries e "
+    "WHERE e.user_id = b.user_id AND e.entry_id > b.snapshot_entry_id), 0)"
+)
+SELECT_BALANCE_SQL = f"SELECT {BALANCE_EXPR} AS balance FROM user_balances b WHERE b.user_id = :user_id"
+# ON CONFLICT works on both SQLite (3.24+) and PostgreSQL
+ENSURE_ACCOUNT_SQL = (
+    "INSERT INTO user_balances (user_id, balance, snapshot_entry_id) VALUES (:user_id, 0, 0) "
+    "ON CONFLICT (user_id) DO NOTHING"
+)
+INSERT_ENTRY_SQL = (
+    "INSERT INTO ledger_entries (user_id, amount, reason, session_id, cid) "
+    "VALUES (:user_id, :amount, :reason, :session_id, :cid)"
+)
+# Journaled entries keep the time they were made, not the time they were flushed
+_INSERT_JOURNALED_ENTRY_SQL = (
+    "INSERT INTO ledger_entries (user_id, amount, reason, session_id, cid, created_at) "
+    "VALUES (:user_id, :amount, :reason, :session_id, :cid, :created_at)"
+)
+_UPSERT_CHECKPOINT_SQL = (
+    "INSERT INTO ledger_journal_checkpoints (journal_id, last_seq) VALUES (:journal_id, :last_seq) "
+    "ON CONFLICT (journal_id) DO UPDATE SET last_seq = excluded.last_seq"
+)
+_SELECT_CHECKPOINT_SQL = "SELECT last_seq FROM ledger_journal_checkpoints WHERE journal_id = :journal_id"
+
+
+def to_amount(value: Any) -> Decimal:
+    """Converts a float/str/Decimal amount to a Decimal at ledger precision."""
+    return Decimal(str(value)).quantize(_QUANTUM)
+
+
+class LedgerJournal:
+    """
+    Append-only write-ahead journal of balance changes, one JSON object per line.
+
+    Appends are group-committed: everything queued while a write is in progress goes
+    out in the next single write (and fsync), off the event loop. Entries get
+    consecutive sequence numbers and become durable in sequence order. The journal
+    is split into segment files (`<path>.<first seq>`); the current segment is
+    rotated after each checkpoint, and segments whose entries are all checkpointed
+    are deleted.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        # Called on the event loop for each entry, in sequence order, once it is durable / failed to write
+        self.on_durable: Callable[[Dict[str, Any]], None] = lambda entry: None
+        self.on_failed: Callable[[Dict[str, Any]], None] = lambda entry: None
+        self._next_seq = 1
+        self._queue: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._file = None
+        self._segment_path: Optional[str] = None
+        self._segment_last_seq = 0
+        self._closed_segments: List[Tuple[str, int]] = [] # (path, last seq)
+        self._rotate = False
+
+    def segments(self) -> List[str]:
+        return sorted(glob.glob(f"{glob.escape(self.path)}.*"))
+
+    def read_entries(self) -> List[Dict[str, Any]]:
+        """All entries on disk, in sequence order. A torn final line (crash mid-write) is ignored."""
+        entries: List[Dict[str, Any]] = []
+        for segment in self.segments():
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning("Ignoring torn ledger journal line", segment=segment)
+                        break
+        return entries
+
+    def delete_segments(self):
+        for segment in self.segments():
+            os.remove(segment)
+
+    def start(self, next_seq: int):
+        self._next_seq = next_seq
+        self._stopping = False
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Writes out everything queued, then closes the current segment."""
+        if self._writer is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._writer
+        self._writer = None
+        self._close_segment()
+
+    def append(self, user_id: str, amount: Decimal, reason: str, session_id: Optional[str] = None, cid: Optional[str] = None) -> asyncio.Future:
+        """Queues a ledger entry. The returned future resolves to the entry once it is durable."""
+        entry = {
+            "seq": self._next_seq, "user_id": user_id, "amount": str(amount),
+            "reason": reason, "session_id": session_id, "cid": cid, "ts": time.time(),
+        }
+        self._next_seq += 1
+        durable = asyncio.get_running_loop().create_future()
+        self._queue.append((entry, durable))
+        self._wakeup.set()
+        return durable
+
+    def checkpointed(self, last_seq: int):
+        """Entries up to `last_seq` are in the database: drop segments holding nothing newer."""
+        self._rotate = True
+        kept = []
+        for segment, segment_last_seq in self._closed_segments:
+            if segment_last_seq <= last_seq:
+                os.remove(segment)
+            else:
+                kept.append((segment, segment_last_seq))
+        self._closed_segments = kept
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                if self._stopping:
+                    return
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            batch, self._queue = self._queue, []
+            if self._rotate:
+                self._close_segment()
+                self._rotate = False
+            data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry, _ in batch)
+            try:
+                await asyncio.to_thread(self._write, data, batch[0][0]["seq"])
+            except Exception as e:
+                logger.error("Ledger journal write failed", error=str(e), entries=len(batch))
+                for entry, durable in batch:
+                    self.on_failed(entry)
+                    if not durable.done():
+                        durable.set_exception(IOError(f"Ledger journal write failed: {e}"))
+                continue
+            self._segment_last_seq = batch[-1][0]["seq"]
+            for entry, durable in batch:
+                self.on_durable(entry)
+                if not durable.done():
+                    durable.set_result(entry)
+
+    def _write(self, data: str, first_seq: int):
+        if self._file is None:
+            self._segment_path = f"{self.path}.{first_seq:012d}"
+            self._file = open(self._segment_path, "a", encoding="utf-8")
+        offset = self._file.tell()
+        try:
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except Exception:
+            try: # Don't leave entries on disk that callers were told failed
+                self._file.truncate(offset)
+            except Exception:
+                pass
+            raise
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._closed_segments.append((self._segment_path, self._segment_last_seq))
+            self._file = None
+
+
+class WriteBehindLedger:
+    """
+    Ledger engine keeping balances in memory and writing the ledger entries behind.
+
+    A balance change is checked against the in-memory balance (loaded from the database
+    on first use) under a per-user lock, appended to the journal, and acknowledged once
+    the journal entry is durable. Durable entries are inserted into `ledger_entries` in
+    a single transaction when LEDGER_FLUSH_MAX_ENTRIES pile up or every
+    LEDGER_FLUSH_INTERVAL seconds; the transaction also records the last flushed
+    journal sequence number, so start() can replay exactly the entries a crash left
+    unflushed.
+
+    Holds (see ledger.place_hold) are kept in memory only: they are not balance
+    changes, and the funds of holds lost in a restart are simply available again.
+
+    The in-memory balances are authoritative, so this process must be the only writer
+    of `user_balances` while the engine runs.
+    """
+
+    def __init__(
+        self,
+        database: databases.Database,
+        journal: LedgerJournal,
+        flush_max_entries: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.database = database
+        self.journal = journal
+        self.journal_id = os.path.basename(journal.path)
+        self.flush_max_entries = flush_max_entries
+        self.flush_interval = flush_interval
+        self._balances: Dict[str, Optional[Decimal]] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._pending: List[Dict[str, Any]] = [] # Durable, unflushed journal entries
+        self._flushing: List[Dict[str, Any]] = [] # Entries being written to the database
+        self._in_flight: Dict[str, int] = defaultdict(int) # user_id -> journal appends not yet durable or failed
+        self._holds: Dict[str, Tuple[str, Decimal, float]] = {} # hold_id -> (user_id, amount, monotonic expiry)
+        self._user_holds: Dict[str, Set[str]] = defaultdict(set)
+        self._flush_lock = asyncio.Lock()
+        self._flush_wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        journal.on_durable = self._on_durable
+        journal.on_failed = self._on_failed
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    async def start(self):
+        """Replays unflushed journal entries into the database, then starts the journal and flusher."""
+        if self.running:
+            return
+        row = await self.database.fetch_one(_SELECT_CHECKPOINT_SQL, {"journal_id": self.journal_id})
+        checkpoint = int(row["last_seq"]) if row else 0
+        entries = self.journal.read_entries()
+        unflushed = [entry for entry in entries if entry["seq"] > checkpoint]
+        if unflushed:
+            await self._write_batch(unflushed)
+            logger.info("Replayed ledger journal", entries=len(unflushed))
+        self.journal.delete_segments()
+        self.journal.start(next_seq=max([checkpoint] + [entry["seq"] for entry in entries]) + 1)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stops the flusher, writes out the journal and flushes everything to the database."""
+        if not self.running:
+            return
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+        await self.journal.stop()
+        await self.flush()
+        self._balances.clear()
+        self._holds.clear()
+        self._user_holds.clear()
+
+    async def get_balance(self, user_id: str) -> Optional[Decimal]:
+        async with self._locks[user_id]:
+            return await self._load(user_id)
+
+    async def apply(
+        self,
+        user_id: str,
+        amount_change: Any,
+        reason: str = "adjustment",
+        session_id: Optional[str] = None,
+        cid: Optional[str] = None,
+    ) -> bool:
+        """
+        Credits (positive) or debits (negative) a user, with the same rules as
+        ledger.update_user_balance: unknown users are created by a credit, and a debit
+        never takes the available balance (less active holds) below zero. Returns True
+        once the change is durable.
+        Raises if the journal write fails (the in-memory balance is rolled back).
+        """
+        async with self._locks[user_id]:
+            return await self._apply_locked(user_id, to_amount(amount_change), reason, session_id, cid)
+
+    async def place_hold(self, user_id: str, amount: Any, ttl: float, session_id: Optional[str] = None) -> Optional[str]:
+        """Reserves `amount` of the available balance for `ttl` seconds. Returns the hold_id, or None if refused."""
+        amount = to_amount(amount)
+        async with self._locks[user_id]:
+            balance = await self._load(user_id)
+            if balance is None:
+                logger.warning("User not found, cannot debit", user_id=user_id)
+                return None
+            if balance - self._held(user_id) < amount:
+                logger.warning("Insufficient balance to debit", user_id=user_id, amount=float(amount))
+                return None
+            hold_id = uuid.uuid4().hex
+            self._holds[hold_id] = (user_id, amount, time.monotonic() + ttl)
+            self._user_holds[user_id].add(hold_id)
+        logger.debug("Placed hold", user_id=user_id, hold_id=hold_id, amount=float(amount))
+        return hold_id
+
+    async def capture_hold(
+        self,
+        hold_id: str,
+        user_id: str,
+        amount: Any,
+        reason: str = "query",
+        session_id: Optional[str] = None,
+    ) -> bool:
+        """Debits at most the amount held and removes the hold; an expired hold makes it an ordinary debit."""
+        amount = to_amount(amount)
+        async with self._locks[user_id]:
+            hold = self._holds.get(hold_id)
+            if hold is not None and hold[0] != user_id:
+                logger.warning("Hold belongs to another user, ignoring it", user_id=user_id, hold_id=hold_id)
+                hold = None # Left in place for its owner
+            else:
+                self.release_hold(hold_id)
+            if hold is None or hold[2] <= time.monotonic():
+                logger.warning("Hold expired or missing, debiting the balance directly", user_id=user_id, hold_id=hold_id)
+            elif amount > hold[1]:
+                logger.warning("Capture exceeds hold, capturing the amount held", hold_id=hold_id, amount=float(amount), held=float(hold[1]))
+                amount = hold[1]
+            if amount == 0:
+                return True
+            return await self._apply_locked(user_id, -amount, reason, session_id, None)
+
+    def release_hold(self, hold_id: str) -> bool:
+        """Removes a hold without debiting anything. Returns False if it was already gone."""
+        hold = self._holds.pop(hold_id, None)
+        if hold is None:
+            return False
+        holds = self._user_holds[hold[0]]
+        holds.discard(hold_id)
+        if not holds:
+            del self._user_holds[hold[0]]
+        return True
+
+    def expire_holds(self) -> int:
+        """Drops expired holds (which already stopped counting against balances). Returns the number dropped."""
+        now = time.monotonic()
+        expired = [hold_id for hold_id, (_, _, expires_at) in self._holds.items() if expires_at <= now]
+        for hold_id in expired:
+            self.release_hold(hold_id)
+        return len(expired)
+
+    async def flush(self) -> int:
+        """Writes the pending entries to the database in one transaction. Returns the number flushed."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            self._flushing = batch
+            try:
+                await self._write_batch(batch)
+            except Exception:
+                self._pending = batch + self._pending # Keep them for the next attempt
+                raise
+            finally:
+                self._flushing = []
+            self.journal.checkpointed(batch[-1]["seq"])
+            return len(batch)
+
+    async def _apply_locked(self, user_id: str, delta: Decimal, reason: str, session_id: Optional[str], cid: Optional[str]) -> bool:
+        # Callers hold the user's lock
+        balance = await self._load(user_id)
+        if balance is None:
+            if delta <= 0:
+                logger.warning("User not found, cannot debit", user_id=user_id)
+                return False
+            new_balance = delta
+        else:
+            new_balance = balance + delta
+            if delta < 0 and new_balance - self._held(user_id) < 0:
+                logger.warning("Insufficient balance to debit", user_id=user_id, amount=float(-delta))
+                return False
+        # Applied before the entry is durable (and rolled back if the write fails), so
+        # the user's next change sees it even if this caller is cancelled meanwhile
+        self._balances[user_id] = new_balance
+        self._in_flight[user_id] += 1
+        await self.journal.append(user_id, delta, reason, session_id, cid)
+        logger.debug("Updated balance", user_id=user_id, balance=float(new_balance))
+        return True
+
+    def _held(self, user_id: str) -> Decimal:
+        now = time.monotonic()
+        held = Decimal(0)
+        for hold_id in self._user_holds.get(user_id, ()):
+            _, amount, expires_at = self._holds[hold_id]
+            if expires_at > now:
+                held += amount
+        return held
+
+    async def _load(self, user_id: str) -> Optional[Decimal]:
+        # Callers hold the user's lock. Users with pending entries are always cached.
+        if user_id not in self._balances:
+            row = await self.database.fetch_one(SELECT_BALANCE_SQL, {"user_id": user_id})
+            self._balances[user_id] = to_amount(row["balance"]) if row else None
+        return self._balances[user_id]
+
+    def _landed(self, user_id: str):
+        self._in_flight[user_id] -= 1
+        if not self._in_flight[user_id]:
+            del self._in_flight[user_id]
+
+    def _on_durable(self, entry: Dict[str, Any]):
+        self._landed(entry["user_id"])
+        self._pending.append(entry)
+        if len(self._pending) >= self.flush_max_entries:
+            self._flush_wakeup.set()
+
+    def _on_failed(self, entry: Dict[str, Any]):
+        user_id = entry["user_id"]
+        self._landed(user_id)
+        if user_id in self._in_flight or any(other["user_id"] == user_id for other in self._pending + self._flushing):
+            # The cached balance also holds changes the database doesn't have yet
+            # (later appends still in flight, or durable but unflushed): roll back just this change
+            balance = self._balances.get(user_id)
+            if balance is not None:
+                self._balances[user_id] = balance - Decimal(entry["amount"])
+        else:
+            # The database holds all of the user's durable changes, so reload from it next
+            # time (this also forgets a user the failed credit would have created)
+            self._balances.pop(user_id, None)
+
+    async def _write_batch(self, entries: List[Dict[str, Any]]):
+        accounts = [{"user_id": user_id} for user_id in dict.fromkeys(entry["user_id"] for entry in entries)]
+        values = [
+            {
+                "user_id": entry["user_id"], "amount": Decimal(entry["amount"]), "reason": entry["reason"],
+                "session_id": entry["session_id"], "cid": entry["cid"],
+                "created_at": datetime.datetime.fromtimestamp(entry["ts"], datetime.timezone.utc).replace(tzinfo=None),
+            }
+            for entry in entries
+        ]
+        async with self.database.transaction():
+            await self.database.execute_many(ENSURE_ACCOUNT_SQL, accounts)
+            await self.database.execute_many(_INSERT_JOURNALED_ENTRY_SQL, values)
+            await self.database.execute(_UPSERT_CHECKPOINT_SQL, {"journal_id": self.journal_id, "last_seq": entries[-1]["seq"]})
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            self.expire_holds()
+            try:
+                flushed = await self.flush()
+                if flushed:
+                    logger.debug("Flushed ledger journal entries", entries=flushed)
+            except Exception as e:
+                logger.warning("Ledger flush failed, will retry", error=str(e))
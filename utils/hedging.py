@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from ..config.settings import settings
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# --- Hedging Config (Load from Settings) ---
+HEDGING_ENABLED = bool(getattr(settings, "HEDGING_ENABLED", False))
+HEDGE_PERCENTILE = float(getattr(settings, "HEDGE_PERCENTILE", 95.0))
+HEDGE_MIN_DELAY = float(getattr(settings, "HEDGE_MIN_DELAY", 0.05))
+HEDGE_MIN_SAMPLES = int(getattr(settings, "HEDGE_MIN_SAMPLES", 20))
+HEDGE_MAX_RATE = float(getattr(settings, "HEDGE_MAX_RATE", 0.1))
+
+
+class HedgePolicy:
+    """
+    Hedged requests for a latency-critical call.
+
+    The primary call starts immediately. If it has not finished after the
+    `percentile` latency of recent calls, a hedge call (e.g. to a faster fallback
+    model) is started and the first successful result wins; the other call is
+    cancelled. If one call fails, the other is awaited.
+
+    No hedging happens until `min_samples` latencies have been observed, and at most
+    `max_hedge_rate` of the last `window` calls may be hedged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        enabled: bool = True,
+        percentile: float = 95.0,
+        min_delay: float = 0.05,
+        min_samples: int = 20,
+        max_hedge_rate: float = 0.1,
+        window: int = 200
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._hedged: Deque[bool] = deque(maxlen=window)
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "rate_capped": 0,
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if there is not enough history yet."""
+        if not self.enabled or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.min_delay, ordered[index])
+
+    def _hedge_allowed(self) -> bool:
+        if not self._hedged:
+            return self.max_hedge_rate > 0
+        return sum(self._hedged) / len(self._hedged) < self.max_hedge_rate
+
+    async def run(self, primary: Callable[[], Awaitable[T]], hedge: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs `primary()`, hedging with `hedge()` per the policy.
+
+        Raises:
+            The primary's exception, if both calls fail (or the primary fails unhedged).
+        """
+        self.stats["requests"] += 1
+        start = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        delay = self.hedge_delay()
+
+        hedge_task: Optional[asyncio.Future] = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary_task}, timeout=delay)
+                if not done:
+                    if self._hedge_allowed():
+                        hedge_task = asyncio.ensure_future(hedge())
+                        self.stats["hedged"] += 1
+                        logger.info("Hedging request", policy=self.name, delay_seconds=round(delay, 2))
+                    else:
+                        self.stats["rate_capped"] += 1
+            self._hedged.append(hedge_task is not None)
+
+            if hedge_task is None:
+                result = await primary_task
+                self.stats["primary_wins"] += 1
+                self._latencies.append(time.monotonic() - start)
+                return result
+
+            pending = {primary_task, hedge_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.stats["primary_wins" if task is primary_task else "hedge_wins"] += 1
+                        # The winner's latency measured from the original start (a lower bound for the primary)
+                        self._latencies.append(time.monotonic() - start)
+                        return task.result()
+            raise primary_task.exception()
+        finally:
+            for task in (primary_task, hedge_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+
+def hedge_policy_from_settings(name: str) -> HedgePolicy:
+    """Builds a HedgePolicy configured from the HEDGING_* / HEDGE_* settings."""
+    return HedgePolicy(
+        name,
+        enabled=HEDGING_ENABLED,
+        percentile=HEDGE_PERCENTILE,
+        min_delay=HEDGE_MIN_DELAY,
+        min_samples=HEDGE_MIN_SAMPLES,
+        max_hedge_rate=HEDGE_MAX_RATE,
+    )
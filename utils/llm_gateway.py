@@ -0,0 +1,301 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from ..config.settings import settings
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# --- Gateway Config (Load from Settings) ---
+LLM_GATEWAY_MAX_CONCURRENCY = int(getattr(settings, "LLM_GATEWAY_MAX_CONCURRENCY", 16))
+LLM_GATEWAY_DEFAULT_RPM = float(getattr(settings, "LLM_GATEWAY_DEFAULT_RPM", 0)) # 0 = unlimited
+LLM_GATEWAY_DEFAULT_TPM = float(getattr(settings, "LLM_GATEWAY_DEFAULT_TPM", 0)) # 0 = unlimited
+# Per-model overrides, e.g. {"gpt-4o": {"max_concurrency": 8, "rpm": 500, "tpm": 30000}}
+LLM_GATEWAY_MODEL_LIMITS: Dict[str, Dict[str, float]] = dict(getattr(settings, "LLM_GATEWAY_MODEL_LIMITS", {}))
+LLM_GATEWAY_MAX_RETRIES = int(getattr(settings, "LLM_GATEWAY_MAX_RETRIES", 4))
+LLM_GATEWAY_BACKOFF_BASE = float(getattr(settings, "LLM_GATEWAY_BACKOFF_BASE", 0.5))
+LLM_GATEWAY_BACKOFF_MAX = float(getattr(settings, "LLM_GATEWAY_BACKOFF_MAX", 20.0))
+LLM_GATEWAY_MAX_CONNECTIONS = int(getattr(settings, "LLM_GATEWAY_MAX_CONNECTIONS", 100))
+
+# Assumed completion size when a chat request does not set max_tokens (TPM budgeting only)
+DEFAULT_COMPLETION_TOKENS_ESTIMATE = 256
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`, holding at most one
+    minute's worth. A rate of 0 or less means unlimited.
+
+    `consume` may take the bucket negative (e.g. to account for usage that exceeded
+    an estimate); later `acquire` calls then wait until it has refilled.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = max(rate_per_minute, 0.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_minute <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Waits until `amount` tokens are available and takes them."""
+        if self.unlimited:
+            return
+        amount = min(amount, self.capacity) # A single oversized request must still be admissible
+        while True:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return
+            await asyncio.sleep((amount - self._tokens) * 60.0 / self.rate_per_minute)
+
+    def consume(self, amount: float):
+        """Takes tokens without waiting."""
+        if self.unlimited:
+            return
+        self._refill()
+        self._tokens -= amount
+
+
+class _ModelLimiter:
+    """Concurrency, rate limits and shared backoff state for one model."""
+
+    def __init__(self, max_concurrency: int, rpm: float, tpm: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float):
+        """Holds back every caller of this model, e.g. after a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, estimated_tokens: float):
+        while (delay := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+
+def _estimate_tokens(kind: str, kwargs: Dict[str, Any]) -> int:
+    """Rough token estimate (~4 characters per token) of a request, used for TPM budgeting."""
+    if kind == "embeddings":
+        inputs = kwargs.get("input") or []
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        return sum(len(str(text)) // 4 + 1 for text in texts)
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages") or [])
+    return prompt_chars // 4 + 1 + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS_ESTIMATE)
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Reads the Retry-After (or retry-after-ms) header of an API error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass # HTTP-date form is not worth parsing here; fall back to backoff
+    return None
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class _ChatCompletions:
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+
+    async def create(self, **kwargs) -> Any:
+        return await self._gateway.request("chat", kwargs)
+
+
+class _Chat:
+    def __init__(self, gateway: "LLMGateway"):
+        self.completions = _ChatCompletions(gateway)
+
+
+class _Embeddings:
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+
+    async def create(self, **kwargs) -> Any:
+        return await self._gateway.request("embeddings", kwargs)
+
+
+class LLMGateway:
+    """
+    Shared entry point for all LLM API calls.
+
+    Exposes the same `chat.completions.create` / `embeddings.create` interface as
+    AsyncOpenAI, so it can be used wherever a client is expected, and adds:
+    - one pooled underlying client (connection reuse across modules),
+    - per-model concurrency limits and RPM/TPM token buckets,
+    - retries with jittered exponential backoff on 429/5xx/connection errors,
+      honoring Retry-After; a 429 pauses all callers of that model,
+    - per-model usage metrics (requests, retries, tokens, latency).
+
+    For streaming requests (stream=True) the limits and retries cover opening
+    the stream; token usage is not recorded.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_concurrency: int = 16,
+        default_rpm: float = 0,
+        default_tpm: float = 0,
+        model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0
+    ):
+        self._client = client
+        self.max_concurrency = max_concurrency
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self.chat = _Chat(self)
+        self.embeddings = _Embeddings(self)
+
+    def _limiter(self, model: str) -> _ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limits = self.model_limits.get(model, {})
+            limiter = _ModelLimiter(
+                max_concurrency=int(limits.get("max_concurrency", self.max_concurrency)),
+                rpm=float(limits.get("rpm", self.default_rpm)),
+                tpm=float(limits.get("tpm", self.default_tpm)),
+            )
+            self._limiters[model] = limiter
+        return limiter
+
+    def _record(self, model: str, **increments: float):
+        usage = self._usage.setdefault(model, {
+            "requests": 0, "failures": 0, "retries": 0, "rate_limited": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+            "latency_total_seconds": 0.0, "latency_max_seconds": 0.0,
+        })
+        for key, value in increments.items():
+            if key == "latency_max_seconds":
+                usage[key] = max(usage[key], value)
+            else:
+                usage[key] += value
+
+    def usage(self) -> Dict[str, Dict[str, float]]:
+        """Returns a snapshot of the usage metrics per model, including mean latency."""
+        snapshot: Dict[str, Dict[str, float]] = {}
+        for model, usage in self._usage.items():
+            completed = usage["requests"] - usage["failures"]
+            snapshot[model] = dict(usage, latency_mean_seconds=usage["latency_total_seconds"] / completed if completed else 0.0)
+        return snapshot
+
+    def _backoff_delay(self, error: Exception, attempt: int) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after_seconds(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    async def request(self, kind: str, kwargs: Dict[str, Any]) -> Any:
+        """
+        Sends a 'chat' or 'embeddings' request through the model's limiter, retrying
+        transient failures.
+
+        Raises:
+            The last API error if retries are exhausted or the error is not retryable.
+        """
+        model = kwargs.get("model", "unknown")
+        limiter = self._limiter(model)
+        estimated_tokens = _estimate_tokens(kind, kwargs)
+        method = self._client.chat.completions.create if kind == "chat" else self._client.embeddings.create
+
+        for attempt in range(self.max_retries + 1):
+            async with limiter.semaphore:
+                await limiter.acquire(estimated_tokens)
+                start = time.monotonic()
+                try:
+                    response = await method(**kwargs)
+                except Exception as e:
+                    self._record(model, requests=1, failures=1)
+                    if not _is_retryable(e) or attempt == self.max_retries:
+                        raise
+                    delay = self._backoff_delay(e, attempt)
+                    if isinstance(e, openai.RateLimitError):
+                        self._record(model, rate_limited=1)
+                        limiter.pause(delay)
+                    logger.warning(
+                        "LLM call failed, retrying", model=model, error_type=type(e).__name__,
+                        retry_in_seconds=round(delay, 2), attempt=attempt + 1, max_retries=self.max_retries
+                    )
+                else:
+                    latency = time.monotonic() - start
+                    self._record(model, requests=1, latency_total_seconds=latency, latency_max_seconds=latency)
+                    usage = getattr(response, "usage", None)
+                    if usage is not None:
+                        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+                        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+                        self._record(model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+                        # Charge the TPM bucket for anything beyond the up-front estimate
+                        limiter.tokens.consume(max(0, prompt_tokens + completion_tokens - estimated_tokens))
+                    return response
+            self._record(model, retries=1)
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        """Closes the underlying client's connection pool."""
+        close = getattr(self._client, "close", None)
+        if close:
+            await close()
+
+
+def _create_default_gateway() -> Optional[LLMGateway]:
+    try:
+        client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=0, # Retries are handled (and coordinated) by the gateway
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_GATEWAY_MAX_CONNECTIONS, max_keepalive_connections=LLM_GATEWAY_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(600.0, connect=5.0), # Same overall timeout as the OpenAI default
+            ),
+        )
+    except Exception as e:
+        logger.error("Error initializing LLM gateway client, make sure the API key is set", error=str(e))
+        return None
+    return LLMGateway(
+        client,
+        max_concurrency=LLM_GATEWAY_MAX_CONCURRENCY,
+        default_rpm=LLM_GATEWAY_DEFAULT_RPM,
+        default_tpm=LLM_GATEWAY_DEFAULT_TPM,
+        model_limits=LLM_GATEWAY_MODEL_LIMITS,
+        max_retries=LLM_GATEWAY_MAX_RETRIES,
+        backoff_base=LLM_GATEWAY_BACKOFF_BASE,
+        backoff_max=LLM_GATEWAY_BACKOFF_MAX,
+    )
+
+
+# Process-wide gateway shared by core_ai and the specialist services (None if the client could not be created)
+llm_gateway: Optional[LLMGateway] = _create_default_gateway()
@@ -0,0 +1,204 @@
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from typing import Any, Dict, Optional, TextIO
+
+from ..config.settings import settings
+from .telemetry import current_span
+
+# --- Logging Config (Load from Settings) ---
+LOG_LEVEL = str(getattr(settings, "LOG_LEVEL", "INFO")).upper()
+LOG_FORMAT = getattr(settings, "LOG_FORMAT", "json") # 'json' (one object per line) or 'text'
+# Fraction of requests (traces) whose DEBUG lines are emitted; INFO and above are never sampled
+LOG_DEBUG_SAMPLE_RATE = float(getattr(settings, "LOG_DEBUG_SAMPLE_RATE", 0.1))
+LOG_QUEUE_SIZE = int(getattr(settings, "LOG_QUEUE_SIZE", 10000))
+# Longer field values (e.g. raw LLM responses) are truncated when the line is written
+LOG_MAX_FIELD_CHARS = int(getattr(settings, "LOG_MAX_FIELD_CHARS", 2000))
+
+
+def _truncate(value: Any, max_chars: int) -> Any:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(text) > max_chars:
+        return f"{text[:max_chars]}...[{len(text) - max_chars} more chars]"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, with the record's structured fields at top level."""
+
+    def __init__(self, max_field_chars: int = LOG_MAX_FIELD_CHARS):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in getattr(record, "fields", {}).items():
+            payload[key] = _truncate(value, self.max_field_chars)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable variant: `time LEVEL logger: message key=value ...`."""
+
+    def __init__(self, max_field_chars: int = LOG_MAX_FIELD_CHARS):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={_truncate(value, self.max_field_chars)}" for key, value in fields.items())
+        return line
+
+
+def _snapshot(value: Any) -> Any:
+    """Copies mutable containers (e.g. live stats dicts) so the listener thread sees them as they were when logged."""
+    if isinstance(value, (dict, list, set)):
+        return copy.deepcopy(value)
+    return value
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and leaves all formatting to the listener thread.
+
+    The stock QueueHandler interpolates the message in the calling thread; here only
+    mutable containers among the message arguments and fields are copied, and the rest
+    of the formatting happens on the listener thread. When the queue is full the record
+    is dropped and counted.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {key: _snapshot(value) for key, value in fields.items()}
+        if isinstance(record.args, tuple) and record.args:
+            record.args = tuple(_snapshot(arg) for arg in record.args)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredLogger:
+    """
+    Leveled logger taking structured fields as keyword arguments:
+
+        logger.info("Charged user %s", user_id, cost=cost)
+
+    Nothing is formatted unless the level is enabled, and then only on the listener
+    thread (see configure_logging): pass values as %-style arguments or fields rather
+    than pre-formatting them. The current trace id is attached to every line. DEBUG
+    lines are sampled per trace, so a sampled request logs all of its debug lines.
+    """
+
+    def __init__(self, logger: logging.Logger, debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE):
+        self._logger = logger
+        self.debug_sample_rate = debug_sample_rate
+
+    @property
+    def name(self) -> str:
+        return self._logger.name
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _debug_sampled(self, trace_id: Optional[str]) -> bool:
+        if self.debug_sample_rate >= 1.0:
+            return True
+        if trace_id:
+            return int(trace_id[:8], 16) / 0xFFFFFFFF < self.debug_sample_rate
+        return random.random() < self.debug_sample_rate
+
+    def _log(self, level: int, msg: str, args: tuple, exc_info: Any, fields: Dict[str, Any]):
+        if not self._logger.isEnabledFor(level):
+            return
+        span = current_span()
+        trace_id = span.trace_id if span is not None else None
+        if level <= logging.DEBUG and not self._debug_sampled(trace_id):
+            return
+        if trace_id:
+            fields.setdefault("trace_id", trace_id)
+        self._logger.log(level, msg, *args, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+    def debug(self, msg: str, *args: Any, exc_info: Any = None, **fields: Any):
+        self._log(logging.DEBUG, msg, args, exc_info, fields)
+
+    def info(self, msg: str, *args: Any, exc_info: Any = None, **fields: Any):
+        self._log(logging.INFO, msg, args, exc_info, fields)
+
+    def warning(self, msg: str, *args: Any, exc_info: Any = None, **fields: Any):
+        self._log(logging.WARNING, msg, args, exc_info, fields)
+
+    def error(self, msg: str, *args: Any, exc_info: Any = None, **fields: Any):
+        self._log(logging.ERROR, msg, args, exc_info, fields)
+
+    def exception(self, msg: str, *args: Any, **fields: Any):
+        self._log(logging.ERROR, msg, args, True, fields)
+
+
+_loggers: Dict[str, StructuredLogger] = {}
+
+def get_logger(name: str) -> StructuredLogger:
+    """Returns the StructuredLogger for `name` (usually the module's __name__)."""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = StructuredLogger(logging.getLogger(name))
+        _loggers[name] = logger
+    return logger
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream: TextIO = sys.stderr) -> NonBlockingQueueHandler:
+    """
+    Routes all logging through a bounded queue to a background thread that formats
+    and writes the records to `stream`, so logging calls never block the event loop
+    on I/O. Idempotent; call shutdown_logging() to flush on exit.
+    """
+    global _queue_handler, _listener
+    if _queue_handler is not None:
+        return _queue_handler
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _listener.start()
+    return _queue_handler
+
+def shutdown_logging():
+    """Writes out queued records and stops the listener thread."""
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop() # Drains the queue before returning
+    if _queue_handler.dropped:
+        print(f"Logging: dropped {_queue_handler.dropped} records (queue full).", file=sys.stderr)
+    _queue_handler, _listener = None, None
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls.
+
+    The first caller for a key starts the work; callers arriving while it is in
+    flight await the same result (or exception) instead of repeating it. The key
+    is forgotten as soon as the call finishes, so this is not a cache.
+
+    The shared call is shielded while other callers still wait for it: a cancelled
+    caller does not cancel it for the others. When the last caller is cancelled the
+    call is cancelled too (and awaited), so abandoned work does not keep running.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._waiters: Dict["asyncio.Future[Any]", int] = {}
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "coalesced": 0,
+            "cancelled": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the result of `fn()`, sharing one in-flight invocation per key.
+
+        Args:
+            key: Identifies identical calls.
+            fn: Zero-argument callable returning the awaitable to run if no call is in flight.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            self.stats["calls"] += 1
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+
+            def _on_done(done: "asyncio.Future[Any]"):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+                if not done.cancelled():
+                    done.exception() # Mark retrieved even if every waiter was cancelled
+            future.add_done_callback(_on_done)
+        else:
+            self.stats["coalesced"] += 1
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            waiters = self._waiters.pop(future) - 1
+            if waiters:
+                self._waiters[future] = waiters
+            elif not future.done():
+                # The last caller was cancelled: stop the call and let it unwind before re-raising
+                self.stats["cancelled"] += 1
+                future.cancel()
+                await asyncio.wait({future})
@@ -0,0 +1,205 @@
+import asyncio
+import bisect
+import contextvars
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config.settings import settings
+
+# --- Telemetry Config (Load from Settings) ---
+TRACING_ENABLED = bool(getattr(settings, "TRACING_ENABLED", True))
+# Structured span records are logged at INFO on this logger (one record per finished span)
+TRACING_LOGGER_NAME = getattr(settings, "TRACING_LOGGER_NAME", "colab.trace")
+
+# Seconds; covers sub-millisecond cache hits up to the orchestration deadline
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+span_logger = logging.getLogger(TRACING_LOGGER_NAME)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with labels.
+
+    Observations are kept as per-bucket counts plus sum and count for every
+    combination of label values, so memory is bounded by the label cardinality.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock() # Spans may finish on executor threads
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, **labels: str) -> Optional[Dict[str, Any]]:
+        """Returns {'count', 'sum', 'buckets': {upper_bound: cumulative count}} for one label combination."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                return None
+            counts, total, count = list(series[0]), series[1], series[2]
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(value[0]), value[1], value[2]) for key, value in self._series.items())
+        for key, counts, total, count in series:
+            label_pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(self.labelnames, key)]
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                labels = ",".join(label_pairs + [f'le="{_format_float(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{labels}}} {running}")
+            suffix = "{" + ",".join(label_pairs) + "}" if label_pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {_format_float(total)}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns the histogram registered under `name`, creating it on first use."""
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = Histogram(name, documentation, labelnames, buckets)
+            self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+STAGE_DURATION = metrics_registry.histogram(
+    "colab_stage_duration_seconds",
+    "Duration of Co-Lab pipeline stages.",
+    labelnames=("stage", "status"),
+)
+
+
+class Span:
+    """A timed unit of work within a trace. Attributes end up in the span's log record."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_status(self, status: str):
+        """Overrides the span's status (by default 'ok', or 'error'/'cancelled' if the block raised)."""
+        self.status = status
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("colab_current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Records a span around the enclosed block: its duration goes into the
+    `colab_stage_duration_seconds` histogram (labelled with the span name and status)
+    and a record with the span's ids, timing and attributes as structured fields is
+    logged when it ends.
+
+    The span becomes the current span, so spans opened inside the block, including
+    in asyncio tasks created there, become its children. A span opened with no
+    current span starts a new trace.
+    """
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    if not TRACING_ENABLED:
+        yield current
+        return
+
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except asyncio.CancelledError:
+        current.status = "cancelled"
+        raise
+    except Exception as e:
+        current.status = "error"
+        current.attributes.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        STAGE_DURATION.observe(current.duration, stage=name, status=current.status)
+        if span_logger.isEnabledFor(logging.INFO):
+            # Structured fields (see utils/log.py), serialized by the log formatter off the event loop
+            span_logger.info("span %s finished", current.name, extra={"fields": {
+                "span": current.name,
+                "trace_id": current.trace_id,
+                "span_id": current.span_id,
+                "parent_id": current.parent_id,
+                "status": current.status,
+                "start_time": current.start_time,
+                "duration_ms": round(current.duration * 1000, 3),
+                **current.attributes,
+            }})
+
+def trace_headers() -> Dict[str, str]:
+    """W3C `traceparent` header for the current span, for propagation to downstream services."""
+    current = _current_span.get()
+    if current is None or not TRACING_ENABLED:
+        return {}
+    return {"traceparent": f"00-{current.trace_id}-{current.span_id}-01"}